@@ -0,0 +1,109 @@
+''' Registry of lazily built agents, backed by a binary cache of precomputed policies
+
+Agents are registered by name with a factory and only built (once) when requested, so a script that plays two
+agents does not load or solve anything for the others. Solved Policy Iteration policies are cached as binary
+files (see checkpoint.write_arrays()) next to the probability json files they were solved from, and re-solved only
+when one of those files is newer than the cache. Pretrained Q Learning models are converted from their json files
+to checkpoints the same way.
+'''
+
+import os
+import numpy as np
+from round import Round
+from checkpoint import write_arrays, read_arrays, load_checkpoint, convert_json_model
+from human_agent import HumanAgent
+from policy_iteration_agent import PolicyIterationAgent
+from random_agent import RandomAgent
+from threshold_agent import ThresholdAgent
+from array_q_learning_agent import ArrayQLearningAgent
+
+PROBABILITY_FILES = ['win_probabilities.json', 'loss_probabilities.json', 'flop_probabilities.json', 'range_probabilities.json']
+ACTIONS = Round.FULL_ACTIONS
+
+
+class AgentRegistry:
+    ''' Agents by name, each built by its factory on first use
+    '''
+
+    def __init__(self, env, factories = None):
+        ''' Initialize the registry
+
+        Args:
+            env (Env): Environment whose np_random and num_actions are passed to the agents
+            factories (dict): Name to factory, a function of the registry returning the agent (AGENT_FACTORIES by default)
+        '''
+        self.env = env
+        self.factories = dict(AGENT_FACTORIES if factories is None else factories)
+        self.agents = {}
+
+    def register(self, name, factory):
+        self.factories[name] = factory
+
+    def get(self, name):
+        ''' The agent registered as name, built on the first call
+
+        Raises:
+            KeyError: If no factory is registered as name
+        '''
+        if name not in self.agents:
+            if name not in self.factories:
+                raise KeyError('Unknown agent {}, registered agents: {}'.format(name, ', '.join(sorted(self.factories))))
+            self.agents[name] = self.factories[name](self)
+        return self.agents[name]
+
+
+def is_cache_fresh(cache_path, source_files):
+    ''' Whether cache_path exists and is not older than any of its (existing) source files
+    '''
+    return os.path.exists(cache_path) and all(os.path.getmtime(cache_path) >= os.path.getmtime(path) for path in source_files if os.path.exists(path))
+
+def load_cached_policy(cache_path, solve, source_files = PROBABILITY_FILES):
+    ''' Policy (state key to action) from a binary cache, solved and cached first if the cache is missing or older
+    than one of its source files
+
+    Args:
+        cache_path (str): Cache file
+        solve (function): Returns the policy when there is no valid cache
+        source_files (list): Files the policy is computed from
+
+    Returns:
+        (dict): State key to action
+    '''
+    if is_cache_fresh(cache_path, source_files):
+        arrays, state_keys, _ = read_arrays(cache_path)
+        return dict(zip(state_keys, [ACTIONS[action_id] for action_id in arrays['policy'].tolist()]))
+    policy = solve()
+    state_keys = list(policy)
+    write_arrays(cache_path, { 'policy': np.array([ACTIONS.index(policy[state_key]) for state_key in state_keys], dtype=np.int8) }, state_keys)
+    return policy
+
+def _random_agent(registry):
+    return RandomAgent(registry.env.np_random, True)
+
+def _threshold_agent(registry):
+    return ThresholdAgent(True)
+
+def _policy_iteration_agent(opponent_name, cache_path, print_enabled):
+    def factory(registry):
+        solve = lambda: PolicyIterationAgent(registry.env.np_random, False, registry.get(opponent_name)).P_opt
+        return PolicyIterationAgent(registry.env.np_random, print_enabled, None, policy = load_cached_policy(cache_path, solve))
+    return factory
+
+def _q_learning_agent(q_model_file):
+    def factory(registry):
+        if not is_cache_fresh(q_model_file + '.qck', [q_model_file + '.json']): # convert json model to a binary checkpoint, later runs only map the checkpoint until the json model changes
+            convert_json_model(q_model_file + '.json', q_model_file + '.qck')
+        return ArrayQLearningAgent(registry.env.np_random, False, load_checkpoint(q_model_file + '.qck'), is_learning = False)
+    return factory
+
+def _human_agent(registry):
+    return HumanAgent(registry.env.num_actions, registry.get('q_learning'))
+
+AGENT_FACTORIES = {
+    'random': _random_agent,
+    'threshold': _threshold_agent,
+    'pi_random': _policy_iteration_agent('random', 'pi_random_policy.qck', True),
+    'pi_threshold': _policy_iteration_agent('threshold', 'pi_threshold_policy.qck', False),
+    'q_learning': _q_learning_agent('q_threshold_model'), # <---- pretrained Q Learning Agent (files provided: q_threshold_model.json, q_random_model.json)
+    'human': _human_agent,
+}
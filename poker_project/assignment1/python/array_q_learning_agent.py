@@ -0,0 +1,96 @@
+from q_learning_agent import QLearningAgent
+from array_q_model import ArrayQModel
+
+
+class ArrayQLearningAgent(QLearningAgent):
+    ''' QLearningAgent with its Q values and policy stored in an ArrayQModel, and optional experience replay
+
+    Every observed transition is learned online exactly like QLearningAgent does. With a replay buffer,
+    transitions are also stored, and at the end of every hand replay_ratio transitions per observed one
+    are replayed in minibatches with vectorized Q updates.
+    '''
+
+    def __init__(self, np_random, print_enabled, pretrained_model = None, is_learning = True, initial_epsilon = 1.0, initial_alpha = 1.0, epsilon_decay = -1/4, alpha_decay = -1/4, state_space = None, replay_buffer = None, replay_ratio = 0, replay_batch_size = 32):
+        ''' Initialize the agent
+
+        Args:
+            replay_buffer (ReplayBuffer): Buffer for experience replay, None disables replay
+            replay_ratio (float): Number of replayed transitions per observed transition
+            replay_batch_size (int): Number of transitions per replay minibatch
+            pretrained_model (dict or ArrayQModel): Pretrained model, e.g. loaded by checkpoint.load_checkpoint()
+            Other arguments as in QLearningAgent, the model must be initialized by state_space or pretrained_model
+        '''
+        super().__init__(np_random, print_enabled, pretrained_model, is_learning, initial_epsilon, initial_alpha, epsilon_decay, alpha_decay, state_space)
+        self.replay_buffer = replay_buffer
+        self.replay_ratio = replay_ratio
+        self.replay_batch_size = replay_batch_size
+        self.replay_credit = 0.0 # transitions owed to replay, carried over between hands
+
+    def _initialize_model(self, pretrained_model, state_space):
+        if isinstance(pretrained_model, ArrayQModel):
+            self.array_model = pretrained_model
+            self.model = { 'Q': {}, 'episode_num': pretrained_model.episode_num, 'policy': {}} # filled by sync_model()
+        else:
+            super()._initialize_model(pretrained_model, state_space)
+            if self.explore_state_space:
+                raise ValueError('ArrayQLearningAgent needs a state space or a pretrained model')
+            self.array_model = ArrayQModel.from_model(self.model)
+
+    def step(self, state):
+        ''' Choose action for next step of Q Learning Algorithm using an e-greedy approach
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            action (str): the chosen action
+        '''
+        if self.print_enabled: self._print_state(state['raw_obs'], state['action_record'])
+        if self.is_learning and self.np_random.binomial(1, self.epsilon) == 1:
+            return self.np_random.choice(state['raw_legal_actions'])
+        return ArrayQModel.ACTIONS[self.array_model.policy[self.array_model.get_state_id(state)]]
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Online Q update from the latest transition, plus experience replay at the end of each hand
+        '''
+        if not self.is_learning or len(states) < 2: # nothing to learn before the first action
+            return
+        model = self.array_model
+        Q = model.Q
+        state_id = model.get_state_id(states[-2])
+        action = ArrayQModel.ACTION_IDS[action_history[-1]]
+        if payoff == None: # no reward received yet, considered as 0
+            next_state_id = model.get_state_id(states[-1])
+            target = self.gamma * Q[next_state_id].max()
+            reward, done = 0.0, False
+        else: # reached terminal state, maximization term for further actions is 0
+            next_state_id = 0
+            target = reward = payoff
+            done = True
+        Q[state_id, action] += self.alpha * (target - Q[state_id, action])
+        model.update_policy([state_id], self.np_random)
+
+        if self.replay_buffer is not None:
+            self.replay_buffer.add(state_id, action, reward, next_state_id, done)
+            self.replay_credit += self.replay_ratio
+
+        if done:
+            self.model['episode_num'] += 1
+            self._update_epsilon()
+            self._update_alpha()
+            if self.replay_buffer is not None:
+                self.replay()
+
+    def replay(self):
+        ''' Replay as many minibatches as the accumulated replay credit allows
+        '''
+        while self.replay_credit >= self.replay_batch_size:
+            self.array_model.td_update(*self.replay_buffer.sample(self.replay_batch_size), self.alpha, self.gamma, self.np_random)
+            self.replay_credit -= self.replay_batch_size
+
+    def sync_model(self):
+        ''' Write the Q values and policy of the arrays back to the dictionary model (e.g. before storing it as json)
+        '''
+        self.array_model.episode_num = self.model['episode_num']
+        self.array_model.write_to_model(self.model)
+        return self.model
@@ -0,0 +1,113 @@
+import numpy as np
+from round import Round
+from utils import get_state_key
+
+
+class ArrayQModel:
+    ''' Array-backed counterpart of QLearningAgent.model
+
+    Q values are stored in a (number of states, number of actions) array, where rows are indexed by
+    state id and columns by the index of the action in Round.FULL_ACTIONS. Illegal actions hold -inf,
+    so that a plain max/argmax over a row only considers the legal actions of the state.
+    The policy is stored as an array of action indices.
+    '''
+
+    ACTIONS = Round.FULL_ACTIONS
+    ACTION_IDS = {action: index for index, action in enumerate(Round.FULL_ACTIONS)}
+
+    def __init__(self, state_keys, Q, policy, episode_num = 0):
+        ''' Initialize the model
+
+        Args:
+            state_keys (list): State key of each state id
+            Q (np.ndarray): Q values of shape (len(state_keys), len(ArrayQModel.ACTIONS)), -inf for illegal actions
+            policy (np.ndarray): Index of the action chosen per state id
+            episode_num (int): Number of completed episodes (hands) so far
+        '''
+        self.state_keys = state_keys
+        self.state_ids = {state_key: state_id for state_id, state_key in enumerate(state_keys)}
+        self.Q = Q
+        self.legal = np.isfinite(Q)
+        self.policy = policy
+        self.episode_num = episode_num
+
+    @staticmethod
+    def from_model(model):
+        ''' Convert a dictionary model of QLearningAgent (as stored in json files) to arrays
+
+        Args:
+            model (dict): Dictionary with keys 'Q', 'policy' and 'episode_num'
+
+        Returns:
+            (ArrayQModel): The equivalent array model
+        '''
+        state_keys = sorted(model['Q'])
+        Q = np.full((len(state_keys), len(ArrayQModel.ACTIONS)), -np.inf)
+        policy = np.zeros(len(state_keys), dtype=np.int8)
+        for state_id, state_key in enumerate(state_keys):
+            for action, value in model['Q'][state_key].items():
+                Q[state_id, ArrayQModel.ACTION_IDS[action]] = value
+            policy[state_id] = ArrayQModel.ACTION_IDS[model['policy'][state_key]]
+        return ArrayQModel(state_keys, Q, policy, model['episode_num'])
+
+    def to_model(self):
+        ''' Convert the arrays back to a dictionary model of QLearningAgent
+
+        Returns:
+            (dict): Dictionary with keys 'Q', 'policy' and 'episode_num'
+        '''
+        model = { 'Q': {}, 'episode_num': int(self.episode_num), 'policy': {}}
+        self.write_to_model(model)
+        return model
+
+    def write_to_model(self, model):
+        ''' Copy Q values, policy and episode number into an existing dictionary model (e.g. QLearningAgent.model)
+        '''
+        for state_id, state_key in enumerate(self.state_keys):
+            model['Q'][state_key] = {self.ACTIONS[action_id]: float(self.Q[state_id, action_id]) for action_id in np.flatnonzero(self.legal[state_id])}
+            model['policy'][state_key] = self.ACTIONS[self.policy[state_id]]
+        model['episode_num'] = int(self.episode_num)
+
+    def get_state_id(self, state):
+        ''' Get the state id of an extracted state (see env._extract_state())
+        '''
+        return self.state_ids[get_state_key(state['obs'])]
+
+    def greedy_actions(self, state_ids, np_random):
+        ''' Index of the action with the max Q value for each state id, in case of ties, pick randomly
+        '''
+        rows = self.Q[state_ids]
+        is_max = rows == rows.max(axis=1, keepdims=True)
+        return np.argmax(np.where(is_max, np_random.random_sample(rows.shape), -1.0), axis=1)
+
+    def random_actions(self, state_ids, np_random):
+        ''' Index of a uniformly chosen legal action for each state id
+        '''
+        legal = self.legal[state_ids]
+        return np.argmax(np.where(legal, np_random.random_sample(legal.shape), -1.0), axis=1)
+
+    def td_update(self, state_ids, actions, rewards, next_state_ids, dones, alpha, gamma, np_random):
+        ''' Batched Q-learning update, followed by a policy update of the affected states
+
+        Updates of the same (state, action) pair within a batch are summed, all computed from the Q values
+        before the batch.
+
+        Args:
+            state_ids (np.ndarray): State ids of the transitions
+            actions (np.ndarray): Action indices of the transitions
+            rewards (np.ndarray): Rewards of the transitions (payoff for terminal transitions, else 0)
+            next_state_ids (np.ndarray): Next state ids of the transitions, any valid id for terminal transitions
+            dones (np.ndarray): True for terminal transitions
+            alpha (float): Learning rate
+            gamma (float): Discount factor
+            np_random (RandomState): Used to break ties of the policy update
+        '''
+        Q = self.Q
+        targets = np.where(dones, rewards, rewards + gamma * Q[next_state_ids].max(axis=1))
+        np.add.at(Q, (state_ids, actions), alpha * (targets - Q[state_ids, actions]))
+        self.update_policy(state_ids, np_random)
+
+    def update_policy(self, state_ids, np_random):
+        ''' Update policy for the given state ids based on current Q values
+        '''
+        self.policy[state_ids] = self.greedy_actions(state_ids, np_random)
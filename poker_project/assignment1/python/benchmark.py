@@ -0,0 +1,206 @@
+''' Benchmark suite for the simulator, the solvers and the learners
+
+Every benchmark runs with fixed seeds and reports one or more metrics. Results are written as json and can be
+compared against a stored baseline, failing (exit code 1) if a metric regressed by more than the tolerance:
+
+    python benchmark.py --output benchmark_results.json --baseline benchmark_baseline.json
+
+WARNING: The probability json files created by the notebook are loaded (unless --with-probabilities recomputes them).
+'''
+
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+from env import Env
+from game import Game
+from dealer import Dealer
+from player import Player
+from judger import Judger
+from random_agent import RandomAgent
+from threshold_agent import ThresholdAgent
+from policy_iteration_agent import PolicyIterationAgent
+from q_learning_agent import QLearningAgent
+from array_q_model import ArrayQModel
+import seeding
+
+
+def _best_time(function, repeat):
+    ''' Minimum wall-clock time of repeat calls, together with the result of the last call
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+def _metric(value, unit, higher_is_better):
+    return { 'value': value, 'unit': unit, 'higher_is_better': higher_is_better }
+
+def _run_hands(env, num_hands):
+    for _ in range(num_hands):
+        env.run()
+
+PAIRINGS = ['random_vs_random', 'random_vs_threshold', 'policy_iteration_vs_random', 'policy_iteration_vs_threshold']
+
+def _make_agents(pairing, env, solvers):
+    agent, opponent = pairing.split('_vs_')
+    agents = [RandomAgent(env.np_random, False) if agent == 'random' else solvers[opponent]] # solved agents only look up their policy
+    agents.append(RandomAgent(env.np_random, False) if opponent == 'random' else ThresholdAgent(False))
+    return agents
+
+def benchmark_env_run(probabilities, num_hands, repeat):
+    ''' Env.run throughput for every agent pairing
+    '''
+    np_random, _ = seeding.np_random(0)
+    solvers = {'random': PolicyIterationAgent(np_random, False, RandomAgent(np_random, False), probabilities), 'threshold': PolicyIterationAgent(np_random, False, ThresholdAgent(False), probabilities)}
+    results = {}
+    for pairing in PAIRINGS:
+        def run():
+            env = Env({ 'allow_step_back': False, 'seed': 0 })
+            env.set_agents(_make_agents(pairing, env, solvers))
+            start_time = time.perf_counter()
+            _run_hands(env, num_hands)
+            return time.perf_counter() - start_time
+        results['env_run.' + pairing] = _metric(num_hands / min(run() for _ in range(repeat)), 'hands/s', True)
+    return results
+
+def benchmark_judge_game(num_deals, repeat):
+    ''' Judger.judge_game throughput over random deals
+    '''
+    np_random, _ = seeding.np_random(0)
+    deck = Dealer.init_standard_deck()
+    deals = [np_random.choice(len(deck), 4, replace=False) for _ in range(num_deals)]
+    players = [Player(0), Player(1)]
+    for player in players:
+        player.in_chips = 1
+    def run():
+        for deal in deals:
+            players[0].hand, players[1].hand = [deck[deal[0]]], [deck[deal[1]]]
+            Judger.judge_game(players, [deck[deal[2]], deck[deal[3]]])
+    seconds, _ = _best_time(run, repeat)
+    return { 'judge_game': _metric(num_deals / seconds, 'judgements/s', True) }
+
+def benchmark_transition_probabilities():
+    ''' Game.get_transition_probabilities_for_cards runtime (single run, it takes several seconds)
+
+    Returns:
+        (tuple): Results and the computed probabilities
+    '''
+    seconds, probabilities = _best_time(Game.get_transition_probabilities_for_cards, 1)
+    return { 'transition_probabilities': _metric(seconds, 's', False) }, probabilities
+
+def benchmark_solvers(probabilities, repeat):
+    ''' State space build time per opponent and policy iteration solve time
+    '''
+    results = {}
+    np_random, _ = seeding.np_random(0)
+    for name, opponent in [('random', RandomAgent(np_random, False)), ('threshold', ThresholdAgent(False))]:
+        seconds, state_space = _best_time(lambda: opponent.calculate_state_space(*probabilities), repeat)
+        results['state_space.' + name] = _metric(seconds, 's', False)
+        solver = PolicyIterationAgent(np_random, False, opponent, probabilities)
+        seconds, _ = _best_time(lambda: solver.policy_iteration(solver.state_space, gamma = 1.0), repeat)
+        results['policy_iteration.' + name] = _metric(seconds, 's', False)
+    return results
+
+def benchmark_q_learning(state_space, num_hands, batch_size, repeat):
+    ''' Online Q Learning updates/sec inside Env.run, and batched ArrayQModel.td_update updates/sec
+    '''
+    def run():
+        env = Env({ 'allow_step_back': False, 'seed': 0 })
+        agent = QLearningAgent(env.np_random, False, is_learning = True, state_space = state_space)
+        env.set_agents([agent, RandomAgent(env.np_random, False)])
+        num_updates = 0
+        start_time = time.perf_counter()
+        for _ in range(num_hands):
+            env.run()
+            num_updates += sum(1 for player_id, _ in env.action_recorder if player_id == 0) # one update per action of the learner
+        return time.perf_counter() - start_time, num_updates
+    seconds, num_updates = min(run() for _ in range(repeat))
+    results = { 'q_learning.online': _metric(num_updates / seconds, 'updates/s', True) }
+
+    np_random, _ = seeding.np_random(0)
+    model = ArrayQModel.from_model(QLearningAgent(np_random, False, state_space = state_space).model)
+    num_states = len(model.state_keys)
+    state_ids = np_random.randint(0, num_states, size=batch_size)
+    actions = model.random_actions(state_ids, np_random)
+    batch = (state_ids, actions, np_random.choice([-1.0, 0.0, 1.0], size=batch_size), np_random.randint(0, num_states, size=batch_size), np_random.binomial(1, 0.3, size=batch_size).astype(bool))
+    seconds, _ = _best_time(lambda: model.td_update(*batch, 0.1, 1.0, np_random), repeat)
+    results['q_learning.batched'] = _metric(batch_size / seconds, 'updates/s', True)
+    return results
+
+def run_benchmarks(with_probabilities = False, num_hands = 10**4, repeat = 3):
+    ''' Run all benchmarks
+
+    Args:
+        with_probabilities (boolean): Also benchmark (and use) Game.get_transition_probabilities_for_cards, else load the json files
+        num_hands (int): Hands per throughput benchmark
+        repeat (int): Repetitions per benchmark, the best one is reported
+
+    Returns:
+        (dict): Dictionary with keys 'metadata' and 'results' (metric name to value, unit and direction)
+    '''
+    results = {}
+    if with_probabilities:
+        probability_results, probabilities = benchmark_transition_probabilities()
+        results.update(probability_results)
+    else:
+        probabilities = PolicyIterationAgent.load_probabilities()
+    results.update(benchmark_judge_game(10 * num_hands, repeat))
+    results.update(benchmark_solvers(probabilities, repeat))
+    results.update(benchmark_env_run(probabilities, num_hands, repeat))
+    np_random, _ = seeding.np_random(0)
+    random_state_space = RandomAgent(np_random, False).calculate_state_space(*probabilities)
+    results.update(benchmark_q_learning(random_state_space, num_hands, 10**5, repeat))
+    metadata = { 'python': sys.version.split()[0], 'numpy': np.__version__, 'platform': platform.platform(), 'num_hands': num_hands, 'repeat': repeat, 'time': time.strftime('%Y-%m-%d %H:%M:%S') }
+    return { 'metadata': metadata, 'results': results }
+
+def compare(results, baseline, tolerance):
+    ''' Compare results against a baseline
+
+    Args:
+        results (dict): Output of run_benchmarks()
+        baseline (dict): Earlier output of run_benchmarks()
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        (list): Tuples of (metric name, baseline value, value, relative change where positive is better, is regression)
+    '''
+    rows = []
+    for name, metric in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        old_value = baseline['results'][name]['value']
+        change = (metric['value'] / old_value - 1) if metric['higher_is_better'] else (old_value / metric['value'] - 1)
+        rows.append((name, old_value, metric['value'], change, change < -tolerance))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark suite for the simulator, the solvers and the learners')
+    parser.add_argument('--output', default='benchmark_results.json', help='json file for the results')
+    parser.add_argument('--baseline', help='json file of earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown before a metric counts as regression')
+    parser.add_argument('--hands', type=int, default=10**4, help='hands per throughput benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions per benchmark, the best one is reported')
+    parser.add_argument('--with-probabilities', action='store_true', help='also benchmark the probability precompute (slow)')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.with_probabilities, args.hands, args.repeat)
+    with open(args.output, 'w') as json_file:
+        json.dump(results, json_file, indent=4)
+    for name, metric in results['results'].items():
+        print('%-40s %14.4g %s' % (name, metric['value'], metric['unit']))
+
+    if args.baseline:
+        with open(args.baseline) as json_file:
+            baseline = json.load(json_file)
+        rows = compare(results, baseline, args.tolerance)
+        print('\n%-40s %14s %14s %9s' % ('metric', 'baseline', 'current', 'change'))
+        for name, old_value, value, change, is_regression in rows:
+            print('%-40s %14.4g %14.4g %+8.1f%% %s' % (name, old_value, value, 100 * change, 'REGRESSION' if is_regression else ''))
+        if any(row[-1] for row in rows):
+            sys.exit(1)
@@ -0,0 +1,245 @@
+''' Best response to a fixed policy and exploitability
+
+The best response is computed over the public tree of the game (betting histories and public cards), with the
+private information (the rank of both hands) held in numpy arrays: every public node carries a (5, 5) array of
+reach weights over (best responder hand, fixed player hand), the product of the chance probabilities and the
+probabilities of the fixed player's actions. One bottom-up pass returns, per hand of the best responder, the
+counterfactual value of each node: terminal nodes are evaluated for all hand pairs at once, fixed player nodes sum
+their children, and best responder nodes take the maximum over actions per hand (which is the best response).
+'''
+
+from itertools import combinations_with_replacement
+import numpy as np
+from game import Game
+from dealer import Dealer
+from player import Player
+from judger import Judger
+from card import Card
+from array_q_model import ArrayQModel
+from checkpoint import load_checkpoint
+from card_range import FULL_RANGE, get_range_string
+from utils import get_state_key
+
+RANKS = Dealer.RANK_LIST
+PUBLIC_CARDS = [''.join(sorted(ranks)) for ranks in combinations_with_replacement(RANKS, 2)]
+
+
+def _no_range_inference(action, game_round, current_range, other_chips, public_cards, position):
+    return FULL_RANGE
+
+
+def get_rank_tables():
+    ''' Chance probabilities and showdown outcomes over the ranks of both hands
+
+    Returns:
+        (tuple): Tuple containing:
+
+            (np.ndarray): (5, 5) probabilities of the hands of both players
+            (dict): Public cards to (5, 5) probabilities of the public cards given the hands
+            (dict): Public cards to (5, 5) showdown outcome for the first player (1 win, 0 tie, -1 loss)
+    '''
+    num_cards, num_suits = len(Dealer.init_standard_deck()), len(Dealer.SUIT_LIST)
+    hand_probabilities = np.zeros((len(RANKS), len(RANKS)))
+    public_probabilities = {public_cards: np.zeros((len(RANKS), len(RANKS))) for public_cards in PUBLIC_CARDS}
+    showdown = {public_cards: np.zeros((len(RANKS), len(RANKS))) for public_cards in PUBLIC_CARDS}
+    players = [Player(0), Player(1)]
+    for player in players:
+        player.in_chips = 1
+    for i, rank_0 in enumerate(RANKS):
+        for j, rank_1 in enumerate(RANKS):
+            hand_probabilities[i, j] = num_suits / num_cards * (num_suits - (rank_0 == rank_1)) / (num_cards - 1)
+            players[0].hand, players[1].hand = [Card('S', rank_0)], [Card('H', rank_1)]
+            remaining = num_cards - 2
+            for public_cards in PUBLIC_CARDS:
+                left = [num_suits - (rank_0 == rank) - (rank_1 == rank) for rank in public_cards]
+                if public_cards[0] == public_cards[1]:
+                    public_probabilities[public_cards][i, j] = left[0] * (left[0] - 1) / (remaining * (remaining - 1))
+                else:
+                    public_probabilities[public_cards][i, j] = 2 * left[0] * left[1] / (remaining * (remaining - 1))
+                showdown[public_cards][i, j] = Judger.judge_game(players, [Card('D', public_cards[0]), Card('C', public_cards[1])])[0]
+    return hand_probabilities, public_probabilities, showdown
+
+
+class BestResponse:
+    ''' Best response of the other seat to a fixed policy
+    '''
+
+    def __init__(self, policy, range_inference = None):
+        ''' Initialize the best response
+
+        Args:
+            policy (dict): State key to action (e.g. PolicyIterationAgent.P_opt or QLearningAgent.model['policy']), or
+                state key to a dictionary of action to probability
+            range_inference (function): infer_card_range_from_action() applied to the best responder's actions to
+                get the opponent range of the fixed player's state keys. By default the range stays full, as against
+                RandomAgent or any agent whose model is unknown
+        '''
+        self.policy = policy
+        self.range_inference = range_inference or _no_range_inference
+        self.hand_probabilities, self.public_probabilities, self.showdown = get_rank_tables()
+
+    def compute(self):
+        ''' Best response in both positions
+
+        Returns:
+            (dict): Keys 'value' (expected payoff of the best response, averaged over both positions as the blind
+                is random), 'values' (position to expected payoff), 'policy' (information set key, see
+                get_information_set_key(), to best action) and 'unknown_states' (number of states of the fixed
+                player missing from its policy, where it is assumed to play uniformly at random)
+        '''
+        self.best_response_policy = {}
+        self.unknown_states = set()
+        values = {}
+        for best_responder, position in [(0, 'first'), (1, 'second')]: # seat 0 is the small blind
+            self.game = Game(allow_step_back = True)
+            self.game.np_random = None # not used with an explicit deal
+            self.game.init_game((tuple(Dealer.init_standard_deck()), 0)) # only the betting rules of the game are used, not its cards
+            self.best_responder = best_responder
+            node_values = self._traverse(self.hand_probabilities, 'none', FULL_RANGE, [])
+            values[position] = float(node_values.sum())
+        return { 'value': (values['first'] + values['second']) / 2, 'values': values, 'policy': self.best_response_policy, 'unknown_states': len(self.unknown_states) }
+
+    def _traverse(self, weights, public_cards, fixed_range, history):
+        ''' Counterfactual values of the current node per hand of the best responder
+
+        Args:
+            weights (np.ndarray): (5, 5) reach weights over (best responder hand, fixed player hand)
+            public_cards (str): Public cards of the node, 'none' in the first round
+            fixed_range (int): Opponent range in the fixed player's state
+            history (list): Actions so far
+
+        Returns:
+            (np.ndarray): Value of the node for each hand of the best responder
+        '''
+        game = self.game
+        best_responder, fixed_player = game.players[self.best_responder], game.players[1 - self.best_responder]
+        if game.is_over():
+            if fixed_player.status == 'folded':
+                return weights.sum(axis=1) * fixed_player.in_chips
+            if best_responder.status == 'folded':
+                return -weights.sum(axis=1) * best_responder.in_chips
+            return (weights * self.showdown[public_cards]).sum(axis=1) * best_responder.in_chips
+
+        legal_actions = game.round.get_legal_actions()
+        if game.game_pointer == self.best_responder:
+            other_chips = int(fixed_player.in_chips - best_responder.in_chips)
+            action_values = []
+            for action in legal_actions:
+                new_range = self.range_inference(action, game.round_counter + 1, fixed_range, other_chips, public_cards, best_responder.position)
+                action_values.append(self._step(action, weights, public_cards, new_range, history))
+            action_values = np.array(action_values)
+            for hand_index, best_action in enumerate(action_values.argmax(axis=0)):
+                self.best_response_policy[get_information_set_key(best_responder.position, RANKS[hand_index], public_cards, history)] = legal_actions[best_action]
+            return action_values.max(axis=0)
+
+        values = np.zeros(len(RANKS))
+        probabilities = self._fixed_probabilities(fixed_player, int(best_responder.in_chips - fixed_player.in_chips), public_cards, fixed_range, legal_actions)
+        for action_index, action in enumerate(legal_actions):
+            if probabilities[:, action_index].any():
+                values += self._step(action, weights * probabilities[:, action_index], public_cards, fixed_range, history)
+        return values
+
+    def _step(self, action, weights, public_cards, fixed_range, history):
+        ''' Values of the child reached by action, branching over the public cards when the first round ends
+        '''
+        game = self.game
+        round_counter = game.round_counter
+        game.step(action)
+        history.append(action)
+        if round_counter == 0 and game.round_counter == 1 and not game.is_over():
+            values = np.zeros(len(RANKS))
+            for new_public_cards in PUBLIC_CARDS:
+                values += self._traverse(weights * self.public_probabilities[new_public_cards], new_public_cards, fixed_range, history)
+        else:
+            values = self._traverse(weights, public_cards, fixed_range, history)
+        history.pop()
+        game.step_back()
+        return values
+
+    def _fixed_probabilities(self, fixed_player, other_chips, public_cards, fixed_range, legal_actions):
+        ''' (5, number of legal actions) probabilities of the fixed player's actions per hand
+        '''
+        probabilities = np.zeros((len(RANKS), len(legal_actions)))
+        for hand_index, hand in enumerate(RANKS):
+            state_key = get_state_key({ 'position': fixed_player.position, 'my_chips': fixed_player.in_chips, 'other_chips': other_chips, 'hand': hand, 'public_cards': public_cards, 'opponent_range': get_range_string(fixed_range) })
+            choice = self.policy.get(state_key)
+            if choice is None:
+                self.unknown_states.add(state_key)
+                probabilities[hand_index] = 1.0 / len(legal_actions)
+            elif isinstance(choice, dict):
+                probabilities[hand_index] = [choice.get(action, 0.0) for action in legal_actions]
+            else:
+                probabilities[hand_index, legal_actions.index(choice)] = 1.0
+        return probabilities
+
+
+def exploitability(policy, range_inference = None):
+    ''' Expected payoff of the best response to policy (0 for a policy that cannot be exploited, as the game is
+    symmetric once the blind is random)
+
+    Args:
+        policy (dict): State key to action or to a dictionary of action to probability
+        range_inference (function): See BestResponse
+
+    Returns:
+        (float): Exploitability in chips per hand
+    '''
+    return BestResponse(policy, range_inference).compute()['value']
+
+def checkpoint_exploitability(path):
+    ''' Exploitability of the greedy policy of a checkpoint (see checkpoint.CheckpointWriter), to track the strength
+    of a policy during training without playing it
+    '''
+    model = load_checkpoint(path)
+    return exploitability({state_key: ArrayQModel.ACTIONS[action_id] for state_key, action_id in zip(model.state_keys, model.policy)})
+
+def get_information_set_key(position, hand, public_cards, history):
+    ''' Key of an information set of the best responder: its position, hand, the public cards and all actions so
+    far (the rules determine where the first round ended), e.g. 'first_K_AQ_check-bet-bet-check'
+    '''
+    return position + '_' + hand + '_' + public_cards + '_' + '-'.join(history)
+
+
+class BestResponseAgent:
+    ''' Agent playing a best response policy (see BestResponse.compute())
+    '''
+
+    def __init__(self, best_response_policy):
+        self.policy = best_response_policy
+        self.use_raw = True
+
+    def step(self, state):
+        history = [action for _, action in state['action_record']]
+        return self.policy[get_information_set_key(state['obs']['position'], state['obs']['hand'], state['obs']['public_cards'], history)]
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Method only needed for online learning
+        '''
+        pass
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        return FULL_RANGE # range cannot be inferred by agent's actions
+
+
+if __name__ == '__main__':
+    # Exploitability of the policies of the notebook
+    # WARNING: The probability json files created by the notebook are loaded
+    import json
+    import time
+    import seeding
+    from random_agent import RandomAgent
+    from policy_iteration_agent import PolicyIterationAgent
+
+    np_random, _ = seeding.np_random(0)
+    policy_iteration_agent = PolicyIterationAgent(np_random, False, RandomAgent(np_random, False))
+    policies = { 'Policy Iteration (vs Random)': policy_iteration_agent.P_opt }
+    for name, file_name in [('Q Learning (vs Random)', 'q_random_model.json'), ('Q Learning (vs Threshold)', 'q_threshold_model.json')]:
+        try:
+            with open(file_name) as json_file:
+                policies[name] = json.load(json_file)['policy']
+        except FileNotFoundError:
+            pass
+    for name, policy in policies.items():
+        start_time = time.perf_counter()
+        result = BestResponse(policy).compute()
+        print('%-30s exploitability %.4f (first %.4f, second %.4f), %d unknown states, %.2fs' % (name, result['value'], result['values']['first'], result['values']['second'], result['unknown_states'], time.perf_counter() - start_time))
@@ -0,0 +1,44 @@
+''' Ranges of possible opponent hands as 5-bit masks over Dealer.RANK_LIST
+
+Bit i of a range is set if the opponent may hold a card of rank Dealer.RANK_LIST[i], so intersection and
+membership are bitwise operations and counting is a popcount. The string view of a range (ranks in alphabetical
+order, e.g. 'AJKQT', or 'none' for the empty range) is only used for state keys, json files and display.
+'''
+
+from dealer import Dealer
+
+RANK_BITS = {rank: 1 << index for index, rank in enumerate(Dealer.RANK_LIST)}
+FULL_RANGE = (1 << len(Dealer.RANK_LIST)) - 1
+EMPTY_RANGE = 0
+RANGE_STRINGS = [''.join(sorted(rank for rank in Dealer.RANK_LIST if mask & RANK_BITS[rank])) or 'none' for mask in range(FULL_RANGE + 1)]
+RANGE_MASKS = {range_string: mask for mask, range_string in enumerate(RANGE_STRINGS)}
+RANGE_SIZES = [bin(mask).count('1') for mask in range(FULL_RANGE + 1)]
+
+
+def get_range_mask(range_string):
+    ''' Mask of a range given by its ranks in any order, or 'none'
+    '''
+    if range_string == 'none':
+        return EMPTY_RANGE
+    mask = EMPTY_RANGE
+    for rank in range_string:
+        mask |= RANK_BITS[rank]
+    return mask
+
+def get_range_string(mask):
+    ''' String view of a range, as used in state keys and probability files
+    '''
+    return RANGE_STRINGS[mask]
+
+def get_probabilities_by_mask(win_probabilities, loss_probabilities, flop_probabilities, range_probabilities):
+    ''' Re-key the ranges of the probability tables (as returned by Game.get_transition_probabilities_for_cards() or
+    loaded from their json files) by mask, keeping hands and public cards as strings
+
+    Returns:
+        (list): win, loss, flop and range probabilities
+    '''
+    win_by_mask = {hand: {public_cards: {get_range_mask(opponent_range): prob for opponent_range, prob in by_range.items()} for public_cards, by_range in by_public.items()} for hand, by_public in win_probabilities.items()}
+    loss_by_mask = {hand: {public_cards: {get_range_mask(opponent_range): prob for opponent_range, prob in by_range.items()} for public_cards, by_range in by_public.items()} for hand, by_public in loss_probabilities.items()}
+    flop_by_mask = {hand: {get_range_mask(opponent_range): by_public for opponent_range, by_public in by_range.items()} for hand, by_range in flop_probabilities.items()}
+    range_by_mask = {hand: {public_cards: {get_range_mask(opponent_range): {get_range_mask(new_opponent_range): prob for new_opponent_range, prob in by_new_range.items()} for opponent_range, by_new_range in by_range.items()} for public_cards, by_range in by_public.items()} for hand, by_public in range_probabilities.items()}
+    return [ win_by_mask, loss_by_mask, flop_by_mask, range_by_mask ]
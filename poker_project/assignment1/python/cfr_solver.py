@@ -0,0 +1,304 @@
+''' CFR+ equilibrium solver and average strategy agent
+
+The public tree of the game (betting histories of Game/Round and the public cards) is built once into flat lists.
+An information set is a decision node of the public tree together with the rank of the acting player's hand, so
+regrets and strategy sums are arrays of shape (number of decision nodes, 5 hands, 4 actions) indexed by the node
+id. Every pass over the tree works on all hands at once: reach probabilities are vectors over the hands of each
+player and chance nodes weight (5, 5) matrices over the hands of both players (see best_response.get_rank_tables()).
+
+CFR+ updates the players alternately, clips the cumulative regrets at zero (regret matching+) and weights the
+average strategy linearly by iteration. The exploitability of the average strategy is computed by a best response
+pass over the same tree.
+'''
+
+import time
+import numpy as np
+from game import Game
+from dealer import Dealer
+from round import Round
+from best_response import RANKS, PUBLIC_CARDS, get_rank_tables, get_information_set_key
+from card_range import FULL_RANGE
+
+TERMINAL, CHANCE, DECISION = 0, 1, 2
+POSITIONS = ['first', 'second'] # player 0 of the tree is in first position (small blind)
+
+
+class CFRSolver:
+    ''' CFR+ over the public tree, with hands enumerated in numpy arrays
+    '''
+
+    ACTIONS = Round.FULL_ACTIONS
+
+    def __init__(self):
+        ''' Build the public tree and initialize regrets and strategy sums
+        '''
+        self.hand_probabilities, self.public_probabilities, self.showdown = get_rank_tables()
+        self.node_types, self.node_players, self.node_children, self.node_values, self.node_keys = [], [], [], [], []
+        self.decision_ids = [] # decision id of each node (index into regrets), -1 for other nodes
+        self.legal_masks = []
+        game = Game(allow_step_back = True)
+        game.np_random = None # not used with an explicit deal
+        game.init_game((tuple(Dealer.init_standard_deck()), 0)) # only the betting rules of the game are used, not its cards
+        self.root = self._build(game, 'none', [])
+        self.legal_masks = np.array(self.legal_masks, dtype=bool)
+        self.regrets = np.zeros((len(self.legal_masks), len(RANKS), len(self.ACTIONS)))
+        self.strategy_sums = np.zeros((len(self.legal_masks), len(RANKS), len(self.ACTIONS)))
+        self.iteration = 0
+
+    def _build(self, game, public_cards, history):
+        ''' Add the subtree of the current game state to the tree
+
+        Returns:
+            (int): Node id
+        '''
+        node_id = len(self.node_types)
+        self.node_types.append(None)
+        self.node_players.append(game.game_pointer)
+        self.node_children.append([])
+        self.node_values.append(None)
+        self.node_keys.append(None)
+        self.decision_ids.append(-1)
+        first, second = game.players
+        if game.is_over():
+            self.node_types[node_id] = TERMINAL
+            if first.status == 'folded':
+                self.node_values[node_id] = -first.in_chips * np.ones((len(RANKS), len(RANKS)))
+            elif second.status == 'folded':
+                self.node_values[node_id] = second.in_chips * np.ones((len(RANKS), len(RANKS)))
+            else:
+                self.node_values[node_id] = first.in_chips * self.showdown[public_cards]
+            return node_id
+
+        self.node_types[node_id] = DECISION
+        self.decision_ids[node_id] = len(self.legal_masks)
+        legal_actions = game.round.get_legal_actions()
+        self.legal_masks.append([action in legal_actions for action in self.ACTIONS])
+        self.node_keys[node_id] = (POSITIONS[game.game_pointer], public_cards, list(history))
+        for action in self.ACTIONS:
+            if action not in legal_actions:
+                self.node_children[node_id].append(-1)
+                continue
+            round_counter = game.round_counter
+            game.step(action)
+            history.append(action)
+            if round_counter == 0 and game.round_counter == 1 and not game.is_over():
+                chance_id = len(self.node_types)
+                self.node_types.append(CHANCE)
+                self.node_players.append(-1)
+                self.node_children.append(None)
+                self.node_values.append(None)
+                self.node_keys.append(None)
+                self.decision_ids.append(-1)
+                self.node_children[chance_id] = [self._build(game, new_public_cards, history) for new_public_cards in PUBLIC_CARDS]
+                self.node_children[node_id].append(chance_id)
+            else:
+                self.node_children[node_id].append(self._build(game, public_cards, history))
+            history.pop()
+            game.step_back()
+        return node_id
+
+    def _current_strategy(self, decision_id):
+        ''' Regret matching: (5, 4) action probabilities proportional to the positive regrets, uniform over the
+        legal actions if there are none
+        '''
+        positive_regrets = np.maximum(self.regrets[decision_id], 0.0)
+        totals = positive_regrets.sum(axis=1, keepdims=True)
+        uniform = self.legal_masks[decision_id] / self.legal_masks[decision_id].sum()
+        return np.where(totals > 0, positive_regrets / np.where(totals > 0, totals, 1.0), uniform)
+
+    def average_strategy(self, decision_id):
+        ''' (5, 4) average strategy of a decision node, uniform for hands that never reached it
+        '''
+        totals = self.strategy_sums[decision_id].sum(axis=1, keepdims=True)
+        uniform = self.legal_masks[decision_id] / self.legal_masks[decision_id].sum()
+        return np.where(totals > 0, self.strategy_sums[decision_id] / np.where(totals > 0, totals, 1.0), uniform)
+
+    def _cfr(self, node_id, player, reaches, weights):
+        ''' CFR+ pass updating player
+
+        Args:
+            node_id (int): Node of the public tree
+            player (int): Player whose regrets are updated (0 first, 1 second)
+            reaches (list): Reach probabilities of the hands of both players
+            weights (np.ndarray): (5, 5) chance probabilities over the hands (first, second)
+
+        Returns:
+            (np.ndarray): Counterfactual values of the hands of player
+        '''
+        node_type = self.node_types[node_id]
+        if node_type == TERMINAL:
+            if player == 0:
+                return (weights * self.node_values[node_id] * reaches[1][None, :]).sum(axis=1)
+            return -(weights * self.node_values[node_id] * reaches[0][:, None]).sum(axis=0)
+        if node_type == CHANCE:
+            values = np.zeros(len(RANKS))
+            for public_cards, child_id in zip(PUBLIC_CARDS, self.node_children[node_id]):
+                values += self._cfr(child_id, player, reaches, weights * self.public_probabilities[public_cards])
+            return values
+
+        decision_id = self.decision_ids[node_id]
+        acting_player = self.node_players[node_id]
+        strategy = self._current_strategy(decision_id)
+        if acting_player == player:
+            action_values = np.zeros((len(RANKS), len(self.ACTIONS)))
+            for action_index, child_id in enumerate(self.node_children[node_id]):
+                if child_id >= 0:
+                    action_values[:, action_index] = self._cfr(child_id, player, reaches, weights)
+            values = (strategy * action_values).sum(axis=1)
+            self.regrets[decision_id] = np.maximum(self.regrets[decision_id] + (action_values - values[:, None]) * self.legal_masks[decision_id], 0.0)
+            return values
+
+        values = np.zeros(len(RANKS))
+        for action_index, child_id in enumerate(self.node_children[node_id]):
+            if child_id >= 0:
+                child_reaches = list(reaches)
+                child_reaches[acting_player] = reaches[acting_player] * strategy[:, action_index]
+                values += self._cfr(child_id, player, child_reaches, weights)
+        self.strategy_sums[decision_id] += self.iteration * reaches[acting_player][:, None] * strategy # linear averaging
+        return values
+
+    def _best_response(self, node_id, player, reaches, weights):
+        ''' Counterfactual values of the hands of player when it best responds to the average strategy of the other
+        '''
+        node_type = self.node_types[node_id]
+        if node_type == TERMINAL:
+            if player == 0:
+                return (weights * self.node_values[node_id] * reaches[1][None, :]).sum(axis=1)
+            return -(weights * self.node_values[node_id] * reaches[0][:, None]).sum(axis=0)
+        if node_type == CHANCE:
+            values = np.zeros(len(RANKS))
+            for public_cards, child_id in zip(PUBLIC_CARDS, self.node_children[node_id]):
+                values += self._best_response(child_id, player, reaches, weights * self.public_probabilities[public_cards])
+            return values
+
+        acting_player = self.node_players[node_id]
+        if acting_player == player:
+            return np.max([self._best_response(child_id, player, reaches, weights) for child_id in self.node_children[node_id] if child_id >= 0], axis=0)
+        strategy = self.average_strategy(self.decision_ids[node_id])
+        values = np.zeros(len(RANKS))
+        for action_index, child_id in enumerate(self.node_children[node_id]):
+            if child_id >= 0 and strategy[:, action_index].any():
+                child_reaches = list(reaches)
+                child_reaches[acting_player] = reaches[acting_player] * strategy[:, action_index]
+                values += self._best_response(child_id, player, child_reaches, weights)
+        return values
+
+    def exploitability(self):
+        ''' Exploitability of the average strategy: mean of the best response values in both positions (0 at an
+        equilibrium, as the game is symmetric once the blind is random)
+        '''
+        ones = [np.ones(len(RANKS)), np.ones(len(RANKS))]
+        return (self._best_response(self.root, 0, ones, self.hand_probabilities).sum() + self._best_response(self.root, 1, ones, self.hand_probabilities).sum()) / 2
+
+    def solve(self, num_iterations, evaluate_every = 1, print_enabled = True):
+        ''' Run CFR+ iterations
+
+        Args:
+            num_iterations (int): Number of iterations (each one updates both players)
+            evaluate_every (int): Compute the exploitability every evaluate_every iterations
+            print_enabled (boolean): Print iterations/sec and exploitability when evaluated
+
+        Returns:
+            (list): Dictionaries with keys 'iteration', 'exploitability' and 'iterations_per_second' (excluding the
+                time of the exploitability computation)
+        '''
+        history = []
+        ones = [np.ones(len(RANKS)), np.ones(len(RANKS))]
+        seconds = 0.0
+        for _ in range(num_iterations):
+            start_time = time.perf_counter()
+            self.iteration += 1
+            for player in [0, 1]:
+                self._cfr(self.root, player, ones, self.hand_probabilities)
+            seconds += time.perf_counter() - start_time
+            if self.iteration % evaluate_every == 0:
+                history.append({ 'iteration': self.iteration, 'exploitability': self.exploitability(), 'iterations_per_second': evaluate_every / seconds })
+                seconds = 0.0
+                if print_enabled: print('iteration %d: exploitability %.5f, %.0f iterations/sec' % (self.iteration, history[-1]['exploitability'], history[-1]['iterations_per_second']))
+        return history
+
+    def get_average_policy(self):
+        ''' Average strategy per information set
+
+        Returns:
+            (dict): Information set key (see best_response.get_information_set_key()) to a dictionary of legal action
+                to probability
+        '''
+        policy = {}
+        for node_id, decision_id in enumerate(self.decision_ids):
+            if decision_id < 0:
+                continue
+            position, public_cards, history = self.node_keys[node_id]
+            strategy = self.average_strategy(decision_id)
+            for hand_index, hand in enumerate(RANKS):
+                policy[get_information_set_key(position, hand, public_cards, history)] = {action: float(strategy[hand_index, action_index]) for action_index, action in enumerate(self.ACTIONS) if self.legal_masks[decision_id, action_index]}
+        return policy
+
+
+class CFRAgent:
+    ''' Agent sampling its actions from an average strategy of CFRSolver
+    '''
+
+    def __init__(self, np_random, print_enabled, policy):
+        ''' Initialize the agent
+
+        Args:
+            policy (dict): Output of CFRSolver.get_average_policy()
+        '''
+        self.np_random = np_random
+        self.print_enabled = print_enabled
+        self.policy = policy
+        self.use_raw = True
+
+    def action_probabilities(self, state):
+        ''' Probabilities of the actions chosen by step(), used by exact evaluation
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            (dict): Legal action to its probability
+        '''
+        history = [action for _, action in state['action_record']]
+        return self.policy[get_information_set_key(state['obs']['position'], state['obs']['hand'], state['obs']['public_cards'], history)]
+
+    def step(self, state):
+        ''' Sample an action from the average strategy
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            action (str): The sampled action
+        '''
+        probabilities = self.action_probabilities(state)
+        actions = list(probabilities)
+        return actions[self.np_random.choice(len(actions), p=list(probabilities.values()))]
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Method only needed for online learning
+        '''
+        pass
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        return FULL_RANGE # range cannot be inferred by agent's actions
+
+
+if __name__ == '__main__':
+    # Solve the game with CFR+ and play the average strategy against the agents of the notebook
+    import seeding
+    from env import Env
+    from random_agent import RandomAgent
+    from threshold_agent import ThresholdAgent
+    from evaluation import DuplicateEvaluation
+
+    solver = CFRSolver()
+    print('%d decision nodes, %d information sets' % (len(solver.legal_masks), len(solver.legal_masks) * len(RANKS)))
+    solver.solve(1000, evaluate_every = 100)
+
+    np_random, _ = seeding.np_random(0)
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    cfr_agent = CFRAgent(np_random, False, solver.get_average_policy())
+    for name, opponent in [('Random', RandomAgent(np_random, False)), ('Threshold', ThresholdAgent(False, agent_model_is_known = False))]:
+        result = DuplicateEvaluation(env, cfr_agent, opponent).estimate(target_half_width = 0.01)
+        print('CFR+ vs %-10s mean payoff %.4f +- %.4f after %d hands' % (name, result['mean'], result['half_width'], result['hands']))
@@ -0,0 +1,237 @@
+''' Compact binary checkpoints of Q Learning models
+
+A checkpoint file stores Q values, policy and state keys of an ArrayQModel:
+
+    | magic (8 bytes) | header length (uint64) | json header | padding | arrays, each aligned to 64 bytes | state keys |
+
+The arrays are read straight from a read-only memory map of the file, so loading does not copy or parse them.
+Between full checkpoints, an append-only delta log (checkpoint path + '.delta') stores only the entries
+that changed since the previous checkpoint, so that frequent checkpoints stay cheap.
+'''
+
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import numpy as np
+from array_q_model import ArrayQModel
+
+MAGIC = b'QCKPT001'
+DELTA_MAGIC = b'QDELT001'
+ALIGNMENT = 64
+DELTA_RECORD_HEADER = struct.Struct('<QII') # episode_num, number of changed Q entries, number of changed policy entries
+
+
+def write_arrays(path, arrays, state_keys, metadata = None):
+    ''' Write named arrays and the state keys into a single file (atomically replacing path)
+
+    Args:
+        path (str): File path
+        arrays (dict): Name to np.ndarray
+        state_keys (list): State key of each state id
+        metadata (dict): Extra json-serializable information stored in the header
+    '''
+    keys_blob = '\n'.join(state_keys).encode('utf-8')
+    header = { 'arrays': {}, 'metadata': metadata or {} }
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = { 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset }
+        offset = _align(offset + array.nbytes)
+    header['keys'] = { 'offset': offset, 'nbytes': len(keys_blob) }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + header['arrays'][name]['offset'] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.write(b'\0' * (data_start + offset - f.tell()))
+        f.write(keys_blob)
+    os.replace(temp_path, path)
+
+def read_arrays(path, read_keys = True):
+    ''' Map a file written by write_arrays() read-only into memory
+
+    Returns:
+        (tuple): Tuple containing:
+
+            (dict): Name to read-only np.ndarray backed by the memory map
+            (list): State keys, or None if read_keys is False
+            (dict): Metadata of the header
+    '''
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a checkpoint file'.format(path))
+    header_length, = struct.unpack_from('<Q', buffer, len(MAGIC))
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+    data_start = _align(len(MAGIC) + 8 + header_length)
+
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        count = int(np.prod(info['shape']))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + info['offset']).reshape(info['shape'])
+    state_keys = None
+    if read_keys:
+        keys = header['keys']
+        state_keys = buffer[data_start + keys['offset']:data_start + keys['offset'] + keys['nbytes']].decode('utf-8').split('\n')
+    return arrays, state_keys, header['metadata']
+
+def save_checkpoint(path, model, snapshot_id = None):
+    ''' Write a full checkpoint of an ArrayQModel and start an empty delta log for it
+
+    Args:
+        path (str): Checkpoint path
+        model (ArrayQModel): The model
+        snapshot_id (int): Identifier that ties the delta log to this checkpoint, random by default so that
+            a stale delta log never matches a new checkpoint
+    '''
+    if snapshot_id is None:
+        snapshot_id = struct.unpack('<Q', os.urandom(8))[0]
+    write_arrays(path, { 'Q': model.Q, 'policy': model.policy }, model.state_keys, { 'episode_num': int(model.episode_num), 'snapshot_id': snapshot_id })
+    temp_path = path + '.delta.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(DELTA_MAGIC)
+        f.write(struct.pack('<Q', snapshot_id))
+    os.replace(temp_path, path + '.delta')
+
+def load_checkpoint(path, mmap_mode = True):
+    ''' Load a checkpoint and apply its delta log
+
+    Args:
+        path (str): Checkpoint path
+        mmap_mode (boolean): If True and there are no deltas to apply, Q and policy are read-only views of the
+            memory-mapped file (suitable for playing). Otherwise they are writable copies (suitable for training).
+
+    Returns:
+        (ArrayQModel): The model
+    '''
+    arrays, state_keys, metadata = read_arrays(path)
+    Q, policy = arrays['Q'], arrays['policy']
+    episode_num = metadata['episode_num']
+    deltas = _read_delta_log(path + '.delta', metadata['snapshot_id'])
+    if deltas or not mmap_mode:
+        Q, policy = Q.copy(), policy.copy()
+    for episode_num, q_indices, q_values, policy_ids, policy_actions in deltas:
+        Q.reshape(-1)[q_indices] = q_values
+        policy[policy_ids] = policy_actions
+    return ArrayQModel(state_keys, Q, policy, episode_num)
+
+def convert_json_model(json_path, checkpoint_path):
+    ''' Convert a model stored as json (e.g. q_threshold_model.json) to a checkpoint
+    '''
+    with open(json_path) as json_file:
+        save_checkpoint(checkpoint_path, ArrayQModel.from_model(json.load(json_file)))
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _read_delta_log(path, snapshot_id):
+    ''' Read all complete records of a delta log that belongs to snapshot_id
+    '''
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(DELTA_MAGIC)] != DELTA_MAGIC or struct.unpack_from('<Q', data, len(DELTA_MAGIC))[0] != snapshot_id:
+        return [] # log of another snapshot, left over by an interrupted checkpoint
+    deltas = []
+    position = len(DELTA_MAGIC) + 8
+    while position + DELTA_RECORD_HEADER.size <= len(data):
+        episode_num, num_q, num_policy = DELTA_RECORD_HEADER.unpack_from(data, position)
+        end = position + DELTA_RECORD_HEADER.size + num_q * 12 + num_policy * 5
+        if end > len(data): # incomplete record of an interrupted write
+            break
+        position += DELTA_RECORD_HEADER.size
+        q_indices = np.frombuffer(data, dtype='<u4', count=num_q, offset=position)
+        q_values = np.frombuffer(data, dtype='<f8', count=num_q, offset=position + num_q * 4)
+        position += num_q * 12
+        policy_ids = np.frombuffer(data, dtype='<u4', count=num_policy, offset=position)
+        policy_actions = np.frombuffer(data, dtype=np.int8, count=num_policy, offset=position + num_policy * 4)
+        position = end
+        deltas.append((episode_num, q_indices, q_values, policy_ids, policy_actions))
+    return deltas
+
+
+class CheckpointWriter:
+    ''' Writes checkpoints of an ArrayQModel from a background thread
+
+    checkpoint() only copies Q and policy into a snapshot and hands it over to the writer thread, so the
+    training loop never waits for disk. The writer appends the entries that changed since the previously
+    written snapshot to the delta log, and writes a full checkpoint every full_every checkpoints.
+    If the writer falls behind, pending snapshots are replaced by the newest one.
+    '''
+
+    def __init__(self, model, path, full_every = 10):
+        ''' Initialize the writer and start its thread
+
+        Args:
+            model (ArrayQModel): The model being trained
+            path (str): Checkpoint path
+            full_every (int): Number of checkpoints between full checkpoints
+        '''
+        self.model = model
+        self.path = path
+        self.full_every = full_every
+        self.num_written = 0
+        self.last_Q = None
+        self.last_policy = None
+        self.pending = queue.Queue(maxsize=1)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def checkpoint(self, episode_num = None):
+        ''' Snapshot the model for the writer thread, without waiting for the write
+        '''
+        snapshot = (self.model.Q.copy(), self.model.policy.copy(), int(self.model.episode_num if episode_num is None else episode_num))
+        while True:
+            try:
+                self.pending.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.pending.get_nowait() # drop the older pending snapshot
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        ''' Write the last pending snapshot and stop the thread
+        '''
+        self.pending.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            snapshot = self.pending.get()
+            if snapshot is None:
+                return
+            try:
+                self._write(*snapshot)
+            except Exception as error: # reported by close()
+                self.error = error
+
+    def _write(self, Q, policy, episode_num):
+        if self.last_Q is None or self.num_written % self.full_every == 0:
+            save_checkpoint(self.path, ArrayQModel(self.model.state_keys, Q, policy, episode_num))
+        else:
+            q_indices = np.flatnonzero(Q.reshape(-1) != self.last_Q.reshape(-1)).astype('<u4')
+            policy_ids = np.flatnonzero(policy != self.last_policy).astype('<u4')
+            with open(self.path + '.delta', 'ab') as f:
+                f.write(DELTA_RECORD_HEADER.pack(episode_num, len(q_indices), len(policy_ids)))
+                f.write(q_indices.tobytes())
+                f.write(Q.reshape(-1)[q_indices].astype('<f8').tobytes())
+                f.write(policy_ids.tobytes())
+                f.write(policy[policy_ids].astype(np.int8).tobytes())
+        self.last_Q, self.last_policy = Q, policy
+        self.num_written += 1
@@ -0,0 +1,61 @@
+''' A script comparing the tabular Q Learning Agent against the Linear Q Agent vs Random Agent
+Learning speed is measured per simulated hand as the agreement with the optimal policy of Policy Iteration,
+memory as the number of learned parameters and the size of the model in bytes.
+WARNING: This script loads random_agent_state_space.json and random_agent_optimal_policy.json created by the notebook.
+'''
+
+from env import Env
+from q_learning_agent import QLearningAgent
+from linear_q_agent import LinearQAgent
+from random_agent import RandomAgent
+from utils import get_policy_agreement
+import json
+import time
+
+num_of_games = 2*10**5
+checkpoint_every = 2*10**4
+hyperparameters = { 'initial_epsilon': 1.0, 'initial_alpha': 0.1, 'epsilon_decay': -1/8, 'alpha_decay': -1/8 }
+
+with open('random_agent_state_space.json') as json_file:
+    unknown_agent_state_space = json.load(json_file)
+
+with open('random_agent_optimal_policy.json') as json_file:
+    random_optimal_policy = json.load(json_file)
+
+def make_learner(name, env):
+    if name == 'tabular': # state space explored dynamically, so that its memory grows with the visited states
+        return QLearningAgent(env.np_random, False, is_learning = True, **hyperparameters)
+    return LinearQAgent(env.np_random, False, is_learning = True, **hyperparameters)
+
+def get_policy(agent):
+    return agent.get_policy(unknown_agent_state_space) if isinstance(agent, LinearQAgent) else agent.model['policy']
+
+def get_memory(agent):
+    ''' Number of parameters and bytes of the model
+    '''
+    if isinstance(agent, LinearQAgent):
+        return agent.model['W'].size, agent.model['W'].nbytes
+    num_parameters = sum(len(actions) for actions in agent.model['Q'].values())
+    return num_parameters, len(json.dumps(agent.model))
+
+learners = ['tabular', 'linear']
+results = {}
+for name in learners:
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    q_learning_agent = make_learner(name, env)
+    env.set_agents([
+        q_learning_agent,
+        RandomAgent(env.np_random, False),
+    ])
+    start_time = time.time()
+    results[name] = []
+    for i in range(1, num_of_games + 1):
+        env.run()
+        if i % checkpoint_every == 0:
+            elapsed = time.time() - start_time
+            results[name].append((i, get_policy_agreement(get_policy(q_learning_agent), random_optimal_policy), elapsed) + get_memory(q_learning_agent))
+
+print("Same policy per state (%) vs simulated hands (elapsed seconds, parameters, model bytes)")
+print('hands | ' + ' | '.join(learners))
+for checkpoint in range(len(results['tabular'])):
+    print(results['tabular'][checkpoint][0], '|', ' | '.join('%.2f (%.0fs, %d, %d)' % results[name][checkpoint][1:] for name in learners))
@@ -0,0 +1,44 @@
+''' A script comparing one-step Q Learning against Watkins' Q(lambda) vs Random Agent
+Convergence is measured per simulated hand as the agreement with the optimal policy of Policy Iteration,
+and hands-to-convergence as the first checkpoint where the agreement reaches target_agreement.
+WARNING: This script loads random_agent_state_space.json and random_agent_optimal_policy.json created by the notebook.
+'''
+
+from env import Env
+from q_learning_agent import QLearningAgent
+from random_agent import RandomAgent
+from utils import get_policy_agreement
+import json
+import time
+
+num_of_games = 10**6
+checkpoint_every = 10**4
+target_agreement = 90 # <---- % of states with the same policy as Policy Iteration
+trace_lambdas = [0.0, 0.5, 0.8, 1.0] # <---- 0.0 is today's one-step learner
+repetitions = 3
+hyperparameters = { 'initial_epsilon': 1.0, 'initial_alpha': 0.1, 'epsilon_decay': -1/8, 'alpha_decay': -1/8 }
+
+with open('random_agent_state_space.json') as json_file:
+    unknown_agent_state_space = json.load(json_file)
+
+with open('random_agent_optimal_policy.json') as json_file:
+    random_optimal_policy = json.load(json_file)
+
+print("lambda | repetition | hands to " + str(target_agreement) + "% | final agreement (%) | elapsed seconds")
+for trace_lambda in trace_lambdas:
+    for rep_ind in range(repetitions):
+        env = Env({ 'allow_step_back': False, 'seed': rep_ind })
+        q_learning_agent = QLearningAgent(env.np_random, False, is_learning = True, state_space = unknown_agent_state_space, trace_lambda = trace_lambda, **hyperparameters)
+        env.set_agents([
+            q_learning_agent,
+            RandomAgent(env.np_random, False),
+        ])
+        start_time = time.time()
+        hands_to_target = None
+        for i in range(1, num_of_games + 1):
+            env.run()
+            if i % checkpoint_every == 0:
+                agreement = get_policy_agreement(q_learning_agent.model['policy'], random_optimal_policy)
+                if hands_to_target is None and agreement >= target_agreement:
+                    hands_to_target = i
+        print(trace_lambda, '|', rep_ind, '|', hands_to_target if hands_to_target is not None else '> ' + str(num_of_games), '|', round(agreement, 2), '|', round(time.time() - start_time, 1))
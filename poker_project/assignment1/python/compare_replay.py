@@ -0,0 +1,54 @@
+''' A script comparing the online-only Q Learning Agent against Q Learning with experience replay vs Random Agent
+Greedy-policy quality is measured per simulated hand as the agreement with the optimal policy of Policy Iteration.
+WARNING: This script loads random_agent_state_space.json and random_agent_optimal_policy.json created by the notebook.
+'''
+
+from env import Env
+from q_learning_agent import QLearningAgent
+from array_q_learning_agent import ArrayQLearningAgent
+from random_agent import RandomAgent
+from replay_buffer import ReplayBuffer
+from utils import get_policy_agreement
+import json
+import time
+
+num_of_games = 2*10**5
+checkpoint_every = 2*10**4
+replay_ratios = [1, 4, 16] # <---- replayed transitions per observed transition
+hyperparameters = { 'initial_epsilon': 1.0, 'initial_alpha': 0.1, 'epsilon_decay': -1/8, 'alpha_decay': -1/8 }
+
+with open('random_agent_state_space.json') as json_file:
+    unknown_agent_state_space = json.load(json_file)
+
+with open('random_agent_optimal_policy.json') as json_file:
+    random_optimal_policy = json.load(json_file)
+
+def make_learner(name, env):
+    if name == 'online':
+        return QLearningAgent(env.np_random, False, is_learning = True, state_space = unknown_agent_state_space, **hyperparameters)
+    replay_ratio = replay_ratios[int(name.split('_')[1])]
+    return ArrayQLearningAgent(env.np_random, False, is_learning = True, state_space = unknown_agent_state_space, replay_buffer = ReplayBuffer(10**5, env.np_random), replay_ratio = replay_ratio, **hyperparameters)
+
+def get_policy(agent):
+    return agent.sync_model()['policy'] if isinstance(agent, ArrayQLearningAgent) else agent.model['policy']
+
+learners = ['online'] + ['replay_' + str(i) for i in range(len(replay_ratios))]
+results = {}
+for name in learners:
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    q_learning_agent = make_learner(name, env)
+    env.set_agents([
+        q_learning_agent,
+        RandomAgent(env.np_random, False),
+    ])
+    start_time = time.time()
+    results[name] = []
+    for i in range(1, num_of_games + 1):
+        env.run()
+        if i % checkpoint_every == 0:
+            results[name].append((i, get_policy_agreement(get_policy(q_learning_agent), random_optimal_policy), time.time() - start_time))
+
+print("Same policy per state (%) vs simulated hands (and elapsed seconds)")
+print('hands | ' + ' | '.join(name if name == 'online' else 'replay x' + str(replay_ratios[int(name.split('_')[1])]) for name in learners))
+for checkpoint in range(len(results['online'])):
+    print(results['online'][checkpoint][0], '|', ' | '.join('%.2f (%.0fs)' % results[name][checkpoint][1:] for name in learners))
@@ -0,0 +1,65 @@
+''' A script measuring how many simulated hands warm-starting the Q Learning Agent from Policy Iteration saves vs Random Agent
+The learner starts (1) from Q = 0, (2) from the solution against Random Agent itself and (3) from the solution against
+the known Threshold Agent (a related opponent, whose states are mapped by ignoring the opponent range).
+Greedy-policy quality is measured per simulated hand as the agreement with the optimal policy of Policy Iteration.
+WARNING: This script loads random_agent_state_space.json, random_agent_optimal_policy.json and the probability files created by the notebook.
+'''
+
+from env import Env
+from q_learning_agent import QLearningAgent
+from policy_iteration_agent import PolicyIterationAgent
+from random_agent import RandomAgent
+from threshold_agent import ThresholdAgent
+from utils import get_policy_agreement
+import json
+import time
+
+num_of_games = 10**5
+checkpoint_every = 10**4
+target_agreement = 80 # <---- % of states, hands to reach it are reported
+warm_start_episode_num = 10**4 # <---- the schedules of a warm start continue from here, to keep more of the solution
+hyperparameters = { 'initial_epsilon': 1.0, 'initial_alpha': 0.1, 'epsilon_decay': -1/8, 'alpha_decay': -1/8 }
+
+with open('random_agent_state_space.json') as json_file:
+    unknown_agent_state_space = json.load(json_file)
+
+with open('random_agent_optimal_policy.json') as json_file:
+    random_optimal_policy = json.load(json_file)
+
+env = Env({ 'allow_step_back': False, 'seed': 0 })
+solved_models = {
+    'random': PolicyIterationAgent(env.np_random, False, RandomAgent(env.np_random, False)).get_q_model(),
+    'threshold': PolicyIterationAgent(env.np_random, False, ThresholdAgent(False)).get_q_model(),
+}
+
+def make_learner(name, env):
+    if name == 'cold':
+        return QLearningAgent(env.np_random, False, is_learning = True, state_space = unknown_agent_state_space, **hyperparameters)
+    model = QLearningAgent.warm_start_model(unknown_agent_state_space, solved_models[name], env.np_random, warm_start_episode_num)
+    return QLearningAgent(env.np_random, False, pretrained_model = model, is_learning = True, **hyperparameters)
+
+learners = ['cold', 'random', 'threshold']
+results = {}
+hands_to_target = {}
+for name in learners:
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    q_learning_agent = make_learner(name, env)
+    env.set_agents([
+        q_learning_agent,
+        RandomAgent(env.np_random, False),
+    ])
+    start_time = time.time()
+    results[name] = [(0, get_policy_agreement(q_learning_agent.model['policy'], random_optimal_policy), 0.0)]
+    hands_to_target[name] = 0 if results[name][0][1] >= target_agreement else None
+    for i in range(1, num_of_games + 1):
+        env.run()
+        if i % checkpoint_every == 0:
+            results[name].append((i, get_policy_agreement(q_learning_agent.model['policy'], random_optimal_policy), time.time() - start_time))
+            if hands_to_target[name] is None and results[name][-1][1] >= target_agreement:
+                hands_to_target[name] = i
+
+print("Same policy per state (%) vs simulated hands (and elapsed seconds)")
+print('hands | ' + ' | '.join(learners))
+for checkpoint in range(len(results['cold'])):
+    print(results['cold'][checkpoint][0], '|', ' | '.join('%.2f (%.0fs)' % results[name][checkpoint][1:] for name in learners))
+print('Hands to reach', target_agreement, '% agreement:', ', '.join(name + ': ' + str(hands_to_target[name] if hands_to_target[name] is not None else '>' + str(num_of_games)) for name in learners))
@@ -6,10 +6,15 @@ class Dealer:
     SUIT_LIST = ['S', 'H', 'D', 'C']
     RANK_LIST = ['A', 'T', 'J', 'Q', 'K']
 
-    def __init__(self, np_random):
+    def __init__(self, np_random, deck = None):
+        ''' Initialize the dealer with a shuffled deck, or with a given deck order (cards are dealt from its end)
+        '''
         self.np_random = np_random
-        self.deck = Dealer.init_standard_deck()
-        self.shuffle()
+        if deck is None:
+            self.deck = Dealer.init_standard_deck()
+            self.shuffle()
+        else:
+            self.deck = list(deck)
         self.pot = 0
 
     def shuffle(self):
@@ -0,0 +1,93 @@
+import heapq
+import numpy as np
+from array_q_learning_agent import ArrayQLearningAgent
+from array_q_model import ArrayQModel
+
+
+class DynaQLearningAgent(ArrayQLearningAgent):
+    ''' ArrayQLearningAgent with Dyna-style planning by prioritized sweeping
+
+    Besides the online Q update, every observed transition updates an empirical model of the game: visit
+    counts and summed rewards per (state, action) in arrays, and next state counts per (state, action).
+    At the end of every hand, up to num_planning_backups full expected backups
+
+        Q(s, a) = (R(s, a) + gamma * sum_s' N(s, a, s') max_a' Q(s', a')) / N(s, a)
+
+    are computed from the model, in order of their absolute change (priority). After a backup of state s,
+    the (state, action) pairs leading to s are queued with their new priority if it exceeds theta.
+    '''
+
+    def __init__(self, np_random, print_enabled, pretrained_model = None, is_learning = True, initial_epsilon = 1.0, initial_alpha = 1.0, epsilon_decay = -1/4, alpha_decay = -1/4, state_space = None, num_planning_backups = 10, theta = 1e-4):
+        ''' Initialize the agent
+
+        Args:
+            num_planning_backups (int): Maximum number of planning backups per real hand
+            theta (float): Minimum priority of queued (state, action) pairs
+            Other arguments as in ArrayQLearningAgent
+        '''
+        super().__init__(np_random, print_enabled, pretrained_model, is_learning, initial_epsilon, initial_alpha, epsilon_decay, alpha_decay, state_space)
+        self.num_planning_backups = num_planning_backups
+        self.theta = theta
+        num_states, num_actions = self.array_model.Q.shape
+        self.visit_counts = np.zeros((num_states, num_actions), dtype=np.int32)
+        self.reward_sums = np.zeros((num_states, num_actions))
+        self.next_state_counts = {} # state id * number of actions + action to {next state id: count}, terminal transitions are not stored
+        self.predecessors = [set() for _ in range(num_states)] # state id to (state id, action) pairs observed to lead to it
+        self.queue = [] # heap of (-priority, state id, action), entries whose priority was raised later are stale
+        self.queued_priority = np.zeros((num_states, num_actions)) # current priority of queued pairs, 0 if not queued
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Online Q update, model update from the latest transition, and planning at the end of each hand
+        '''
+        super().eval_step(states, action_history, payoff)
+        if not self.is_learning or len(states) < 2:
+            return
+        model = self.array_model
+        state_id = model.get_state_id(states[-2])
+        action = ArrayQModel.ACTION_IDS[action_history[-1]]
+        self.visit_counts[state_id, action] += 1
+        if payoff == None:
+            next_state_id = model.get_state_id(states[-1])
+            next_states = self.next_state_counts.setdefault(state_id * len(ArrayQModel.ACTIONS) + action, {})
+            next_states[next_state_id] = next_states.get(next_state_id, 0) + 1
+            self.predecessors[next_state_id].add((state_id, action))
+        else:
+            self.reward_sums[state_id, action] += payoff
+        self._queue(state_id, action)
+        if payoff != None:
+            self.plan()
+
+    def plan(self):
+        ''' Run up to num_planning_backups prioritized backups from the empirical model
+        '''
+        Q = self.array_model.Q
+        num_backups = 0
+        while self.queue and num_backups < self.num_planning_backups:
+            priority, state_id, action = heapq.heappop(self.queue)
+            if -priority != self.queued_priority[state_id, action]: # stale entry
+                continue
+            self.queued_priority[state_id, action] = 0.0
+            num_backups += 1
+            Q[state_id, action] = self._expected_backup(state_id, action)
+            self.array_model.update_policy([state_id], self.np_random)
+            for predecessor in self.predecessors[state_id]:
+                self._queue(*predecessor)
+
+    def _expected_backup(self, state_id, action):
+        next_states = self.next_state_counts.get(state_id * len(ArrayQModel.ACTIONS) + action)
+        value = self.reward_sums[state_id, action]
+        if next_states:
+            next_state_ids = np.fromiter(next_states.keys(), dtype=np.int64, count=len(next_states))
+            counts = np.fromiter(next_states.values(), dtype=np.float64, count=len(next_states))
+            value += self.gamma * counts.dot(self.array_model.Q[next_state_ids].max(axis=1))
+        return value / self.visit_counts[state_id, action]
+
+    def _queue(self, state_id, action):
+        priority = abs(self._expected_backup(state_id, action) - self.array_model.Q[state_id, action])
+        if priority > self.theta and priority > self.queued_priority[state_id, action]:
+            self.queued_priority[state_id, action] = priority
+            heapq.heappush(self.queue, (-priority, state_id, action))
+            if len(self.queue) > 2 * self.queued_priority.size: # drop stale entries
+                state_ids, actions = np.nonzero(self.queued_priority)
+                self.queue = [(-self.queued_priority[s, a], s, a) for s, a in zip(state_ids, actions)]
+                heapq.heapify(self.queue)
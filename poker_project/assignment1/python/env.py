@@ -4,6 +4,8 @@ from collections import OrderedDict
 import numpy as np
 from game import Game
 import seeding
+from profiler import NULL_PROFILER
+from card_range import get_range_string
 
 DEFAULT_GAME_CONFIG = {
         'game_num_players': 2,
@@ -37,20 +39,29 @@ class Env(object):
 
         # A counter for the timesteps
         self.timestep = 0
+
+        # Optional profiler.Profiler, see set_profiler()
+        self.profiler = None
+
+        # Optional hand_history.HandHistoryWriter, see set_hand_history()
+        self.hand_history = None
         
         self.actions = ['bet', 'raise', 'fold', 'check']
 
 
-    def reset(self):
+    def reset(self, deal = None):
         ''' Start a new game
 
+        Args:
+            deal (tuple): Deal to play (see Game.sample_deal()), a new random deal if None
+
         Returns:
             (tuple): Tuple containing:
 
                 (list): The beginning state of the game
                 (int): The beginning player
         '''
-        state, player_id = self.game.init_game()
+        state, player_id = self.game.init_game(deal)
         self.action_recorder = []
         return self._extract_state(state), player_id
 
@@ -93,6 +104,7 @@ class Env(object):
 
         if not self.game.step_back():
             return False
+        self.action_recorder.pop()
 
         player_id = self.get_player_id()
         state = self.get_state(player_id)
@@ -109,10 +121,13 @@ class Env(object):
         '''
         self.agents = agents
 
-    def run(self):
+    def run(self, deal = None):
         '''
         Run a complete game, either for evaluation or training RL agent.
 
+        Args:
+            deal (tuple): Deal to play (see Game.sample_deal()), a new random deal if None
+
         Returns:
             (tuple) Tuple containing:
 
@@ -122,50 +137,167 @@ class Env(object):
         Note: The trajectories are 2-dimension lists. The first dimension is for different players,
               while the second dimension is for the contents of each transition
         '''
+        for agent in self.agents:
+            if not hasattr(agent, 'step'):
+                raise TypeError('{} only acts through step_async(), play it with Env.run_async()'.format(type(agent).__name__))
+        profiler = self.profiler or NULL_PROFILER
+        game = self._play(deal)
+        agent, state = next(game)
+        while True:
+            # Agent plays
+            token = profiler.start()
+            action = agent.step(state)
+            profiler.stop('agent_step', token)
+            try:
+                agent, state = game.send(action)
+            except StopIteration as finished:
+                return finished.value
+
+    async def run_async(self, deal = None):
+        ''' Same as run() as a coroutine, for tables hosted by an asyncio server (see game_server.py): agents with a
+        step_async() coroutine (e.g. a remote human) are awaited, the other agents answer directly.
+        With a profiler attached, 'agent_step' includes the time spent waiting for the awaited agents.
+
+        Args:
+            deal (tuple): Deal to play (see Game.sample_deal()), a new random deal if None
+
+        Returns:
+            (tuple) Tuple containing:
+
+                (list): A list of trajectories generated from the environment.
+                (list): A list of payoffs. Each entry corresponds to one player.
+        '''
+        profiler = self.profiler or NULL_PROFILER
+        game = self._play(deal)
+        agent, state = next(game)
+        while True:
+            token = profiler.start()
+            if hasattr(agent, 'step_async'):
+                action = await agent.step_async(state)
+            else:
+                action = agent.step(state)
+            profiler.stop('agent_step', token)
+            try:
+                agent, state = game.send(action)
+            except StopIteration as finished:
+                return finished.value
+
+    def set_profiler(self, profiler):
+        ''' Time the phases of the game loop of run() (or stop timing with None)
+
+        Args:
+            profiler (profiler.Profiler): Collects per-phase timers, call counters and allocation counts
+        '''
+        self.profiler = profiler
+
+    def set_hand_history(self, hand_history):
+        ''' Record every hand played by run() (or stop recording with None)
+
+        Args:
+            hand_history (hand_history.HandHistoryWriter): Appends a compact record of each finished hand
+        '''
+        self.hand_history = hand_history
+
+    def _play(self, deal):
+        ''' The game loop of run(): a generator that yields (agent, state) whenever an agent has to act, receives
+        the chosen action through send(), and returns (trajectories, payoffs) when the game is over. Its phases are
+        timed by the attached profiler (step_agent() and step() are inlined to time range inference, Game.step and
+        state extraction separately).
+        '''
+        profiler = self.profiler or NULL_PROFILER
         trajectories = [[] for _ in range(self.num_players)]
-        state, player_id = self.reset()
+        token = profiler.start()
+        state, player_id = self.game.init_game(deal)
+        self.action_recorder = []
+        profiler.stop('reset', token)
+        token = profiler.start()
+        state = self._extract_state(state)
+        profiler.stop('extract_state', token)
 
         # Loop to play the game
         trajectories[player_id].append(state)
         while not self.is_over():
+            agent = self.agents[player_id]
+
             # Agent learns
+            token = profiler.start()
             player_action_history = [action_entry[1] for action_entry in trajectories[player_id][-1]['action_record'] if action_entry[0] == player_id]
-            self.agents[player_id].eval_step(trajectories[player_id], player_action_history)
+            agent.eval_step(trajectories[player_id], player_action_history)
+            profiler.stop('eval_step', token)
 
             # Agent plays
-            action = self.agents[player_id].step(state)         
+            action = yield agent, state
 
-            # Get new opponent range based on action (only applicable vs ThresholdAgent as known opponent)
-            new_opponent_range = self.agents[player_id].infer_card_range_from_action(action, self.game.round_counter+1, self.game.players[1 if player_id == 0 else 0].opponent_range, state['obs']['other_chips'], state['obs']['public_cards'], state['obs']['position'])
-            # Update new opponent range based on action
-            self.game.players[1 if player_id == 0 else 0].opponent_range = new_opponent_range[:]
+            # Update the range that the opponent infers from the action (only applicable vs ThresholdAgent as known opponent)
+            token = profiler.start()
+            new_opponent_range = agent.infer_card_range_from_action(action, self.game.round_counter+1, self.game.players[1 if player_id == 0 else 0].opponent_range, state['obs']['other_chips'], state['obs']['public_cards'], state['obs']['position'])
+            self.game.players[1 if player_id == 0 else 0].opponent_range = new_opponent_range
+            profiler.stop('infer_range', token)
 
             # Environment steps
-            next_state, next_player_id = self.step(action, self.agents[player_id].use_raw)
-
-            # Set the state and player
-            state = next_state
-            player_id = next_player_id
+            if not agent.use_raw:
+                action = self._decode_action(action)
+            self.timestep += 1
+            self.action_recorder.append((self.get_player_id(), action))
+            token = profiler.start()
+            next_state, player_id = self.game.step(action)
+            profiler.stop('game_step', token)
+            token = profiler.start()
+            state = self._extract_state(next_state)
+            profiler.stop('extract_state', token)
 
             # Save state.
             if not self.game.is_over():
                 trajectories[player_id].append(state)
 
         # Add a final state to all the players
+        token = profiler.start()
         for player_id in range(self.num_players):
-            state = self.get_state(player_id)
-            trajectories[player_id].append(state)
+            trajectories[player_id].append(self.get_state(player_id))
+        profiler.stop('extract_state', token)
 
         # Payoffs
+        token = profiler.start()
         payoffs = self.get_payoffs()
-        
+        profiler.stop('get_payoffs', token)
+        if self.hand_history is not None:
+            token = profiler.start()
+            self.hand_history.record(self.game, self.action_recorder, payoffs)
+            profiler.stop('hand_history', token)
+
         # Agent learns from terminal state
+        token = profiler.start()
         for player_id in range(self.num_players):
             player_action_history = [action_entry[1] for action_entry in trajectories[player_id][-1]['action_record'] if action_entry[0] == player_id]
             self.agents[player_id].eval_step(trajectories[player_id], player_action_history, payoffs[player_id])
+        profiler.stop('eval_step', token)
 
+        profiler.hand_finished()
         return trajectories, payoffs
 
+    def step_agent(self, player_id, state, action):
+        ''' Step forward with the action chosen by an agent, after updating the range
+        that its opponent infers from that action
+
+        Args:
+            player_id (int): The id of the player that acts
+            state (dict): The state in which the agent chose the action
+            action (str or int): The action chosen by the agent
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (dict): The next state
+                (int): The ID of the next player
+        '''
+        agent = self.agents[player_id]
+        # Get new opponent range based on action (only applicable vs ThresholdAgent as known opponent)
+        new_opponent_range = agent.infer_card_range_from_action(action, self.game.round_counter+1, self.game.players[1 if player_id == 0 else 0].opponent_range, state['obs']['other_chips'], state['obs']['public_cards'], state['obs']['position'])
+        # Update new opponent range based on action
+        self.game.players[1 if player_id == 0 else 0].opponent_range = new_opponent_range
+
+        return self.step(action, agent.use_raw)
+
     def is_over(self):
         ''' Check whether the current game is over
 
@@ -256,7 +388,7 @@ class Env(object):
             obs['public_cards'] = ''.join(sorted(public_cards[0].rank + public_cards[1].rank))
         else:
             obs['public_cards'] = 'none'
-        obs['opponent_range'] = state['opponent_range'] # state feature useful only for PolicyIterationAgent vs ThresholdAgent
+        obs['opponent_range'] = get_range_string(state['opponent_range']) # state feature useful only for PolicyIterationAgent vs ThresholdAgent, string view of the mask
         extracted_state['obs'] = obs
 
         extracted_state['raw_obs'] = state
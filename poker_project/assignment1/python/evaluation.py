@@ -0,0 +1,263 @@
+''' Sequential evaluation of agent matchups with early stopping
+
+Instead of a fixed number of hands, hands are played in chunks until the requested precision is reached:
+either a target half-width of the confidence interval of the mean payoff (SequentialEvaluation.estimate), or a
+decision whether the agent's mean payoff is above or below a margin (SequentialEvaluation.test). Low variance
+matchups stop after few hands, and the number of hands actually used is reported.
+
+Most of the variance of the payoffs is card luck. DuplicateEvaluation plays every deal twice with the seats of the
+agents swapped, and PairedComparison plays the same stream of deals for two candidate agents against the same
+opponent (common random numbers) and evaluates the paired differences of their payoffs.
+'''
+
+import math
+from statistics import NormalDist
+import numpy as np
+import seeding
+
+
+class RunningStatistics:
+    ''' Mean and variance of a stream of values (Welford's algorithm, merged per chunk by Chan's formula)
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # sum of squared deviations from the mean
+
+    def update(self, value):
+        ''' Add a single value
+        '''
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def update_batch(self, values):
+        ''' Add a chunk of values
+        '''
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean)**2).sum()
+        count = self.count + len(values)
+        delta = batch_mean - self.mean
+        self.mean += delta * len(values) / count
+        self.m2 += batch_m2 + delta**2 * self.count * len(values) / count
+        self.count = count
+
+    @property
+    def variance(self):
+        ''' Sample variance
+        '''
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def standard_error(self):
+        return math.sqrt(self.variance / self.count) if self.count > 1 else float('nan')
+
+    def half_width(self, confidence):
+        ''' Half-width of the normal confidence interval of the mean
+        '''
+        return NormalDist().inv_cdf(0.5 + confidence / 2) * self.standard_error
+
+
+class SequentialEvaluation:
+    ''' Plays hands of an Env in chunks and stops as soon as a criterion on the payoffs of one player is met
+    '''
+
+    hands_per_sample = 1 # hands played per evaluated payoff
+
+    def __init__(self, env, player_id = 0, chunk_size = 10**4, min_hands = 10**4, max_hands = 5*10**6):
+        ''' Initialize the evaluation
+
+        Args:
+            env (Env): Environment with its agents set (learning should be disabled)
+            player_id (int): Player whose payoffs are evaluated
+            chunk_size (int): Number of hands between two checks of the criterion
+            min_hands (int): Hands played before the first check, so that the variance estimate is reliable
+            max_hands (int): Budget, the evaluation stops (unsuccessfully) once it is used up
+        '''
+        self.env = env
+        self.player_id = player_id
+        self.chunk_size = chunk_size
+        self.min_hands = min_hands
+        self.max_hands = max_hands
+
+    def _sample_payoffs(self, num_samples):
+        ''' Payoffs of num_samples hands
+        '''
+        return [self.env.run()[1][self.player_id] for _ in range(num_samples)]
+
+    def _play_chunk(self, statistics):
+        ''' Play up to chunk_size hands (or min_hands for the first chunk) within the budget
+        '''
+        num_hands = min(max(self.chunk_size, self.min_hands - self._hands(statistics)), self.max_hands - self._hands(statistics))
+        statistics.update_batch(self._sample_payoffs(max(1, num_hands // self.hands_per_sample)))
+
+    def _hands(self, statistics):
+        return statistics.count * self.hands_per_sample
+
+    def estimate(self, target_half_width, confidence = 0.95):
+        ''' Estimate the mean payoff until the confidence interval is narrow enough
+
+        Args:
+            target_half_width (float): Stop once the half-width of the confidence interval is at most this value
+            confidence (float): Confidence level of the interval
+
+        Returns:
+            (dict): Keys 'mean', 'std', 'half_width', 'ci', 'hands' (hands actually played) and 'converged'
+                (False if max_hands was reached first)
+        '''
+        statistics = RunningStatistics()
+        while self._hands(statistics) < self.max_hands:
+            self._play_chunk(statistics)
+            if statistics.half_width(confidence) <= target_half_width:
+                break
+        half_width = statistics.half_width(confidence)
+        return { 'mean': statistics.mean, 'std': math.sqrt(statistics.variance), 'half_width': half_width, 'ci': (statistics.mean - half_width, statistics.mean + half_width), 'hands': self._hands(statistics), 'converged': half_width <= target_half_width }
+
+    def test(self, margin = 0.0, alpha = 0.05):
+        ''' Sequential test whether the mean payoff is above or below margin, e.g. with margin 0 whether the agent
+        beats its opponent
+
+        The test is checked after every chunk. To keep the overall error probability below alpha despite the
+        repeated looks, alpha is spent over the looks: look k (1-based) tests at level alpha/2^k (two-sided), so the
+        levels sum to at most alpha however many looks are taken.
+
+        Args:
+            margin (float): Mean payoff tested against
+            alpha (float): Overall probability of a wrong decision
+
+        Returns:
+            (dict): Keys 'decision' ('above', 'below' or 'inconclusive' if max_hands was reached first), 'mean', 'std',
+                'z' (test statistic of the last look), 'looks' and 'hands' (hands actually played)
+        '''
+        statistics = RunningStatistics()
+        decision, z, look = 'inconclusive', float('nan'), 0
+        while self._hands(statistics) < self.max_hands:
+            self._play_chunk(statistics)
+            look += 1
+            z = (statistics.mean - margin) / statistics.standard_error if statistics.standard_error > 0 else float('nan')
+            critical_value = NormalDist().inv_cdf(1 - alpha / 2**look / 2)
+            if z >= critical_value:
+                decision = 'above'
+                break
+            if z <= -critical_value:
+                decision = 'below'
+                break
+        return { 'decision': decision, 'mean': statistics.mean, 'std': math.sqrt(statistics.variance), 'z': z, 'looks': look, 'hands': self._hands(statistics) }
+
+
+class DuplicateEvaluation(SequentialEvaluation):
+    ''' Duplicate evaluation of an agent against an opponent: every deal is played twice, the second time with the
+    agents in swapped seats (so each agent gets the cards and blind of the other), and the payoff of a sample is the
+    mean payoff of the agent over both hands, which cancels most of the card luck
+    '''
+
+    hands_per_sample = 2
+
+    def __init__(self, env, agent, opponent, seed = 0, chunk_size = 10**4, min_hands = 10**4, max_hands = 5*10**6):
+        ''' Initialize the evaluation
+
+        Args:
+            env (Env): Environment, its agents are set by the evaluation
+            agent (object): Evaluated agent (learning should be disabled)
+            opponent (object): Opponent agent
+            seed (int): Seed of the stream of deals, which is independent of the random choices of the agents
+            chunk_size, min_hands, max_hands: See SequentialEvaluation, counted in hands played
+        '''
+        super().__init__(env, 0, chunk_size, min_hands, max_hands)
+        self.agent = agent
+        self.opponent = opponent
+        self.deal_random, _ = seeding.np_random(seed)
+
+    def _sample_payoffs(self, num_samples):
+        return [duplicate_payoff(self.env, self.agent, self.opponent, self.env.game.sample_deal(self.deal_random)) for _ in range(num_samples)]
+
+
+class PairedComparison(SequentialEvaluation):
+    ''' Comparison of two candidate agents against the same opponent on identical deals (common random numbers)
+
+    Both candidates play every deal in duplicate (see DuplicateEvaluation), and a sample is the paired difference
+    of their duplicate payoffs, so estimate() returns the mean advantage of candidate over baseline and test() decides
+    which one is better.
+    '''
+
+    hands_per_sample = 4
+
+    def __init__(self, env, candidate, baseline, opponent, seed = 0, chunk_size = 10**4, min_hands = 10**4, max_hands = 5*10**6):
+        ''' Initialize the comparison
+
+        Args:
+            env (Env): Environment, its agents are set by the comparison
+            candidate (object): First agent, whose payoffs count positive
+            baseline (object): Second agent, whose payoffs count negative
+            opponent (object): Opponent of both agents
+            seed (int): Seed of the stream of deals
+            chunk_size, min_hands, max_hands: See SequentialEvaluation, counted in hands played
+        '''
+        super().__init__(env, 0, chunk_size, min_hands, max_hands)
+        self.candidate = candidate
+        self.baseline = baseline
+        self.opponent = opponent
+        self.deal_random, _ = seeding.np_random(seed)
+
+    def _sample_payoffs(self, num_samples):
+        differences = []
+        for _ in range(num_samples):
+            deal = self.env.game.sample_deal(self.deal_random)
+            differences.append(duplicate_payoff(self.env, self.candidate, self.opponent, deal) - duplicate_payoff(self.env, self.baseline, self.opponent, deal))
+        return differences
+
+
+def duplicate_payoff(env, agent, opponent, deal):
+    ''' Mean payoff of agent over a deal played in both seats
+
+    Args:
+        env (Env): Environment, its agents are replaced
+        agent (object): Evaluated agent
+        opponent (object): Opponent agent
+        deal (tuple): Deal as returned by Game.sample_deal()
+
+    Returns:
+        (float): Mean payoff of agent over the two hands
+    '''
+    env.set_agents([agent, opponent])
+    _, payoffs = env.run(deal)
+    total = payoffs[0]
+    env.set_agents([opponent, agent])
+    _, payoffs = env.run(deal)
+    return (total + payoffs[1]) / 2
+
+
+if __name__ == '__main__':
+    # Matchups of the notebook evaluated to the same precision instead of a fixed 5*10^6 hands each, with
+    # independent hands and with duplicate deals, and a paired comparison of two agents against the same opponent
+    # WARNING: The probability json files created by the notebook are loaded
+    from env import Env
+    from random_agent import RandomAgent
+    from threshold_agent import ThresholdAgent
+    from policy_iteration_agent import PolicyIterationAgent
+
+    np_random, _ = seeding.np_random(0)
+    probabilities = PolicyIterationAgent.load_probabilities()
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    random_agent, threshold_agent = RandomAgent(env.np_random, False), ThresholdAgent(False)
+    policy_iteration_random = PolicyIterationAgent(np_random, False, RandomAgent(np_random, False), probabilities)
+    policy_iteration_threshold = PolicyIterationAgent(np_random, False, ThresholdAgent(False), probabilities)
+    matchups = {
+        'Threshold vs Random': (threshold_agent, random_agent),
+        'Policy Iteration vs Random': (policy_iteration_random, random_agent),
+        'Policy Iteration vs Threshold': (policy_iteration_threshold, threshold_agent),
+    }
+    for name, (agent, opponent) in matchups.items():
+        env.set_agents([agent, opponent])
+        result = SequentialEvaluation(env).estimate(target_half_width = 0.01)
+        print('%-30s %-10s mean payoff %.4f +- %.4f (std %.3f) after %d hands' % (name, 'hands', result['mean'], result['half_width'], result['std'], result['hands']))
+        result = DuplicateEvaluation(env, agent, opponent).estimate(target_half_width = 0.01)
+        print('%-30s %-10s mean payoff %.4f +- %.4f (std %.3f) after %d hands' % ('', 'duplicate', result['mean'], result['half_width'], result['std'], result['hands']))
+
+    result = PairedComparison(env, policy_iteration_random, threshold_agent, random_agent).estimate(target_half_width = 0.01)
+    print('Policy Iteration minus Threshold, against Random: mean %.4f +- %.4f after %d hands' % (result['mean'], result['half_width'], result['hands']))
@@ -0,0 +1,173 @@
+''' Exact expected payoffs of two fixed agents by enumeration of the game tree
+
+The payoffs only depend on the ranks of the cards, so instead of sampling hands with Env.run, every deal of ranks
+(hands, public cards and blind seat) is enumerated with its probability, and every action branch is weighted by the
+probability of the acting agent to choose it. The tree is walked with Env.step_agent/Env.step_back (the public cards
+are arranged in the deck before the action that ends the first round), and the values of subtrees are memoized by
+the state of the game, so subtrees shared between deals (e.g. the second round after different first round
+histories that end in the same chips and ranges) are evaluated once.
+'''
+
+from itertools import combinations_with_replacement
+from env import Env
+from dealer import Dealer
+
+
+def get_action_probabilities(agent, state):
+    ''' Probabilities of the actions of agent in state
+
+    Agents with an action_probabilities(state) method (e.g. RandomAgent) are stochastic, every other agent is assumed
+    to be deterministic (learning must be disabled) and its step() is chosen with probability 1.
+
+    Returns:
+        (dict): Action to probability
+    '''
+    if hasattr(agent, 'action_probabilities'):
+        return agent.action_probabilities(state)
+    return {agent.step(state): 1.0}
+
+
+class ExactEvaluator:
+    ''' Exact expected payoff and payoff variance per seat of two agents
+
+    Agents must choose their actions from the observation of the state (ranks of the cards, chips, position and
+    range), as all agents of this project do, since subtrees with equal observations share their value.
+    '''
+
+    def __init__(self, agents):
+        ''' Initialize the evaluator
+
+        Args:
+            agents (list): Agents of seat 0 and 1 (as passed to Env.set_agents)
+        '''
+        self.agents = agents
+        self.env = Env({ 'allow_step_back': True, 'seed': 0 })
+        self.env.set_agents(agents)
+        self.cards_by_rank = {rank: [card for card in Dealer.init_standard_deck() if card.rank == rank] for rank in Dealer.RANK_LIST}
+        self.memo = {}
+        self.num_nodes = 0 # nodes expanded by the last evaluate()
+
+    def evaluate(self):
+        ''' Enumerate all deals and action branches
+
+        Returns:
+            (dict): Keys 'mean' and 'variance' (lists with one entry per seat), and 'nodes' (expanded game tree nodes)
+        '''
+        self.memo = {}
+        self.num_nodes = 0
+        moments = [0.0, 0.0, 0.0, 0.0] # expected payoff and squared payoff of seat 0 and 1
+        num_cards = len(Dealer.init_standard_deck())
+        for small_blind in range(self.env.num_players):
+            for rank_0 in Dealer.RANK_LIST:
+                for rank_1 in Dealer.RANK_LIST:
+                    same_rank = int(rank_0 == rank_1)
+                    probability = 0.5 * len(self.cards_by_rank[rank_0]) / num_cards * (len(self.cards_by_rank[rank_1]) - same_rank) / (num_cards - 1)
+                    card_0, card_1 = self.cards_by_rank[rank_0][0], self.cards_by_rank[rank_1][same_rank]
+                    deck = [card for card in Dealer.init_standard_deck() if card != card_0 and card != card_1] + [card_1, card_0] # seat 0 is dealt first, from the end
+                    state, player_id = self.env.reset((tuple(deck), small_blind))
+                    self._add(moments, probability, self._expand(state, player_id))
+        return { 'mean': [moments[0], moments[1]], 'variance': [moments[2] - moments[0]**2, moments[3] - moments[1]**2], 'nodes': self.num_nodes }
+
+    @staticmethod
+    def _add(moments, probability, values):
+        for index, value in enumerate(values):
+            moments[index] += probability * value
+
+    def _key(self):
+        ''' Everything the value of the current subtree depends on
+        '''
+        game = self.env.game
+        players = tuple((player.hand[0].rank, player.in_chips, player.status, player.opponent_range, player.position) for player in game.players)
+        public_cards = None if game.public_cards[0] is None else tuple(sorted(card.rank for card in game.public_cards))
+        round_state = (game.round.have_raised_num, game.round.not_raise_num, tuple(game.round.raised), game.round.player_folded)
+        return players, public_cards, game.game_pointer, game.round_counter, round_state
+
+    def _expand(self, state, player_id):
+        ''' Expected payoffs and squared payoffs of the subtree of the current game state
+
+        Returns:
+            (list): Expected payoff of seat 0 and 1, expected squared payoff of seat 0 and 1
+        '''
+        env = self.env
+        if env.is_over():
+            payoffs = env.get_payoffs()
+            return [payoffs[0], payoffs[1], payoffs[0]**2, payoffs[1]**2]
+        key = self._key()
+        if key in self.memo:
+            return self.memo[key]
+        self.num_nodes += 1
+
+        moments = [0.0, 0.0, 0.0, 0.0]
+        opponent = env.game.players[1 - player_id]
+        opponent_range = opponent.opponent_range
+        for action, probability in get_action_probabilities(env.agents[player_id], state).items():
+            if probability == 0:
+                continue
+            if env.game.round_counter == 0 and self._ends_first_round(player_id, state, action, opponent_range):
+                values = self._expand_public_cards(player_id, state, action, opponent_range)
+            else:
+                next_state, next_player_id = env.step_agent(player_id, state, action)
+                values = self._expand(next_state, next_player_id)
+                env.step_back()
+                env.game.players[1 - player_id].opponent_range = opponent_range # set by step_agent before the game saved its history
+            self._add(moments, probability, values)
+        self.memo[key] = moments
+        return moments
+
+    def _ends_first_round(self, player_id, state, action, opponent_range):
+        ''' Whether action moves the game to the second round (so public cards are dealt)
+        '''
+        env = self.env
+        env.step_agent(player_id, state, action)
+        ends_first_round = env.game.round_counter == 1 and not env.is_over()
+        env.step_back()
+        env.game.players[1 - player_id].opponent_range = opponent_range
+        return ends_first_round
+
+    def _expand_public_cards(self, player_id, state, action, opponent_range):
+        ''' Chance node of the public cards: action is played once for every pair of public ranks, which is arranged
+        at the end of the deck so that the game deals it
+        '''
+        env = self.env
+        deck = env.game.dealer.deck
+        moments = [0.0, 0.0, 0.0, 0.0]
+        for rank_0, rank_1 in combinations_with_replacement(Dealer.RANK_LIST, 2):
+            cards_0 = [card for card in deck if card.rank == rank_0]
+            cards_1 = [card for card in deck if card.rank == rank_1]
+            if rank_0 == rank_1:
+                probability = len(cards_0) * (len(cards_0) - 1) / (len(deck) * (len(deck) - 1))
+            else:
+                probability = 2 * len(cards_0) * len(cards_1) / (len(deck) * (len(deck) - 1)) # both orders
+            if probability == 0:
+                continue
+            card_0, card_1 = cards_0[0], cards_1[1 if rank_0 == rank_1 else 0]
+            env.game.dealer.deck = [card for card in deck if card != card_0 and card != card_1] + [card_1, card_0]
+            next_state, next_player_id = env.step_agent(player_id, state, action)
+            self._add(moments, probability, self._expand(next_state, next_player_id))
+            env.step_back()
+            env.game.players[1 - player_id].opponent_range = opponent_range
+        env.game.dealer.deck = deck
+        return moments
+
+
+if __name__ == '__main__':
+    # Exact expected payoffs of the matchups of the notebook
+    # WARNING: The probability json files created by the notebook are loaded
+    import time
+    import seeding
+    from random_agent import RandomAgent
+    from threshold_agent import ThresholdAgent
+    from policy_iteration_agent import PolicyIterationAgent
+
+    np_random, _ = seeding.np_random(0)
+    probabilities = PolicyIterationAgent.load_probabilities()
+    matchups = {
+        'Random vs Random': [RandomAgent(np_random, False), RandomAgent(np_random, False)],
+        'Threshold vs Random': [ThresholdAgent(False), RandomAgent(np_random, False)],
+        'Policy Iteration vs Random': [PolicyIterationAgent(np_random, False, RandomAgent(np_random, False), probabilities), RandomAgent(np_random, False)],
+        'Policy Iteration vs Threshold': [PolicyIterationAgent(np_random, False, ThresholdAgent(False), probabilities), ThresholdAgent(False)],
+    }
+    for name, agents in matchups.items():
+        start_time = time.perf_counter()
+        result = ExactEvaluator(agents).evaluate()
+        print('%-30s mean payoff %.6f (std %.4f), %d nodes in %.2fs' % (name, result['mean'][0], result['variance'][0]**0.5, result['nodes'], time.perf_counter() - start_time))
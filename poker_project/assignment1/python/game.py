@@ -1,4 +1,3 @@
-from copy import copy
 import numpy as np
 
 from dealer import Dealer
@@ -6,6 +5,7 @@ from player import Player
 from judger import Judger
 from round import Round
 from utils import try_key_initialization
+from card_range import RANK_BITS, FULL_RANGE, get_range_mask
 
 
 class Game:
@@ -68,19 +68,42 @@ class Game:
         '''
         self.num_players = game_config['game_num_players']
 
-    def init_game(self):
+    def sample_deal(self, np_random = None):
+        ''' Sample a deal, the same way init_game() does
+
+        Args:
+            np_random (RandomState): Random generator of the deal, self.np_random if None (a separate generator gives
+                a stream of deals that does not depend on the random choices of the agents)
+
+        Returns:
+            (tuple): Deck order (tuple of cards, dealt from its end) and the seat of the small blind
+        '''
+        np_random = np_random if np_random is not None else self.np_random
+        deck = Dealer.init_standard_deck()
+        np_random.shuffle(deck)
+        return tuple(deck), np_random.randint(0, self.num_players)
+
+    def init_game(self, deal = None):
         ''' Initialilze the game of Limit Texas Hold'em
 
         This version supports two-player limit texas hold'em
 
+        Args:
+            deal (tuple): Deck order and small blind seat as returned by sample_deal(), a new deal is sampled if None
+                (e.g. replaying the same deal with the agents in swapped seats)
+
         Returns:
             (tuple): Tuple containing:
 
                 (dict): The first state of the game
                 (int): Current player's id
         '''
+        if deal is None:
+            deal = self.sample_deal()
+        deck, s = deal
+
         # Initilize a dealer that can deal cards
-        self.dealer = Dealer(self.np_random)
+        self.dealer = Dealer(self.np_random, deck)
 
         # Initilize two players to play the game
         self.players = [Player(i) for i in range(self.num_players)]
@@ -88,8 +111,7 @@ class Game:
         # Prepare for the first round
         for i in range(self.num_players):
             self.players[i].hand.append(self.dealer.deal_card())
-        # Randomly choose a small blind (first) and a big blind (second player)
-        s = self.np_random.randint(0, self.num_players)
+        # Small blind (first) given by the deal and big blind (second player)
         b = (s + 1) % self.num_players
         self.players[b].position = 'second'
         self.players[b].in_chips = self.big_blind
@@ -132,15 +154,7 @@ class Game:
         '''
         if self.allow_step_back:
             # First snapshot the current state
-            r = copy(self.round)
-            r_raised = copy(self.round.raised)
-            gp = self.game_pointer
-            r_c = self.round_counter
-            d_deck = copy(self.dealer.deck)
-            p = copy(self.public_cards)
-            ps = [copy(self.players[i]) for i in range(self.num_players)]
-            ps_hand = [copy(self.players[i].hand) for i in range(self.num_players)]
-            self.history.append((r, r_raised, gp, r_c, d_deck, p, ps, ps_hand))
+            self.history.append(self.get_snapshot())
 
         # Then we proceed to the next round
         self.game_pointer = self.round.proceed_round(self.players, action)
@@ -209,13 +223,30 @@ class Game:
             (bool): True if the game steps back successfully
         '''
         if len(self.history) > 0:
-            self.round, r_raised, self.game_pointer, self.round_counter, d_deck, self.public_cards, self.players, ps_hand = self.history.pop()
-            self.round.raised = r_raised
-            self.dealer.deck = d_deck
-            for i, hand in enumerate(ps_hand):
-                self.players[i].hand = hand
+            self.restore_snapshot(self.history.pop())
             return True
         return False
+
+    def get_snapshot(self):
+        ''' Cheap snapshot of everything step() can change (and of the hands and ranges, which searching agents
+        change): a tuple of immutable values and short lists, instead of copies of the round and player objects
+
+        Returns:
+            (tuple): Snapshot to be passed to restore_snapshot()
+        '''
+        round = self.round
+        players = tuple((player.in_chips, player.status, player.opponent_range, player.hand[:]) for player in self.players)
+        return (self.game_pointer, self.round_counter, self.public_cards[:], self.dealer.deck[:], round.game_pointer, round.have_raised_num, round.not_raise_num, round.raised[:], round.player_folded, players)
+
+    def restore_snapshot(self, snapshot):
+        ''' Return to the state of a snapshot taken by get_snapshot() during the same game
+        '''
+        self.game_pointer, self.round_counter, public_cards, deck, round_game_pointer, have_raised_num, not_raise_num, raised, player_folded, players = snapshot
+        self.public_cards, self.dealer.deck = public_cards[:], deck[:]
+        round = self.round
+        round.game_pointer, round.have_raised_num, round.not_raise_num, round.raised, round.player_folded = round_game_pointer, have_raised_num, not_raise_num, raised[:], player_folded
+        for player, (in_chips, status, opponent_range, hand) in zip(self.players, players):
+            player.in_chips, player.status, player.opponent_range, player.hand = in_chips, status, opponent_range, hand[:]
     
     @staticmethod
     def get_transition_probabilities_for_cards():
@@ -227,6 +258,9 @@ class Game:
         '''
 
         deck = Dealer.init_standard_deck()
+        # ranges are tested as masks: cards_in_range[mask] lists the cards of the deck whose rank belongs to the range
+        range_masks = {possible_range: get_range_mask(possible_range) for possible_range in Game.POSSIBLE_OPPONENT_RANGES}
+        cards_in_range = [[card for card in deck if RANK_BITS[card.rank] & mask] for mask in range(FULL_RANGE + 1)]
         win_frequencies = {}
         win_probabilities = {}
         tie_frequencies = {}
@@ -258,7 +292,7 @@ class Game:
                 if preflop_opponent_range not in flop_frequencies[my_hand.rank]:
                     flop_frequencies[my_hand.rank][preflop_opponent_range] = {}
                     for opponent_hand in preflop_opponent_range: # for each possible rank in opponent's hand
-                        possibly_removed_cards = list(filter(lambda card: card.rank == opponent_hand, deck))
+                        possibly_removed_cards = cards_in_range[RANK_BITS[opponent_hand]]
                         for removed_card in possibly_removed_cards: # we know the rank of the opponent's hand, but not the suit, calculate for all possible suits
                             remaining_deck = list(filter(lambda card: card != removed_card, deck))
                             for public_card1 in remaining_deck:
@@ -285,20 +319,18 @@ class Game:
                                 try_key_initialization(win_frequencies[my_hand.rank][hand], possible_hand_range, 0)
                                 try_key_initialization(loss_frequencies[my_hand.rank][hand], possible_hand_range, 0)
                                 try_key_initialization(total_opposing_frequencies[my_hand.rank][hand], possible_hand_range, 0)
-                                for opponent_hand in possible_hand_range:
-                                    remaining_opposing_deck = list(filter(lambda card: card.rank == opponent_hand, deck))
-                                    for opposing_hand in remaining_opposing_deck:
-                                        if my_hand != opposing_hand and public_card1 != opposing_hand and public_card2 != opposing_hand:
-                                            opposing_player.hand = [opposing_hand]
-                                            players = [ my_player, opposing_player ]
-                                            payoffs = Judger.judge_game(players, public_hands)
-                                            total_opposing_frequencies[my_hand.rank][hand][possible_hand_range] += 1
-                                            if payoffs[0] == 0.5:
-                                                win_frequencies[my_hand.rank][hand][possible_hand_range] += 1
-                                            elif payoffs[0] == 0:
-                                                tie_frequencies[my_hand.rank][hand][possible_hand_range] += 1
-                                            else:
-                                                loss_frequencies[my_hand.rank][hand][possible_hand_range] += 1
+                                for opposing_hand in cards_in_range[range_masks[possible_hand_range]]:
+                                    if my_hand != opposing_hand and public_card1 != opposing_hand and public_card2 != opposing_hand:
+                                        opposing_player.hand = [opposing_hand]
+                                        players = [ my_player, opposing_player ]
+                                        payoffs = Judger.judge_game(players, public_hands)
+                                        total_opposing_frequencies[my_hand.rank][hand][possible_hand_range] += 1
+                                        if payoffs[0] == 0.5:
+                                            win_frequencies[my_hand.rank][hand][possible_hand_range] += 1
+                                        elif payoffs[0] == 0:
+                                            tie_frequencies[my_hand.rank][hand][possible_hand_range] += 1
+                                        else:
+                                            loss_frequencies[my_hand.rank][hand][possible_hand_range] += 1
         
         # convert absolute frequencies to probabilities
         for hand in total_opposing_frequencies:
@@ -328,8 +360,8 @@ class Game:
                 range_frequencies[my_hand.rank]['none'][preflop_opponent_range] = {}
                 for new_opponent_range in Game.POSSIBLE_OPPONENT_RANGES:
                     range_frequencies[my_hand.rank]['none'][preflop_opponent_range][new_opponent_range] = 0
-                    for opponent_hand in deck:
-                        if opponent_hand != my_hand and opponent_hand.rank in preflop_opponent_range and opponent_hand.rank in new_opponent_range:
+                    for opponent_hand in cards_in_range[range_masks[preflop_opponent_range] & range_masks[new_opponent_range]]: # rank in both ranges
+                        if opponent_hand != my_hand:
                             range_frequencies[my_hand.rank]['none'][preflop_opponent_range][new_opponent_range] += 1
 
         # Do the same as above for all possible public hand combinations
@@ -344,8 +376,8 @@ class Game:
                                 range_frequencies[my_hand.rank][public_cards][preflop_opponent_range] = {}
                                 for new_opponent_range in Game.POSSIBLE_OPPONENT_RANGES:
                                     range_frequencies[my_hand.rank][public_cards][preflop_opponent_range][new_opponent_range] = 0
-                                    for opponent_hand in deck:
-                                        if opponent_hand != my_hand and opponent_hand != public_card1 and opponent_hand != public_card2 and opponent_hand.rank in preflop_opponent_range and opponent_hand.rank in new_opponent_range:
+                                    for opponent_hand in cards_in_range[range_masks[preflop_opponent_range] & range_masks[new_opponent_range]]: # rank in both ranges
+                                        if opponent_hand != my_hand and opponent_hand != public_card1 and opponent_hand != public_card2:
                                             range_frequencies[my_hand.rank][public_cards][preflop_opponent_range][new_opponent_range] += 1        
 
         # convert absolute frequencies to probabilities
@@ -0,0 +1,270 @@
+''' Asyncio server hosting many tables of human players against bots
+
+Every connection opens a table with its own Env: the client plays seat 0 as a RemoteHumanAgent, seat 1 is a bot that
+answers directly from a precomputed policy (agents without learning are stateless, so one bot is shared by all
+tables). Tables are played with Env.run_async(), so a table waiting for its human costs one suspended coroutine and a
+socket, and a single process holds thousands of idle or slow sessions without threads.
+
+The protocol is line based. The server sends json lines:
+
+    {"event": "state", "hand": 3, "obs": {...}, "legal_actions": ["bet", "check"], "action_record": [[1, "bet"]]}
+    {"event": "error", "message": "..."}
+    {"event": "result", "hand": 3, "payoffs": [1.5, -1.5], "hands": ["KS", "TH"], "public_cards": ["AD", "QC"],
+     "action_record": [...]}
+
+and the client answers every state with the index (or the name) of a legal action, or 'quit' to leave.
+Per table the server measures its latency: the time from receiving an action to sending the next state or result,
+which covers the bot's decisions and the game steps.
+'''
+
+import asyncio
+import json
+import time
+from collections import deque
+import numpy as np
+from env import Env
+
+
+class SessionClosed(Exception):
+    ''' The client of a table left or timed out
+    '''
+
+
+class RemoteHumanAgent:
+    ''' Human player whose decisions arrive over the connection of its table (only plays through Env.run_async())
+    '''
+
+    def __init__(self, modelled_opponent, table):
+        ''' Initialize the agent
+
+        Args:
+            modelled_opponent (Agent): Agent whose infer_card_range_from_action() is used for the human's actions, so
+                that the bot sees the ranges it expects (as HumanAgent)
+            table (Table): Table of the connection
+        '''
+        self.use_raw = True
+        self.modelled_opponent = modelled_opponent
+        self.table = table
+
+    async def step_async(self, state):
+        ''' Send the state to the client and wait for a legal action
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            action (str): The action chosen by the client
+        '''
+        legal_actions = state['raw_legal_actions']
+        self.table.send({ 'event': 'state', 'hand': self.table.num_hands, 'obs': state['obs'], 'legal_actions': legal_actions, 'action_record': state['action_record'] })
+        while True:
+            answer = await self.table.receive()
+            if answer in legal_actions:
+                return answer
+            if answer.isdigit() and int(answer) < len(legal_actions):
+                return legal_actions[int(answer)]
+            self.table.send({ 'event': 'error', 'message': 'Illegal action {}, legal actions: {}'.format(answer, ', '.join(legal_actions)) })
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Method only needed for online learning
+        '''
+        pass
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        return self.modelled_opponent.infer_card_range_from_action(action, game_round, current_range, other_chips, public_cards, position)
+
+
+class Table:
+    ''' One human and one bot, playing hands until the client leaves
+    '''
+
+    def __init__(self, table_id, reader, writer, bot, action_timeout = None, max_latencies = 1000):
+        ''' Initialize the table
+
+        Args:
+            table_id (int): Id of the table
+            reader (asyncio.StreamReader): Connection of the client
+            writer (asyncio.StreamWriter): Connection of the client
+            bot (Agent): Agent of seat 1
+            action_timeout (float): Seconds the client has for each action, no limit if None
+            max_latencies (int): Number of latest latencies kept for the percentiles
+        '''
+        self.table_id = table_id
+        self.reader = reader
+        self.writer = writer
+        self.action_timeout = action_timeout
+        self.env = Env({ 'allow_step_back': False, 'seed': None })
+        self.env.set_agents([RemoteHumanAgent(bot, self), bot])
+        self.num_hands = 0
+        self.num_actions = 0
+        self.latencies = deque(maxlen=max_latencies)
+        self.action_time = None # when the last action of the client arrived
+
+    def send(self, message):
+        ''' Queue a message for the client (written by the transport, see play())
+        '''
+        if self.action_time is not None:
+            self.latencies.append(time.perf_counter() - self.action_time)
+            self.action_time = None
+        self.writer.write(json.dumps(message).encode('utf-8') + b'\n')
+
+    async def receive(self):
+        ''' Next line of the client
+
+        Raises:
+            SessionClosed: If the client left, asked to quit or timed out
+        '''
+        await self.writer.drain()
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.action_timeout)
+        except asyncio.TimeoutError:
+            raise SessionClosed('timeout')
+        answer = line.decode('utf-8').strip()
+        if not line or answer == 'quit':
+            raise SessionClosed('quit')
+        self.action_time = time.perf_counter()
+        self.num_actions += 1
+        return answer
+
+    async def play(self):
+        ''' Play hands until the client leaves
+        '''
+        try:
+            while True:
+                _, payoffs = await self.env.run_async()
+                game = self.env.game
+                public_cards = game.public_cards if game.public_cards[0] is not None else []
+                self.send({ 'event': 'result', 'hand': self.num_hands, 'payoffs': payoffs, 'hands': [str(player.hand[0]) for player in game.players], 'public_cards': [str(card) for card in public_cards], 'action_record': self.env.action_recorder })
+                self.num_hands += 1
+        except (SessionClosed, ConnectionError):
+            pass
+        finally:
+            self.writer.close()
+
+    def metrics(self):
+        ''' Hands and actions played and the latency percentiles of the table
+
+        Returns:
+            (dict): Keys 'table', 'hands', 'actions', and 'latency_p50'/'latency_p99'/'latency_max' in seconds
+        '''
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return { 'table': self.table_id, 'hands': self.num_hands, 'actions': self.num_actions, 'latency_p50': float(np.percentile(latencies, 50)), 'latency_p99': float(np.percentile(latencies, 99)), 'latency_max': float(latencies.max()) }
+
+
+class GameServer:
+    ''' Accepts connections on a unix socket or a TCP port and opens a Table for each of them
+    '''
+
+    def __init__(self, bot, action_timeout = None):
+        ''' Initialize the server
+
+        Args:
+            bot (Agent): Agent playing against every client, shared by all tables (it must not learn)
+            action_timeout (float): Seconds a client has for each action, no limit if None
+        '''
+        self.bot = bot
+        self.action_timeout = action_timeout
+        self.tables = {}
+        self.closed_tables = []
+        self.num_tables = 0
+
+    async def start(self, path = None, host = '127.0.0.1', port = 0, backlog = 4096):
+        ''' Start listening on the unix socket path, or on host and port if path is None
+
+        Args:
+            backlog (int): Pending connections (asyncio's default of 100 refuses bursts of new tables)
+
+        Returns:
+            (asyncio.Server): The server
+        '''
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=path, backlog=backlog)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, host, port, backlog=backlog)
+        return self.server
+
+    async def _handle_connection(self, reader, writer):
+        table = Table(self.num_tables, reader, writer, self.bot, self.action_timeout)
+        self.num_tables += 1
+        self.tables[table.table_id] = table
+        try:
+            await table.play()
+        finally:
+            del self.tables[table.table_id]
+            self.closed_tables.append(table.metrics())
+
+    def metrics(self):
+        ''' Metrics of all tables, open and closed
+
+        Returns:
+            (dict): Keys 'open_tables', 'tables' (list of Table.metrics()), 'hands', and the p99 latency over tables
+                as 'latency_p99_median' (median table) and 'latency_p99_max' (worst table)
+        '''
+        tables = self.closed_tables + [table.metrics() for table in self.tables.values()]
+        latency_p99 = [table['latency_p99'] for table in tables if table['actions'] > 0] or [0.0]
+        return { 'open_tables': len(self.tables), 'tables': tables, 'hands': sum(table['hands'] for table in tables), 'latency_p99_median': float(np.median(latency_p99)), 'latency_p99_max': float(np.max(latency_p99)) }
+
+
+async def _simulated_client(path, num_hands, think_time, seed):
+    ''' Client acting at random after an exponentially distributed think time, for num_hands hands
+    '''
+    np_random = np.random.RandomState(seed)
+    reader, writer = await asyncio.open_unix_connection(path)
+    hands = 0
+    while hands < num_hands:
+        message = json.loads(await reader.readline())
+        if message['event'] == 'state':
+            await asyncio.sleep(np_random.exponential(think_time))
+            writer.write(b'%d\n' % np_random.randint(len(message['legal_actions'])))
+        elif message['event'] == 'result':
+            hands += 1
+    writer.write(b'quit\n')
+    await writer.drain()
+    writer.close()
+
+def _run_clients(path, num_clients, num_hands, think_time):
+    ''' Load generator process: num_clients concurrent simulated clients
+    '''
+    async def run():
+        await asyncio.gather(*[_simulated_client(path, num_hands, think_time, seed) for seed in range(num_clients)])
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    # Serve human players against a bot, or measure the server under simulated slow clients (--clients)
+    import argparse
+    import multiprocessing
+    import os
+    from threshold_agent import ThresholdAgent
+    from policy_store import StoreAgent
+
+    parser = argparse.ArgumentParser(description='Multi-table game server')
+    parser.add_argument('--socket', default='game_server.sock', help='unix socket path')
+    parser.add_argument('--policy', help='policy store of the bot (see policy_store.py), ThresholdAgent if not given')
+    parser.add_argument('--action-timeout', type=float, help='seconds a client has for each action')
+    parser.add_argument('--clients', type=int, default=0, help='number of simulated clients, 0 to serve until interrupted')
+    parser.add_argument('--hands', type=int, default=5, help='hands per simulated client')
+    parser.add_argument('--think-time', type=float, default=0.5, help='mean think time of simulated clients in seconds')
+    args = parser.parse_args()
+
+    bot = StoreAgent(None, False, args.policy) if args.policy else ThresholdAgent(False)
+
+    async def main():
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = GameServer(bot, args.action_timeout)
+        await server.start(args.socket)
+        if args.clients == 0:
+            print('Serving on', args.socket)
+            await server.server.serve_forever()
+        start_time = time.perf_counter()
+        clients = multiprocessing.get_context('spawn').Process(target=_run_clients, args=(args.socket, args.clients, args.hands, args.think_time))
+        clients.start()
+        while clients.is_alive():
+            await asyncio.sleep(1.0)
+            metrics = server.metrics()
+            print('%5.1fs %5d open tables, %6d hands, p99 latency median table %.2fms, worst table %.2fms' % (time.perf_counter() - start_time, metrics['open_tables'], metrics['hands'], 1000 * metrics['latency_p99_median'], 1000 * metrics['latency_p99_max']))
+        server.server.close()
+        os.remove(args.socket)
+
+    asyncio.run(main())
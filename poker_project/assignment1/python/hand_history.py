@@ -0,0 +1,236 @@
+''' Compact hand histories: one 64 bit record per hand in an append-only file
+
+A hand is fully determined by the four dealt cards, the seat of the small blind and the actions (the players acting
+follow from the rules), so it packs into a single unsigned 64 bit integer:
+
+    | bits  | field                                                                              |
+    |-------|------------------------------------------------------------------------------------|
+    | 0-19  | card ids (index in Dealer.init_standard_deck(), 5 bits each) of hand 0, hand 1 and |
+    |       | both public cards (the cards that would have been dealt if the hand ended early)    |
+    | 20    | seat of the small blind                                                            |
+    | 21-24 | number of actions                                                                  |
+    | 25-40 | actions (index in Round.FULL_ACTIONS, 2 bits each, at most 8, 6 are possible)      |
+    | 56-63 | payoff of player 0 in half chips (signed)                                          |
+
+The file is the magic followed by the records, appended in blocks. Reading maps it read-only as one uint64 column
+that decode_columns() splits into one numpy column per field with vectorized bit operations; decode_hand() and
+replay_hand() turn a single record back into cards and states for debugging.
+'''
+
+import mmap
+import os
+import numpy as np
+from dealer import Dealer
+from round import Round
+
+MAGIC = b'HHIST001'
+RECORD_DTYPE = np.dtype('<u8')
+DECK = Dealer.init_standard_deck()
+CARD_IDS = {str(card): card_id for card_id, card in enumerate(DECK)}
+ACTIONS = Round.FULL_ACTIONS
+ACTION_IDS = {action: action_id for action_id, action in enumerate(ACTIONS)}
+MAX_ACTIONS = 8
+CARD_BITS = 5
+SMALL_BLIND_SHIFT = 20
+NUM_ACTIONS_SHIFT = 21
+ACTIONS_SHIFT = 25
+PAYOFF_SHIFT = 56
+
+
+def encode_hand(cards, small_blind, actions, payoff):
+    ''' Pack a hand into a record
+
+    Args:
+        cards (list): Hand of player 0, hand of player 1 and the two public cards (Card)
+        small_blind (int): Seat of the small blind
+        actions (list): Actions of the hand in order (str)
+        payoff (float): Payoff of player 0 (a multiple of 0.5)
+
+    Returns:
+        (int): The record
+    '''
+    if len(actions) > MAX_ACTIONS:
+        raise ValueError('A record holds at most {} actions, got {}'.format(MAX_ACTIONS, actions))
+    record = 0
+    for index, card in enumerate(cards):
+        record |= CARD_IDS[str(card)] << (CARD_BITS * index)
+    record |= small_blind << SMALL_BLIND_SHIFT
+    record |= len(actions) << NUM_ACTIONS_SHIFT
+    for index, action in enumerate(actions):
+        record |= ACTION_IDS[action] << (ACTIONS_SHIFT + 2 * index)
+    return record | ((int(round(2 * payoff)) & 0xFF) << PAYOFF_SHIFT)
+
+def encode_game(game, action_record, payoffs):
+    ''' Record of a finished game
+
+    Args:
+        game (Game): The finished game
+        action_record (list): (player id, action) pairs of the hand, e.g. Env.action_recorder
+        payoffs (list): Payoffs of the game
+    '''
+    if game.public_cards[0] is not None:
+        public_cards = game.public_cards
+    else: # ended in the first round, the public cards are still the last cards of the deck
+        public_cards = [game.dealer.deck[-1], game.dealer.deck[-2]]
+    cards = [game.players[0].hand[0], game.players[1].hand[0]] + list(public_cards)
+    return encode_hand(cards, game.starting_game_pointer, [action for _, action in action_record], payoffs[0])
+
+def decode_columns(records):
+    ''' Split records into columns with vectorized bit operations
+
+    Args:
+        records (np.ndarray): uint64 records, e.g. read_hand_history()
+
+    Returns:
+        (dict): 'cards' (n, 4) card ids, 'small_blind' (n,), 'num_actions' (n,), 'actions' (n, MAX_ACTIONS) action
+            ids with -1 after the last action, and 'payoff' (n,) payoffs of player 0 in chips
+    '''
+    records = np.asarray(records, dtype=RECORD_DTYPE)
+    cards = np.stack([(records >> np.uint64(CARD_BITS * index)) & np.uint64(0x1F) for index in range(4)], axis=1).astype(np.int8)
+    num_actions = ((records >> np.uint64(NUM_ACTIONS_SHIFT)) & np.uint64(0xF)).astype(np.int8)
+    actions = np.stack([(records >> np.uint64(ACTIONS_SHIFT + 2 * index)) & np.uint64(0x3) for index in range(MAX_ACTIONS)], axis=1).astype(np.int8)
+    actions[np.arange(MAX_ACTIONS) >= num_actions[:, None]] = -1
+    return {
+        'cards': cards,
+        'small_blind': ((records >> np.uint64(SMALL_BLIND_SHIFT)) & np.uint64(1)).astype(np.int8),
+        'num_actions': num_actions,
+        'actions': actions,
+        'payoff': (records >> np.uint64(PAYOFF_SHIFT)).astype(np.uint8).view(np.int8) / 2.0,
+    }
+
+def decode_hand(record):
+    ''' Unpack a record
+
+    Returns:
+        (dict): 'hands' (Card of each player), 'public_cards' (list of Card), 'small_blind', 'actions' (list of str),
+            'payoffs' (list) and 'deal' (to replay the hand, see Game.sample_deal())
+    '''
+    record = int(record)
+    cards = [DECK[(record >> (CARD_BITS * index)) & 0x1F] for index in range(4)]
+    small_blind = (record >> SMALL_BLIND_SHIFT) & 1
+    num_actions = (record >> NUM_ACTIONS_SHIFT) & 0xF
+    payoff = ((record >> PAYOFF_SHIFT) ^ 0x80) - 0x80 # sign of the top byte
+    rest = [card for card in DECK if card not in cards]
+    return {
+        'hands': cards[:2],
+        'public_cards': cards[2:],
+        'small_blind': small_blind,
+        'actions': [ACTIONS[(record >> (ACTIONS_SHIFT + 2 * index)) & 0x3] for index in range(num_actions)],
+        'payoffs': [payoff / 2.0, -payoff / 2.0],
+        'deal': (tuple(rest + cards[:1:-1] + cards[1::-1]), small_blind), # dealt from the end: hand 0, hand 1, public cards
+    }
+
+def replay_hand(record, env = None):
+    ''' States of a recorded hand, replayed in an environment
+
+    The opponent ranges of the states stay full, as the agents inferring them are not recorded.
+
+    Args:
+        record (int): The record
+        env (Env): Environment to replay in, a new one if None
+
+    Returns:
+        (list): (player id, state) before each action and of both players at the end, as in the trajectories of
+            Env.run()
+    '''
+    if env is None:
+        from env import Env
+        env = Env({ 'allow_step_back': False, 'seed': None })
+    hand = decode_hand(record)
+    state, player_id = env.reset(hand['deal'])
+    states = []
+    for action in hand['actions']:
+        states.append((player_id, state))
+        state, player_id = env.step(action, raw_action = True)
+    return states + [(player_id, env.get_state(player_id)) for player_id in range(env.num_players)]
+
+
+class HandHistoryWriter:
+    ''' Appends records to a hand history file, in blocks of buffer_size records
+    '''
+
+    def __init__(self, path, buffer_size = 4096):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        elif self.file.tell() % RECORD_DTYPE.itemsize != 0: # drop the incomplete record of an interrupted write
+            self.file.truncate(self.file.tell() // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize)
+
+    def record(self, game, action_record, payoffs):
+        ''' Append the finished game (see Env.set_hand_history())
+        '''
+        self.append(encode_game(game, action_record, payoffs))
+
+    def append(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(np.array(self.buffer, dtype=RECORD_DTYPE).tobytes())
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_hand_history(path):
+    ''' Map a hand history file read-only
+
+    Returns:
+        (np.ndarray): Read-only uint64 records backed by the memory map (an incomplete last record is ignored)
+    '''
+    if os.path.getsize(path) <= len(MAGIC):
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError('{} is not a hand history file'.format(path))
+    return np.frombuffer(buffer, dtype=RECORD_DTYPE, count=(len(buffer) - len(MAGIC)) // RECORD_DTYPE.itemsize, offset=len(MAGIC))
+
+
+if __name__ == '__main__':
+    # Size and speed of hand histories against keeping the trajectories of Env.run()
+    import pickle
+    import time
+    from env import Env
+    from random_agent import RandomAgent
+    from threshold_agent import ThresholdAgent
+
+    num_hands = 10**5
+    path = 'hand_history.bin'
+    if os.path.exists(path):
+        os.remove(path)
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    env.set_agents([RandomAgent(env.np_random, False), ThresholdAgent(False)])
+    writer = HandHistoryWriter(path)
+    env.set_hand_history(writer)
+    trajectories_bytes = 0
+    start_time = time.perf_counter()
+    for hand in range(num_hands):
+        trajectories, payoffs = env.run()
+        if hand < 1000:
+            trajectories_bytes += len(pickle.dumps(trajectories))
+    writer.close()
+    env.set_hand_history(None)
+    print('%d hands played and recorded in %.1fs' % (num_hands, time.perf_counter() - start_time))
+    print('trajectories %.0f bytes per hand (pickled), record 8 bytes per hand, file %d bytes' % (trajectories_bytes / 1000, os.path.getsize(path)))
+
+    start_time = time.perf_counter()
+    columns = decode_columns(read_hand_history(path))
+    print('read and decoded %d records in %.1fms' % (len(columns['payoff']), 1000 * (time.perf_counter() - start_time)))
+    for small_blind in range(2):
+        print('player 0 small blind %d: mean payoff %.4f' % (small_blind, columns['payoff'][columns['small_blind'] == small_blind].mean()))
+    print('hands ending with a fold: %.3f' % (columns['actions'][np.arange(len(columns['payoff'])), columns['num_actions'] - 1] == ACTION_IDS['fold']).mean())
+
+    hand = decode_hand(read_hand_history(path)[0])
+    print('first hand:', [str(card) for card in hand['hands']], [str(card) for card in hand['public_cards']], hand['actions'], hand['payoffs'])
+    for player_id, state in replay_hand(read_hand_history(path)[0]):
+        print(player_id, state['obs'])
+    os.remove(path)
@@ -0,0 +1,209 @@
+''' Lock-free (Hogwild) multi-process Q Learning
+
+Q values and policy of an ArrayQModel live in shared memory, and several worker processes, each with its
+own Env, opponent and ArrayQLearningAgent, update them asynchronously without locks. The number of completed
+hands, which drives the alpha/epsilon schedules, is kept approximately: every worker adds its hands to a
+shared counter every sync_every hands (races may lose a few increments) and reads back the global total.
+'''
+
+import json
+import multiprocessing
+from multiprocessing import shared_memory
+import time
+import numpy as np
+from env import Env
+from array_q_model import ArrayQModel
+from array_q_learning_agent import ArrayQLearningAgent
+from q_learning_agent import QLearningAgent
+from sweep import OPPONENT_FACTORIES
+import seeding
+
+
+class SharedArrayQModel:
+    ''' Q values, policy and episode counter of an ArrayQModel allocated in shared memory
+    '''
+
+    def __init__(self, model, name = None):
+        ''' Create the shared memory and copy the model into it, or attach to an existing one by name
+
+        Args:
+            model (ArrayQModel): The model, only its state keys are used when attaching
+            name (str): Name of an existing shared memory block to attach to
+        '''
+        num_states, num_actions = len(model.state_keys), len(ArrayQModel.ACTIONS)
+        self.q_nbytes = num_states * num_actions * 8
+        nbytes = self.q_nbytes + num_states + 8
+        self.is_owner = name is None
+        self.shm = shared_memory.SharedMemory(name = name, create = self.is_owner, size = nbytes)
+        Q = np.ndarray((num_states, num_actions), dtype=np.float64, buffer=self.shm.buf)
+        policy = np.ndarray(num_states, dtype=np.int8, buffer=self.shm.buf, offset=self.q_nbytes)
+        self.episode_counter = np.ndarray(1, dtype=np.int64, buffer=self.shm.buf, offset=self.q_nbytes + num_states)
+        if self.is_owner:
+            Q[:] = model.Q
+            policy[:] = model.policy
+            self.episode_counter[0] = model.episode_num
+        self.model = ArrayQModel(model.state_keys, Q, policy, int(self.episode_counter[0]))
+        self.model.legal = model.legal # same for all processes, no need to share
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        ''' Detach from the shared memory, and free it if this process created it
+
+        The views of the model are cleared first, so that agents still holding the model fail on None instead of
+        reading unmapped memory.
+        '''
+        self.model.Q = self.model.policy = None
+        del self.model, self.episode_counter
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
+
+
+class HogwildTrainer:
+    ''' Trains one shared Q table with several worker processes
+    '''
+
+    def __init__(self, q_learning_agent, opponent = 'random', num_workers = None, sync_every = 100, seed = 0):
+        ''' Initialize the trainer
+
+        Args:
+            q_learning_agent (QLearningAgent): Agent whose model and hyperparameters are trained, initialized by a state space or a pretrained model
+            opponent (str): Key of sweep.OPPONENT_FACTORIES
+            num_workers (int): Number of worker processes, defaults to the number of CPUs
+            sync_every (int): Number of hands between updates of the shared episode counter
+            seed (int): Base seed of the workers' environments: worker w of the c-th call of train() uses
+                seed + c * num_workers + w, so that every chunk of training plays new deals and explores anew
+        '''
+        self.agent = q_learning_agent
+        self.opponent = opponent
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.sync_every = sync_every
+        self.seed = seed
+        self.num_chunks = 0 # calls of train() so far
+
+    def train(self, num_hands = None, duration = None):
+        ''' Train until num_hands hands have been played or duration seconds have passed over all workers
+
+        Returns:
+            (dict): Statistics with keys 'hands', 'seconds', 'hands_per_second' and the mean payoff 'mean_payoff' of the learner
+        '''
+        if (num_hands is None) == (duration is None):
+            raise ValueError('Exactly one of num_hands and duration must be given')
+        model = ArrayQModel.from_model(self.agent.model)
+        shared = SharedArrayQModel(model)
+        hyperparameters = { 'initial_epsilon': self.agent.initial_epsilon, 'initial_alpha': self.agent.initial_alpha, 'epsilon_decay': self.agent.epsilon_decay, 'alpha_decay': self.agent.alpha_decay }
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+        results = context.Queue()
+        workers = []
+        chunk_seed = self.seed + self.num_chunks * self.num_workers
+        self.num_chunks += 1
+        for worker_id in range(self.num_workers):
+            worker_hands = None if num_hands is None else num_hands // self.num_workers + (1 if worker_id < num_hands % self.num_workers else 0)
+            workers.append(context.Process(target=_run_worker, args=(shared.name, model.state_keys, model.legal, hyperparameters, self.opponent, chunk_seed + worker_id, worker_hands, duration, self.sync_every, results)))
+        start_time = time.time()
+        try:
+            for worker in workers:
+                worker.start()
+            worker_results = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            seconds = time.time() - start_time
+
+            shared.model.episode_num = int(shared.episode_counter[0])
+            trained = ArrayQModel(model.state_keys, shared.model.Q.copy(), shared.model.policy.copy(), shared.model.episode_num)
+            trained.write_to_model(self.agent.model)
+            self.agent._update_epsilon()
+            self.agent._update_alpha()
+        finally:
+            shared.close()
+
+        hands = sum(count for count, _ in worker_results)
+        return { 'hands': hands, 'seconds': seconds, 'hands_per_second': hands / seconds, 'mean_payoff': sum(total for _, total in worker_results) / max(hands, 1) }
+
+
+def _run_worker(shm_name, state_keys, legal, hyperparameters, opponent, seed, num_hands, duration, sync_every, results):
+    ''' Worker process: play hands with its own Env and opponent, updating the shared model in place
+    '''
+    Q = np.zeros(legal.shape) # placeholder, only used for the shapes and legal actions before attaching
+    Q[~legal] = -np.inf
+    shared = SharedArrayQModel(ArrayQModel(state_keys, Q, np.zeros(len(state_keys), dtype=np.int8)), name = shm_name)
+    env = Env({ 'allow_step_back': False, 'seed': seed })
+    agent = ArrayQLearningAgent(env.np_random, False, pretrained_model = shared.model, is_learning = True, **hyperparameters)
+    env.set_agents([agent, OPPONENT_FACTORIES[opponent](env.np_random)])
+
+    end_time = None if duration is None else time.time() + duration
+    count, total, unsynced = 0, 0.0, 0
+    while (num_hands is None or count < num_hands) and (end_time is None or time.time() < end_time):
+        _, payoffs = env.run()
+        count += 1
+        total += payoffs[0]
+        unsynced += 1
+        if unsynced == sync_every:
+            # approximate global episode counter: read-modify-write without lock, then follow the global schedule
+            shared.episode_counter[0] += unsynced
+            agent.model['episode_num'] = int(shared.episode_counter[0])
+            agent._update_epsilon()
+            agent._update_alpha()
+            unsynced = 0
+    shared.episode_counter[0] += unsynced
+    results.put((count, total))
+    del agent, env # drop every reference to the shared arrays before detaching
+    shared.close()
+
+
+def time_to_target_payoff(q_learning_agent_factory, target_payoff, worker_counts, opponent = 'random', chunk_seconds = 5, eval_hands = 10**4, max_seconds = 600, seed = 0, eval_seed = None):
+    ''' Wall-clock time until the greedy policy reaches target_payoff, for each number of workers
+
+    Args:
+        q_learning_agent_factory (function): Returns a fresh QLearningAgent, called once per worker count
+        target_payoff (float): Mean payoff of the greedy policy to be reached
+        worker_counts (list): Numbers of workers to be compared
+        opponent (str): Key of sweep.OPPONENT_FACTORIES
+        chunk_seconds (float): Training time between evaluations
+        eval_hands (int): Hands per evaluation of the greedy policy (not counted as training time)
+        max_seconds (float): Training time limit per worker count
+        seed (int): Base seed of the training (see HogwildTrainer)
+        eval_seed (int): Seed of the evaluation hands, the same for all evaluations so that they are comparable,
+            by default one that no worker uses for training
+
+    Returns:
+        (dict): Number of workers to (training seconds, training hands, reached payoff)
+    '''
+    if eval_seed is None:
+        eval_seed = seed + 2**32 # training seeds stay far below
+    results = {}
+    for num_workers in worker_counts:
+        agent = q_learning_agent_factory()
+        trainer = HogwildTrainer(agent, opponent, num_workers, seed = seed)
+        seconds, hands, payoff = 0.0, 0, -np.inf
+        while payoff < target_payoff and seconds < max_seconds:
+            statistics = trainer.train(duration = chunk_seconds)
+            seconds += statistics['seconds']
+            hands += statistics['hands']
+            payoff = _evaluate_greedy(agent, opponent, eval_hands, eval_seed)
+        results[num_workers] = (seconds, hands, payoff)
+    return results
+
+def _evaluate_greedy(agent, opponent, num_hands, seed):
+    env = Env({ 'allow_step_back': False, 'seed': seed })
+    greedy_agent = QLearningAgent(env.np_random, False, pretrained_model = agent.model, is_learning = False)
+    env.set_agents([greedy_agent, OPPONENT_FACTORIES[opponent](env.np_random)])
+    return np.mean([env.run()[1][0] for _ in range(num_hands)])
+
+
+if __name__ == '__main__':
+    # Scaling of wall-clock-to-target-payoff with the number of cores vs Random Agent
+    # WARNING: This script loads random_agent_state_space.json created by the notebook.
+    with open('random_agent_state_space.json') as json_file:
+        unknown_agent_state_space = json.load(json_file)
+
+    def make_agent():
+        np_random, _ = seeding.np_random(0)
+        return QLearningAgent(np_random, False, is_learning = True, initial_alpha = 0.1, epsilon_decay = -1/8, alpha_decay = -1/8, state_space = unknown_agent_state_space)
+
+    worker_counts = [1, 2, 4, multiprocessing.cpu_count()]
+    for num_workers, (seconds, hands, payoff) in time_to_target_payoff(make_agent, 0.75, worker_counts).items():
+        print('workers:', num_workers, 'seconds:', round(seconds, 1), 'hands:', hands, 'greedy payoff:', round(payoff, 4))
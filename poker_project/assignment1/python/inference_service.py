@@ -0,0 +1,158 @@
+''' Batched policy inference for many tables in one process
+
+Tables played concurrently with Env.run_async() (see game_server.py) hand their bot decisions to an
+InferenceService instead of looking them up one by one: a ServiceAgent encodes the observation into a state id
+(policy_store.encode_observation()) and awaits the answer, while the service collects the requests of all tables
+for a short time window and answers them with one vectorized lookup, or a masked argmax when the store holds Q
+values (PolicyStore.get_action_ids()).
+'''
+
+import asyncio
+import time
+from collections import deque
+import numpy as np
+from card_range import FULL_RANGE
+from policy_store import PolicyStore, ACTIONS, NO_ACTION, encode_observation
+
+
+class InferenceService:
+    ''' Coalesces single decisions of many tables into batched lookups
+    '''
+
+    def __init__(self, store, window = 0.0, max_batch = 1024, max_latencies = 10**5):
+        ''' Initialize the service
+
+        Args:
+            store (PolicyStore or str): Store or path of the store file
+            window (float): Seconds a request waits for others to join its batch (0 batches the requests made in the
+                same iteration of the event loop)
+            max_batch (int): Batch size that is answered without waiting for the end of the window
+            max_latencies (int): Number of latest request latencies kept for the percentiles
+        '''
+        self.store = store if isinstance(store, PolicyStore) else PolicyStore(store)
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = []
+        self.flush_handle = None
+        self.num_requests = 0
+        self.num_batches = 0
+        self.latencies = deque(maxlen=max_latencies)
+
+    def infer(self, state_id, legal_mask):
+        ''' Queue one decision
+
+        Args:
+            state_id (int): State id of the observation
+            legal_mask (list): 4 booleans of the legal actions (order of Round.FULL_ACTIONS)
+
+        Returns:
+            (asyncio.Future): Resolves to the action id
+        '''
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((state_id, legal_mask, future, time.perf_counter()))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self.flush_handle = loop.call_later(self.window, self.flush) if self.window > 0 else loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        ''' Answer all pending requests with one lookup
+        '''
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        state_ids = np.fromiter((request[0] for request in batch), dtype=np.int64, count=len(batch))
+        legal_masks = np.array([request[1] for request in batch], dtype=bool)
+        action_ids = self.store.get_action_ids(state_ids, legal_masks).tolist()
+        now = time.perf_counter()
+        for (_, _, future, start_time), action_id in zip(batch, action_ids):
+            if not future.done():
+                future.set_result(action_id)
+            self.latencies.append(now - start_time)
+        self.num_requests += len(batch)
+        self.num_batches += 1
+
+    def metrics(self):
+        ''' Requests, batches and latency percentiles so far
+
+        Returns:
+            (dict): Keys 'requests', 'batches', 'mean_batch' and 'latency_p50'/'latency_p99' in seconds
+        '''
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return { 'requests': self.num_requests, 'batches': self.num_batches, 'mean_batch': self.num_requests / max(self.num_batches, 1), 'latency_p50': float(np.percentile(latencies, 50)), 'latency_p99': float(np.percentile(latencies, 99)) }
+
+
+class ServiceAgent:
+    ''' Agent asking an InferenceService for its actions (only plays through Env.run_async())
+    '''
+
+    def __init__(self, service):
+        self.service = service
+        self.use_raw = True
+
+    async def step_async(self, state):
+        ''' Action of the service's policy
+
+        Raises:
+            KeyError: If the state is not in the policy
+        '''
+        legal_actions = state['legal_actions'] # action ids in the order of Round.FULL_ACTIONS
+        action_id = await self.service.infer(encode_observation(state['obs']), [action_id in legal_actions for action_id in range(len(ACTIONS))])
+        if action_id == NO_ACTION:
+            raise KeyError('State {} is not in the policy of {}'.format(state['obs'], self.service.store.path))
+        return ACTIONS[action_id]
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Method only needed for online learning
+        '''
+        pass
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        return FULL_RANGE # range cannot be inferred by agent's actions
+
+
+async def _play_table(service, num_hands, seed):
+    from env import Env
+    from random_agent import RandomAgent
+    env = Env({ 'allow_step_back': False, 'seed': seed })
+    env.set_agents([ServiceAgent(service), RandomAgent(env.np_random, False)])
+    for _ in range(num_hands):
+        await env.run_async()
+
+
+if __name__ == '__main__':
+    # Throughput and latency of the service for many concurrent tables (ServiceAgent against RandomAgent) under
+    # different coalescing windows, against StoreAgent answering each decision alone
+    # WARNING: The optimal policy json file of the random agent created by the notebook is loaded
+    import json
+    from env import Env
+    from random_agent import RandomAgent
+    from policy_store import StoreAgent, write_store
+
+    with open('random_agent_optimal_policy.json') as json_file:
+        write_store('random_agent_policy.store', json.load(json_file))
+    store = PolicyStore('random_agent_policy.store')
+    num_hands = 20
+
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    env.set_agents([StoreAgent(None, False, store), RandomAgent(env.np_random, False)])
+    start_time = time.perf_counter()
+    for _ in range(10**4):
+        env.run()
+    print('StoreAgent, one table %8.0f hands/sec' % (10**4 / (time.perf_counter() - start_time)))
+
+    for num_tables in [10, 100, 1000]:
+        for window in [0.0, 0.0005]:
+            service = InferenceService(store, window)
+            async def main():
+                await asyncio.gather(*[_play_table(service, num_hands, seed) for seed in range(num_tables)])
+            start_time = time.perf_counter()
+            asyncio.run(main())
+            seconds = time.perf_counter() - start_time
+            metrics = service.metrics()
+            print('%4d tables, window %.1fms %8.0f hands/sec, %8.0f decisions/sec, mean batch %6.1f, latency p50 %.3fms p99 %.3fms' % (num_tables, 1000 * window, num_tables * num_hands / seconds, metrics['requests'] / seconds, metrics['mean_batch'], 1000 * metrics['latency_p50'], 1000 * metrics['latency_p99']))
@@ -0,0 +1,193 @@
+''' Information set Monte Carlo tree search agent
+'''
+
+import time
+from math import log, sqrt
+from game import Game
+from dealer import Dealer
+from card_range import FULL_RANGE, RANK_BITS, get_range_mask
+
+
+class ISMCTSAgent:
+    ''' Single observer information set MCTS
+
+    At every decision the current game is rebuilt from the observation (own hand, public cards, position and the
+    action record). Every simulation determinizes it: the opponent's hand is sampled from the unseen cards whose rank
+    is in the opponent range of the observation, and the unseen cards are shuffled into the deck. The simulation then
+    walks a tree of action histories shared by all determinizations (UCB1 for the acting player, one new node per
+    simulation, random rollout) and the game is reset to the decision with Game.restore_snapshot(), which only
+    restores a few values instead of copying the game. The most visited action is played.
+    '''
+
+    def __init__(self, np_random, print_enabled, num_simulations = None, time_budget = 0.005, exploration = 2.0):
+        ''' Initialize the agent
+
+        Args:
+            num_simulations (int): Simulations per decision, if None the search is limited by time_budget
+            time_budget (float): Seconds of search per decision
+            exploration (float): Exploration constant of UCB1 (payoffs are in chips)
+        '''
+        self.np_random = np_random
+        self.print_enabled = print_enabled
+        self.use_raw = True
+        self.num_simulations = num_simulations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.total_simulations = 0
+        self.total_search_seconds = 0.0
+
+    @property
+    def simulations_per_second(self):
+        return self.total_simulations / self.total_search_seconds if self.total_search_seconds > 0 else 0.0
+
+    def step(self, state):
+        ''' Search from the current state and choose the most visited action
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            action (str): The chosen action
+        '''
+        if self.print_enabled: self._print_state(state['raw_obs'], state['action_record'])
+        if len(state['raw_legal_actions']) == 1:
+            return state['raw_legal_actions'][0]
+
+        start_time = time.perf_counter()
+        game, player_id, unseen_cards = self._rebuild_game(state)
+        opponent_range = get_range_mask(state['obs']['opponent_range'])
+        possible_cards = [card for card in unseen_cards if RANK_BITS[card.rank] & opponent_range] or unseen_cards
+        root = game.get_snapshot()
+        tree = {}
+        num_simulations = 0
+        while (num_simulations < self.num_simulations) if self.num_simulations is not None else (num_simulations == 0 or time.perf_counter() - start_time < self.time_budget):
+            game.restore_snapshot(root)
+            self._determinize(game, player_id, possible_cards, unseen_cards)
+            self._simulate(game, tree)
+            num_simulations += 1
+        self.total_simulations += num_simulations
+        self.total_search_seconds += time.perf_counter() - start_time
+
+        counts = tree[()][0]
+        return max(state['raw_legal_actions'], key=lambda action: counts.get(action, 0))
+
+    def _rebuild_game(self, state):
+        ''' Game in the current state, with the opponent's hand (and future public cards) still to be determinized
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (Game): The game
+                (int): Id of this agent's player
+                (list): Cards neither in this agent's hand nor public
+        '''
+        raw_obs = state['raw_obs']
+        player_id = raw_obs['current_player']
+        my_card = raw_obs['hand'][0]
+        public_cards = [card for card in raw_obs['public_cards'] if card is not None]
+        unseen_cards = [card for card in Dealer.init_standard_deck() if card != my_card and card not in public_cards]
+        hands = [my_card, unseen_cards[0]] if player_id == 0 else [unseen_cards[0], my_card] # placeholder opponent hand
+        deck = unseen_cards[1:] + public_cards[::-1] + hands[::-1] # player 0 is dealt first, then player 1, then the public cards, all from the end
+        small_blind = player_id if raw_obs['position'] == 'first' else 1 - player_id
+        game = Game()
+        game.np_random = self.np_random
+        game.init_game((tuple(deck), small_blind))
+        for _, action in state['action_record']:
+            game.step(action)
+        return game, player_id, unseen_cards
+
+    def _determinize(self, game, player_id, possible_cards, unseen_cards):
+        ''' Sample the opponent's hand and shuffle the other unseen cards into the deck
+        '''
+        opponent_card = possible_cards[self.np_random.randint(len(possible_cards))]
+        game.players[1 - player_id].hand = [opponent_card]
+        deck = [card for card in unseen_cards if card != opponent_card]
+        self.np_random.shuffle(deck)
+        game.dealer.deck = deck
+
+    def _simulate(self, game, tree):
+        ''' One simulation: selection and expansion in the tree, random rollout, backpropagation
+
+        The tree maps an action history since the decision (with the public cards once dealt) to the visit counts
+        and total payoffs (of the player acting there) per action.
+        '''
+        key = ()
+        path = []
+        expanded = False
+        while not game.is_over():
+            legal_actions = game.round.get_legal_actions()
+            node = tree.get(key)
+            if node is None and not expanded:
+                node = tree[key] = ({}, {})
+                expanded = True
+            if node is None: # rollout
+                action = legal_actions[self.np_random.randint(len(legal_actions))]
+            else:
+                action = self._select(node, legal_actions)
+                path.append((node, action, game.game_pointer))
+            round_counter = game.round_counter
+            game.step(action)
+            key += (action,)
+            if round_counter == 0 and game.round_counter == 1 and not game.is_over():
+                key += (''.join(sorted(card.rank for card in game.public_cards)),)
+
+        payoffs = game.get_payoffs()
+        for (counts, values), action, player_id in path:
+            counts[action] = counts.get(action, 0) + 1
+            values[action] = values.get(action, 0.0) + payoffs[player_id]
+
+    def _select(self, node, legal_actions):
+        ''' Untried action at random, else UCB1
+        '''
+        counts, values = node
+        untried_actions = [action for action in legal_actions if action not in counts]
+        if untried_actions:
+            return untried_actions[self.np_random.randint(len(untried_actions))]
+        log_total = log(sum(counts[action] for action in legal_actions))
+        return max(legal_actions, key=lambda action: values[action] / counts[action] + self.exploration * sqrt(log_total / counts[action]))
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Method only needed for online learning
+        '''
+        pass
+
+    def _print_state(self, state, action_record):
+        ''' Print out the state
+
+        Args:
+            state (dict): A dictionary of the raw state
+            action_record (list): A list of the historical actions
+        '''
+        if len(action_record) > 0:
+            print('>> Player', action_record[-1][0], 'chooses', action_record[-1][1])
+
+        print('===============     Chips      ===============')
+        for i in range(len(state['all_chips'])):
+            if i == state['current_player']:
+                print('ISMCTS Agent (Player {}): '.format(i), state['my_chips'])
+            else:
+                print('Player {}: '.format(i) , state['all_chips'][i])
+        print('\n=========== Actions ISMCTS Agent Can Choose ===========')
+        print(', '.join([str(index) + ': ' + action for index, action in enumerate(state['legal_actions'])]))
+        print('')
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        return FULL_RANGE # range cannot be inferred by agent's actions
+
+
+if __name__ == '__main__':
+    # Payoff of the ISMCTS agent against the agents of the notebook at fixed time budgets per decision
+    from env import Env
+    from random_agent import RandomAgent
+    from threshold_agent import ThresholdAgent
+    from evaluation import DuplicateEvaluation
+    import seeding
+
+    np_random, _ = seeding.np_random(0)
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    num_hands = 2000
+    for time_budget in [0.001, 0.005, 0.02]:
+        for name, opponent in [('Random', RandomAgent(np_random, False)), ('Threshold', ThresholdAgent(False))]:
+            agent = ISMCTSAgent(np_random, False, time_budget = time_budget)
+            result = DuplicateEvaluation(env, agent, opponent, chunk_size = num_hands, min_hands = num_hands, max_hands = num_hands).estimate(target_half_width = 0.0)
+            print('%4.0fms vs %-10s mean payoff %.4f +- %.4f over %d hands, %.0f simulations/sec' % (1000 * time_budget, name, result['mean'], result['half_width'], result['hands'], agent.simulations_per_second))
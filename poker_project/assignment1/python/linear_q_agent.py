@@ -0,0 +1,162 @@
+import numpy as np
+from q_learning_agent import QLearningAgent
+from dealer import Dealer
+from round import Round
+from card_range import RANGE_SIZES, get_range_mask
+
+class LinearQAgent(QLearningAgent):
+    ''' Q Learning Agent with a linear approximation of Q values over sparse binary features
+
+    The observation of Env._extract_state() is encoded as one active feature per block (one-hot or binned
+    fields and a few conjunctions of them), so Q(s, a) is the sum of the weights W[a] of the active features.
+    Memory is constant in the number of states. Transitions of a hand are stored and learned in one batched
+    update at the end of the hand.
+    '''
+
+    ACTIONS = Round.FULL_ACTIONS
+    ACTION_IDS = {action: index for index, action in enumerate(Round.FULL_ACTIONS)}
+    RANK_IDS = {rank: index for index, rank in enumerate(Dealer.RANK_LIST)}
+    CHIPS_BINS = [1, 2, 3] # my_chips of 0.5, 1.5, 2.5, 3.5 in the default game, larger bets share the last bin
+    # number of features per block, see get_features()
+    BLOCKS = [
+        ('bias', 1),
+        ('position', 2),
+        ('my_chips', len(CHIPS_BINS) + 1),
+        ('other_chips', 3),
+        ('hand', len(Dealer.RANK_LIST)),
+        ('hand_strength', 4),
+        ('hand x hand_strength', len(Dealer.RANK_LIST) * 4),
+        ('public_pair', 2),
+        ('position x other_chips', 2 * 3),
+        ('hand_strength x my_chips', 4 * (len(CHIPS_BINS) + 1)),
+        ('opponent_range_size', len(Dealer.RANK_LIST) + 1),
+    ]
+    OFFSETS = np.cumsum([0] + [size for _, size in BLOCKS[:-1]])
+    NUM_FEATURES = sum(size for _, size in BLOCKS)
+
+    def __init__(self, np_random, print_enabled, pretrained_model = None, is_learning = True, initial_epsilon = 1.0, initial_alpha = 1.0, epsilon_decay = -1/4, alpha_decay = -1/4):
+        ''' Initialize the agent
+
+        Args:
+            pretrained_model (dict): Dictionary with keys 'W' (np.ndarray of shape (len(ACTIONS), NUM_FEATURES)) and 'episode_num'
+            Other arguments as in QLearningAgent, alpha is divided by the number of active features per update
+        '''
+        super().__init__(np_random, print_enabled, pretrained_model, is_learning, initial_epsilon, initial_alpha, epsilon_decay, alpha_decay)
+        self.transitions = [] # (features, action, reward, next features, next legal actions, done) of the current hand
+
+    def _initialize_model(self, pretrained_model, state_space):
+        if pretrained_model != None:
+            self.model = pretrained_model
+        else:
+            self.model = { 'W': np.zeros((len(self.ACTIONS), self.NUM_FEATURES)), 'episode_num': 0 }
+
+    @staticmethod
+    def get_features(obs):
+        ''' Indices of the active features of an observation, one per block of LinearQAgent.BLOCKS
+
+        Args:
+            obs (dict): Observation with keys 'position', 'my_chips', 'other_chips', 'hand', 'public_cards', 'opponent_range'
+
+        Returns:
+            (np.ndarray): Feature indices
+        '''
+        position = 0 if obs['position'] == 'first' else 1
+        my_chips = int(np.digitize(float(obs['my_chips']), LinearQAgent.CHIPS_BINS))
+        other_chips = int(np.sign(float(obs['other_chips']))) + 1
+        hand = LinearQAgent.RANK_IDS[obs['hand']]
+        public_cards = obs['public_cards']
+        if public_cards == 'none': # pre-flop
+            hand_strength, public_pair = 0, 0
+        else: # number of public cards matching the hand (0: high card, 1: pair, 2: three of a kind)
+            hand_strength, public_pair = 1 + public_cards.count(obs['hand']), int(public_cards[0] == public_cards[1])
+        values = [
+            0,
+            position,
+            my_chips,
+            other_chips,
+            hand,
+            hand_strength,
+            hand * 4 + hand_strength,
+            public_pair,
+            position * 3 + other_chips,
+            hand_strength * (len(LinearQAgent.CHIPS_BINS) + 1) + my_chips,
+            RANGE_SIZES[get_range_mask(obs['opponent_range'])], # 'none' (empty range) has size 0
+        ]
+        return LinearQAgent.OFFSETS + values
+
+    def get_q_values(self, features):
+        ''' Q values of all actions (including illegal ones) for the active features
+        '''
+        return self.model['W'][:, features].sum(axis=1)
+
+    def _greedy_action(self, features, legal_actions):
+        ''' Legal action with the max Q value, in case of ties, pick randomly
+        '''
+        q_values = self.get_q_values(features)[[self.ACTION_IDS[action] for action in legal_actions]]
+        return legal_actions[self.np_random.choice(np.flatnonzero(q_values == q_values.max()))]
+
+    def step(self, state):
+        ''' Choose action for next step of Q Learning Algorithm using an e-greedy approach
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            action (str): the chosen action
+        '''
+        if self.print_enabled: self._print_state(state['raw_obs'], state['action_record'])
+        if self.is_learning and self.np_random.binomial(1, self.epsilon) == 1:
+            return self.np_random.choice(state['raw_legal_actions'])
+        return self._greedy_action(self.get_features(state['obs']), state['raw_legal_actions'])
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Store the latest transition, and learn all transitions of the hand once it is over
+        '''
+        if not self.is_learning or len(states) < 2: # nothing to learn before the first action
+            return
+        features = self.get_features(states[-2]['obs'])
+        action = self.ACTION_IDS[action_history[-1]]
+        if payoff == None: # no reward received yet, considered as 0
+            self.transitions.append((features, action, 0.0, self.get_features(states[-1]['obs']), [self.ACTION_IDS[a] for a in states[-1]['raw_legal_actions']], False))
+        else: # reached terminal state, maximization term for further actions is 0
+            self.transitions.append((features, action, payoff, features, [], True))
+            self.update(self.transitions)
+            self.transitions = []
+            self.model['episode_num'] += 1
+            self._update_epsilon()
+            self._update_alpha()
+
+    def update(self, transitions):
+        ''' Batched semi-gradient Q Learning update, all targets computed from the weights before the batch
+
+        Args:
+            transitions (list): Tuples of (features, action, reward, next features, next legal action ids, done)
+        '''
+        W = self.model['W']
+        features = np.array([transition[0] for transition in transitions])
+        actions = np.array([transition[1] for transition in transitions])
+        rewards = np.array([transition[2] for transition in transitions])
+        next_q_values = W[:, np.array([transition[3] for transition in transitions])].sum(axis=2).T
+        targets = rewards.copy()
+        for index, (_, _, _, _, next_legal, done) in enumerate(transitions):
+            if not done:
+                targets[index] += self.gamma * next_q_values[index, next_legal].max()
+        td_errors = targets - W[actions[:, None], features].sum(axis=1)
+        step_size = self.alpha / features.shape[1]
+        np.add.at(W, (np.repeat(actions, features.shape[1]), features.reshape(-1)), np.repeat(step_size * td_errors, features.shape[1]))
+
+    def get_policy(self, state_space):
+        ''' Greedy policy for the states of a state space, e.g. to compare it with the optimal policy
+
+        Args:
+            state_space (dict): State key to its legal actions
+
+        Returns:
+            (dict): State key to action
+        '''
+        policy = {}
+        for state_key, legal_actions in state_space.items():
+            position, my_chips, other_chips, hand, public_cards, opponent_range = state_key.split('_')
+            obs = { 'position': position, 'my_chips': my_chips, 'other_chips': other_chips, 'hand': hand, 'public_cards': public_cards, 'opponent_range': opponent_range }
+            policy[state_key] = self._greedy_action(self.get_features(obs), list(legal_actions))
+        return policy
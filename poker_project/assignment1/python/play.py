@@ -1,39 +1,23 @@
 ''' A script for a human playing against any 'static' or trained agents
 Simply choose the desired agents in env.set_agents() and run the script!
+Only the chosen agents are built, solved policies are loaded from a binary cache after the first run.
 '''
 
 from env import Env
 from card import Card
-from human_agent import HumanAgent
-from q_learning_agent import QLearningAgent
-from policy_iteration_agent import PolicyIterationAgent
-from random_agent import RandomAgent
-from threshold_agent import ThresholdAgent
-import json
+from agent_registry import AgentRegistry
 
 
-with open('q_threshold_model.json') as json_file: # <---- Can be used to load a pretrained Q Learning Agent (files provided: q_threshold_model.json, q_random_model.json)
-    q_trained_model = json.load(json_file) 
-
-print(len(q_trained_model['Q']))
-
-# Make environment
+# Make environment, agents are only built when chosen (see agent_registry.AGENT_FACTORIES)
 env = Env()
-random_agent = RandomAgent(env.np_random, True)
-threshold_agent = ThresholdAgent(True)
-pi_random_agent = PolicyIterationAgent(env.np_random, True, random_agent)
-pi_threshold_agent = PolicyIterationAgent(env.np_random, False, threshold_agent)
-q_learning_agent = QLearningAgent(env.np_random, False, q_trained_model, is_learning = False)
-human_agent1 = HumanAgent(env.num_actions, q_learning_agent)
-human_agent2 = HumanAgent(env.num_actions, q_learning_agent)
+agents = AgentRegistry(env)
 env.set_agents([
-    human_agent1,
-    # human_agent2,
-    q_learning_agent
-    # pi_threshold_agent,
-    # threshold_agent,
-    # pi_random_agent,
-    # random_agent,
+    agents.get('human'),
+    agents.get('q_learning')
+    # agents.get('pi_threshold'),
+    # agents.get('threshold'),
+    # agents.get('pi_random'),
+    # agents.get('random'),
 ])
 
 print(">> Simplified Hold'em model")
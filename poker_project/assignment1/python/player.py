@@ -1,5 +1,7 @@
 ''' Player class adapted from rlcard
 '''
+from card_range import FULL_RANGE
+
 class Player:
 
     def __init__(self, player_id):
@@ -13,7 +15,7 @@ class Player:
         self.hand = []
         self.status = 'alive'
         self.position = None
-        self.opponent_range = 'AJKQT'
+        self.opponent_range = FULL_RANGE # mask of ranks this player infers for the opponent's hand, see card_range
 
         # The chips that this player has put in until now
         self.in_chips = 0
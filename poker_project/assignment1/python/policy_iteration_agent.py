@@ -1,13 +1,37 @@
 import numpy as np
 import json
+from card_range import FULL_RANGE
 
 class PolicyIterationAgent:
     ''' An agent following the optimal policy returned by Policy Iteration algorithm
     '''
 
-    def __init__(self, np_random, print_enabled, opponent):
+    def __init__(self, np_random, print_enabled, opponent, probabilities = None, policy = None):
+        ''' Initialize the agent and solve the MDP against opponent
+
+        Args:
+            probabilities (list): Preloaded win, loss, flop and range probabilities (see Game.get_transition_probabilities_for_cards()),
+                loaded from their json files if None
+            policy (dict): Previously solved optimal policy (e.g. from agent_registry's cache), skips loading the probabilities
+                and solving the MDP; such an agent can only play (state_space and V_opt are None)
+        '''
         self.np_random = np_random
-         # preloading probabilities for using them in state transitions
+        self.print_enabled = print_enabled # to prevent printing of cli for no-human games
+        self.use_raw = True
+        if policy is not None:
+            self.state_space, self.V_opt, self.P_opt = None, None, policy
+            return
+        if probabilities is None:
+            probabilities = self.load_probabilities()
+        win_probabilities, loss_probabilities, flop_probabilities, range_probabilities = probabilities
+        self.state_space = opponent.calculate_state_space(win_probabilities, loss_probabilities, flop_probabilities, range_probabilities)
+        self.V_opt,self.P_opt = self.policy_iteration(self.state_space, gamma = 1.0)
+
+    @staticmethod
+    def load_probabilities():
+        ''' Load the win, loss, flop and range probabilities from their json files
+        '''
+        # preloading probabilities for using them in state transitions
         with open('win_probabilities.json') as json_file:
             win_probabilities = json.load(json_file)
 
@@ -19,10 +43,7 @@ class PolicyIterationAgent:
 
         with open('range_probabilities.json') as json_file:
             range_probabilities = json.load(json_file)
-        self.state_space = opponent.calculate_state_space(win_probabilities, loss_probabilities, flop_probabilities, range_probabilities)
-        self.print_enabled = print_enabled # to prevent printing of cli for no-human games
-        self.use_raw = True
-        self.V_opt,self.P_opt = self.policy_iteration(self.state_space, gamma = 1.0)
+        return [ win_probabilities, loss_probabilities, flop_probabilities, range_probabilities ]
 
     def step(self, state):
         ''' Given current state, choose the optimal action based on Policy Iteration algorithm
@@ -64,7 +85,7 @@ class PolicyIterationAgent:
         print('')
 
     def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
-        return 'AJKQT' # range cannot be inferred by agent's actions
+        return FULL_RANGE # range cannot be inferred by agent's actions
 
     ############################################################################
     # Policy Iteration Algorithm
@@ -92,7 +113,7 @@ class PolicyIterationAgent:
             # Vplot[:,t] = prev_V  # accounting for GUI  
         return V
 
-    def policy_improvement(self, V, P, gamma=1.0):  # takes a value function (as the cost to go V(s')), a model, and a discount parameter
+    def get_q_values(self, V, P, gamma=1.0):  # one-step lookahead of a value function (as the cost to go V(s')) with the model
         Q = {key: dict.fromkeys(P[key],0) for key in P}
         for s in P.keys():        # for every state in the environment/model
             for a in P[s].keys():  # and for every action in that state
@@ -101,6 +122,18 @@ class PolicyIterationAgent:
                         Q[s][a] += prob * reward
                     else:
                         Q[s][a] += prob * (reward + gamma * V[next_state])
+        return Q
+
+    def get_q_model(self, gamma = 1.0):
+        ''' Q values of the optimal value function and the optimal policy as a model of QLearningAgent
+
+        Returns:
+            (dict): Dictionary with keys 'Q', 'policy' and 'episode_num', see QLearningAgent.warm_start_model()
+        '''
+        return { 'Q': self.get_q_values(self.V_opt, self.state_space, gamma), 'episode_num': 0, 'policy': dict(self.P_opt) }
+
+    def policy_improvement(self, V, P, gamma=1.0):  # takes a value function (as the cost to go V(s')), a model, and a discount parameter
+        Q = self.get_q_values(V, P, gamma)
         new_pi = {s:max(Q[s], key=lambda k: Q[s][k]) for s in Q.keys()} # this basically creates the new (improved) policy by choosing at each state s the action a that has the highest Q value (based on the Q array we just calculated)
         # lambda is a "fancy" way of creating a function without formally defining it (e.g. simply to return, as here...or to use internally in another function)
         # you can implement this in a much simpler way, by using just a few more lines of code -- if this command is not clear, I suggest to try coding this yourself
@@ -0,0 +1,230 @@
+''' Read-only policy and model store, memory-mapped and shared by all processes
+
+Policies (PolicyIterationAgent.P_opt, QLearningAgent.model['policy']), state values (V_opt) and Q values are
+written as dense arrays over an arithmetic encoding of the observation into a single file (see
+checkpoint.write_arrays()). Loading the store only maps the file read-only: there is nothing to deserialize, the
+pages are shared by every process that maps the same file, and a lookup is an index computation plus an array read.
+
+The state id of an observation is its mixed radix number over
+
+    | position | my_chips | other_chips | hand | public_cards | opponent_range |
+    |    2     |    5     |      3      |  5   |      16      |  32 (mask)     |
+
+76800 ids in total, most of them unreachable.
+'''
+
+import numpy as np
+from itertools import combinations_with_replacement
+from dealer import Dealer
+from round import Round
+from checkpoint import write_arrays, read_arrays
+from card_range import RANGE_MASKS, FULL_RANGE
+
+POSITIONS = {'first': 0, 'second': 1}
+MY_CHIPS = {0.5: 0, 1.5: 1, 2.5: 2, 3.5: 3, 4.5: 4}
+OTHER_CHIPS = {-1: 0, 0: 1, 1: 2}
+HANDS = {rank: index for index, rank in enumerate(Dealer.RANK_LIST)}
+PUBLIC_CARDS = {public_cards: index for index, public_cards in enumerate(['none'] + [''.join(sorted(ranks)) for ranks in combinations_with_replacement(Dealer.RANK_LIST, 2)])}
+NUM_RANGES = FULL_RANGE + 1
+NUM_STATES = len(POSITIONS) * len(MY_CHIPS) * len(OTHER_CHIPS) * len(HANDS) * len(PUBLIC_CARDS) * NUM_RANGES
+ACTIONS = Round.FULL_ACTIONS
+NO_ACTION = -1
+
+
+def encode(position, my_chips, other_chips, hand, public_cards, opponent_range):
+    ''' State id of the parts of an observation (opponent_range as a string, as in observations and state keys)
+    '''
+    state_id = POSITIONS[position]
+    state_id = state_id * len(MY_CHIPS) + MY_CHIPS[my_chips]
+    state_id = state_id * len(OTHER_CHIPS) + OTHER_CHIPS[other_chips]
+    state_id = state_id * len(HANDS) + HANDS[hand]
+    state_id = state_id * len(PUBLIC_CARDS) + PUBLIC_CARDS[public_cards]
+    return state_id * NUM_RANGES + RANGE_MASKS[opponent_range]
+
+def encode_observation(obs):
+    ''' State id of an extracted observation (state['obs'])
+    '''
+    return encode(obs['position'], obs['my_chips'], obs['other_chips'], obs['hand'], obs['public_cards'], obs['opponent_range'])
+
+def encode_state_key(state_key):
+    ''' State id of a state key (see utils.get_state_key())
+    '''
+    position, my_chips, other_chips, hand, public_cards, opponent_range = state_key.split('_')
+    return encode(position, float(my_chips), int(other_chips), hand, public_cards, opponent_range)
+
+def write_store(path, policy = None, values = None, Q = None, metadata = None):
+    ''' Write dictionaries keyed by state key as dense arrays
+
+    Args:
+        path (str): Store file
+        policy (dict): State key to action (NO_ACTION for states not in the policy)
+        values (dict): State key to value, e.g. PolicyIterationAgent.V_opt (nan for missing states)
+        Q (dict): State key to a dictionary of action to Q value, e.g. QLearningAgent.model['Q'] (-inf for missing
+            states and illegal actions, as in ArrayQModel)
+        metadata (dict): Extra json-serializable information stored in the header
+    '''
+    arrays = {}
+    if policy is not None:
+        arrays['policy'] = np.full(NUM_STATES, NO_ACTION, dtype=np.int8)
+        for state_key, action in policy.items():
+            arrays['policy'][encode_state_key(state_key)] = ACTIONS.index(action)
+    if values is not None:
+        arrays['values'] = np.full(NUM_STATES, np.nan)
+        for state_key, value in values.items():
+            arrays['values'][encode_state_key(state_key)] = value
+    if Q is not None:
+        arrays['Q'] = np.full((NUM_STATES, len(ACTIONS)), -np.inf)
+        for state_key, q_values in Q.items():
+            state_id = encode_state_key(state_key)
+            for action, value in q_values.items():
+                arrays['Q'][state_id, ACTIONS.index(action)] = value
+    write_arrays(path, arrays, [], metadata)
+
+
+class PolicyStore:
+    ''' Read-only view of a store written by write_store()
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        arrays, _, self.metadata = read_arrays(path, read_keys = False)
+        self.policy = arrays.get('policy')
+        self.values = arrays.get('values')
+        self.Q = arrays.get('Q')
+
+    def get_action(self, obs):
+        ''' Action of the policy in the state of an observation
+
+        Raises:
+            KeyError: If the state is not in the policy
+        '''
+        action_id = self.policy[encode_observation(obs)]
+        if action_id == NO_ACTION:
+            raise KeyError('State {} is not in the policy of {}'.format(obs, self.path))
+        return ACTIONS[action_id]
+
+    def get_action_ids(self, state_ids, legal_masks = None):
+        ''' Actions of a batch of states with one vectorized lookup
+
+        Args:
+            state_ids (np.ndarray): State ids (see encode_observation())
+            legal_masks (np.ndarray): (n, 4) booleans of the legal actions, for a masked argmax when the store holds Q
+                values (the stored policy is used otherwise)
+
+        Returns:
+            (np.ndarray): Action ids (index in Round.FULL_ACTIONS), NO_ACTION for states not in the policy
+        '''
+        if self.Q is None or (legal_masks is None and self.policy is not None):
+            return self.policy[state_ids]
+        Q = self.Q[state_ids] if legal_masks is None else np.where(legal_masks, self.Q[state_ids], -np.inf)
+        return np.where(np.isneginf(Q).all(axis=1), NO_ACTION, Q.argmax(axis=1))
+
+
+class StoreAgent:
+    ''' Agent playing the policy of a PolicyStore, e.g. a stored PolicyIterationAgent or QLearningAgent (not learning)
+    '''
+
+    def __init__(self, np_random, print_enabled, store):
+        ''' Initialize the agent
+
+        Args:
+            store (PolicyStore or str): Store or path of the store file
+        '''
+        self.np_random = np_random
+        self.print_enabled = print_enabled
+        self.use_raw = True
+        self.store = store if isinstance(store, PolicyStore) else PolicyStore(store)
+
+    def step(self, state):
+        ''' Action of the stored policy
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            action (str): The stored action
+        '''
+        if self.print_enabled: self._print_state(state['raw_obs'], state['action_record'])
+        return self.store.get_action(state['obs'])
+
+    def eval_step(self, states, action_history, payoff = None):
+        ''' Method only needed for online learning
+        '''
+        pass
+
+    def _print_state(self, state, action_record):
+        ''' Print out the state
+
+        Args:
+            state (dict): A dictionary of the raw state
+            action_record (list): A list of the historical actions
+        '''
+        if len(action_record) > 0:
+            print('>> Player', action_record[-1][0], 'chooses', action_record[-1][1])
+
+        print('===============     Chips      ===============')
+        for i in range(len(state['all_chips'])):
+            if i == state['current_player']:
+                print('Stored Agent (Player {}): '.format(i), state['my_chips'])
+            else:
+                print('Player {}: '.format(i) , state['all_chips'][i])
+        print('\n=========== Actions Stored Agent Can Choose ===========')
+        print(', '.join([str(index) + ': ' + action for index, action in enumerate(state['legal_actions'])]))
+        print('')
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        return FULL_RANGE # range cannot be inferred by agent's actions
+
+
+def _private_memory():
+    ''' Memory only used by this process in bytes (Private_Clean + Private_Dirty, Linux only)
+    '''
+    total = 0
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            if line.startswith('Private_'):
+                total += int(line.split()[1]) * 1024
+    return total
+
+def _worker(mode, path, num_hands, results):
+    ''' Load the policy of the random agent's optimal policy json or of its store and play num_hands against RandomAgent
+    '''
+    import json
+    import time
+    from env import Env
+    from random_agent import RandomAgent
+    from policy_iteration_agent import PolicyIterationAgent
+    env = Env({ 'allow_step_back': False, 'seed': 0 })
+    memory_before = _private_memory()
+    start_time = time.perf_counter()
+    if mode == 'json':
+        with open(path) as json_file:
+            agent = PolicyIterationAgent(env.np_random, False, None, policy = json.load(json_file))
+    else:
+        agent = StoreAgent(env.np_random, False, path)
+    load_seconds = time.perf_counter() - start_time
+    env.set_agents([agent, RandomAgent(env.np_random, False)])
+    payoff = sum(env.run()[1][0] for _ in range(num_hands))
+    results.put((mode, load_seconds, _private_memory() - memory_before, payoff / num_hands))
+
+
+if __name__ == '__main__':
+    # Load time and private memory per worker process for a json policy and for the mapped store
+    # WARNING: The optimal policy json files created by the notebook are loaded
+    import json
+    import multiprocessing
+
+    with open('random_agent_optimal_policy.json') as json_file:
+        write_store('random_agent_policy.store', json.load(json_file))
+
+    num_workers = 4
+    context = multiprocessing.get_context('spawn') # fresh interpreters, as independent worker processes
+    for mode, path in [('json', 'random_agent_optimal_policy.json'), ('store', 'random_agent_policy.store')]:
+        results = context.Queue()
+        workers = [context.Process(target=_worker, args=(mode, path, 10**4, results)) for _ in range(num_workers)]
+        for worker in workers:
+            worker.start()
+        rows = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        print('%-5s load %.1fms, private memory %.0fkB per worker, mean payoff %.4f' % (mode, 1000 * np.mean([row[1] for row in rows]), np.mean([row[2] for row in rows]) / 1024, np.mean([row[3] for row in rows])))
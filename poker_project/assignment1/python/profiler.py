@@ -0,0 +1,135 @@
+''' Low-overhead profiling of Env.run and progress reporting for long runs
+'''
+
+import sys
+import time
+
+
+class Profiler:
+    ''' Per-phase cumulative timers, call counters and allocation counts of Env.run
+
+    Attach with Env.set_profiler(profiler); the game loop of Env.run times its phases with the attached profiler,
+    and with NULL_PROFILER (whose timers do nothing) when none is attached. Phases are 'reset', 'eval_step',
+    'agent_step', 'infer_range', 'game_step', 'extract_state', 'get_payoffs' and 'hand_history' (see
+    Env.set_hand_history()). Allocations are counted as the net change of allocated memory blocks
+    (sys.getallocatedblocks()) during a phase.
+    '''
+
+    PHASES = ['reset', 'eval_step', 'agent_step', 'infer_range', 'game_step', 'extract_state', 'get_payoffs', 'hand_history']
+
+    def __init__(self, report_every = None, track_allocations = False, output = None):
+        ''' Initialize the profiler
+
+        Args:
+            report_every (int): Print a summary every report_every hands, None to only report on demand
+            track_allocations (boolean): Count allocated blocks per phase (adds a little overhead)
+            output (file): Where summaries are printed, sys.stdout by default
+        '''
+        self.report_every = report_every
+        self.track_allocations = track_allocations
+        self.output = output or sys.stdout
+        self.reset()
+
+    def reset(self):
+        ''' Clear all counters
+        '''
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+        self.allocations = dict.fromkeys(self.PHASES, 0)
+        self.num_hands = 0
+        self.start_time = time.perf_counter()
+        self.last_report_time = self.start_time
+        self.last_report_hands = 0
+
+    def start(self):
+        ''' Start a phase
+
+        Returns:
+            (tuple): Token to be passed to stop()
+        '''
+        return time.perf_counter(), sys.getallocatedblocks() if self.track_allocations else 0
+
+    def stop(self, phase, token):
+        ''' End a phase started by start()
+        '''
+        self.times[phase] += time.perf_counter() - token[0]
+        self.calls[phase] += 1
+        if self.track_allocations:
+            self.allocations[phase] += sys.getallocatedblocks() - token[1]
+
+    def hand_finished(self):
+        ''' Count a finished hand, and print the periodic summary if due
+        '''
+        self.num_hands += 1
+        if self.report_every and self.num_hands % self.report_every == 0:
+            self.report()
+
+    def summary(self):
+        ''' Statistics so far
+
+        Returns:
+            (dict): Keys 'hands', 'seconds', 'hands_per_second' and 'phases' (phase to seconds, calls, share of total time and allocated blocks)
+        '''
+        seconds = time.perf_counter() - self.start_time
+        phases = {}
+        for phase in self.PHASES:
+            phases[phase] = { 'seconds': self.times[phase], 'calls': self.calls[phase], 'share': self.times[phase] / seconds if seconds > 0 else 0.0, 'allocated_blocks': self.allocations[phase] }
+        return { 'hands': self.num_hands, 'seconds': seconds, 'hands_per_second': self.num_hands / seconds if seconds > 0 else 0.0, 'phases': phases }
+
+    def report(self):
+        ''' Print the summary, with the hands/sec since the previous report
+        '''
+        now = time.perf_counter()
+        recent_rate = (self.num_hands - self.last_report_hands) / (now - self.last_report_time) if now > self.last_report_time else 0.0
+        self.last_report_time, self.last_report_hands = now, self.num_hands
+        summary = self.summary()
+        print('hands: %d, hands/sec: %.0f (recent %.0f)' % (summary['hands'], summary['hands_per_second'], recent_rate), file=self.output)
+        for phase, statistics in summary['phases'].items():
+            line = '  %-14s %9.3fs %5.1f%% %10d calls %8.2fus/call' % (phase, statistics['seconds'], 100 * statistics['share'], statistics['calls'], 1e6 * statistics['seconds'] / max(statistics['calls'], 1))
+            if self.track_allocations:
+                line += ' %10d blocks' % statistics['allocated_blocks']
+            print(line, file=self.output)
+
+
+class NullProfiler:
+    ''' Profiler interface without any timing, used by Env.run when no profiler is attached
+    '''
+
+    def start(self):
+        return None
+
+    def stop(self, phase, token):
+        pass
+
+    def hand_finished(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+
+class ProgressReporter:
+    ''' Progress in percent, printed on a single line only when it changes by at least step percent
+
+    Replaces printing the progress on every hand, which costs measurable time in long runs.
+    '''
+
+    def __init__(self, total, step = 0.1, output = None):
+        ''' Initialize the reporter
+
+        Args:
+            total (int): Total number of iterations
+            step (float): Minimum change in percent between two prints
+            output (file): Where progress is printed, sys.stdout by default
+        '''
+        self.total = total
+        self.step = step
+        self.output = output or sys.stdout
+        self.next_update = 0 # next iteration to print
+
+    def update(self, i):
+        ''' Report iteration i (0-based) out of total
+        '''
+        if i >= self.next_update:
+            percent = round(i/self.total*100, 1)
+            print(percent, "\r", end="", file=self.output)
+            self.next_update = max(i + 1, int((percent + self.step) * self.total / 100))
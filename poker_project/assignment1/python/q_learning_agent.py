@@ -1,10 +1,16 @@
 from utils import try_key_initialization, get_random_max_key
+from card_range import FULL_RANGE
 
 class QLearningAgent:
     ''' An agent following the optimal policy returned by Q-Learning algorithm
     '''
 
-    def __init__(self, np_random, print_enabled, pretrained_model = None, is_learning = True, initial_epsilon = 1.0, initial_alpha = 1.0, epsilon_decay = -1/4, alpha_decay = -1/4, state_space = None):
+    def __init__(self, np_random, print_enabled, pretrained_model = None, is_learning = True, initial_epsilon = 1.0, initial_alpha = 1.0, epsilon_decay = -1/4, alpha_decay = -1/4, state_space = None, trace_lambda = 0.0):
+        ''' Initialize the agent
+
+        Args:
+            trace_lambda (float): Decay of the eligibility traces of Watkins' Q(lambda), 0 for one-step Q Learning
+        '''
         self.explore_state_space = False # True allows dynamic exploration of state space
         self.np_random = np_random
         self.print_enabled = print_enabled
@@ -18,6 +24,8 @@ class QLearningAgent:
         self.initial_alpha = initial_alpha
         self.alpha_decay = alpha_decay
         self._update_alpha()
+        self.trace_lambda = trace_lambda
+        self.traces = {} # eligibility traces of the current episode, only (state, action) pairs visited since the last exploratory action
 
     def _initialize_model(self, pretrained_model, state_space):
         if pretrained_model != None:
@@ -30,7 +38,43 @@ class QLearningAgent:
         else:
             self.model = { 'Q': {}, 'episode_num': 0, 'policy': {}}
             self.explore_state_space = True
-    
+
+    @staticmethod
+    def warm_start_model(state_space, solved_model, np_random, episode_num = 0):
+        ''' Initial model seeded from a solved MDP, e.g. PolicyIterationAgent.get_q_model()
+
+        The solution may belong to a related opponent: states missing from it are seeded with the mean Q values
+        of its states that differ only in the opponent range, and with 0 otherwise.
+
+        Args:
+            state_space (dict): State key to its legal actions
+            solved_model (dict): Dictionary with keys 'Q' and 'policy'
+            np_random (RandomState): Used to break ties of the policy
+            episode_num (int): Initial episode number, a later start of the epsilon/alpha schedules keeps more of the solution
+
+        Returns:
+            (dict): Dictionary with keys 'Q', 'policy' and 'episode_num', to be passed as pretrained_model
+        '''
+        related_states = {} # state key without opponent range to Q values of the solved states
+        for state_key, q_values in solved_model['Q'].items():
+            related_states.setdefault(state_key.rsplit('_', 1)[0], []).append(q_values)
+
+        model = { 'Q': {}, 'episode_num': episode_num, 'policy': {}}
+        for state_key in state_space:
+            if state_key in solved_model['Q']:
+                sources = [solved_model['Q'][state_key]]
+            else:
+                sources = related_states.get(state_key.rsplit('_', 1)[0], [])
+            Q = model['Q'][state_key] = {}
+            for action in state_space[state_key]:
+                values = [q_values[action] for q_values in sources if action in q_values]
+                Q[action] = sum(values)/len(values) if values else 0.0
+            if state_key in solved_model['policy'] and solved_model['policy'][state_key] in Q:
+                model['policy'][state_key] = solved_model['policy'][state_key]
+            else:
+                model['policy'][state_key] = get_random_max_key(Q, np_random)
+        return model
+
     def _update_epsilon(self):
         ''' Exponential decay over time
         '''
@@ -54,6 +98,8 @@ class QLearningAgent:
         Q = self.model['Q']
         ## Choose action from state using policy derived from Q and e-greedy (the latter only used for training)
         action = self.np_random.choice(state['raw_legal_actions']) if self.is_learning and self.np_random.binomial(1, self.epsilon) == 1 else self.model['policy'][state_key]
+        if self.trace_lambda > 0 and action != self.model['policy'][state_key]:
+            self.traces = {} # Watkins' Q(lambda): an exploratory action cuts the traces of earlier actions
         return action
 
     def eval_step(self, states, action_history, payoff = None):
@@ -76,7 +122,9 @@ class QLearningAgent:
 
         ## Update Q if learning is enabled and action was performed
         if self.is_learning:
-            if old_state != None: # new state is not an initial state
+            if old_state != None and self.trace_lambda > 0: # new state is not an initial state
+                self._update_with_traces(Q, old_state_key, new_state_key, action_history[-1], payoff)
+            elif old_state != None: # new state is not an initial state
                 latest_action = action_history[-1]
                 if payoff == None: # no reward received yet, considered as 0 and is thus omitted
                     Q[old_state_key][latest_action] = Q[old_state_key][latest_action] + self.alpha * (self.gamma*max(Q[new_state_key].values()) - Q[old_state_key][latest_action])
@@ -87,6 +135,28 @@ class QLearningAgent:
                     self._update_alpha()
                 self.model['policy'][old_state_key] = get_random_max_key(Q[old_state_key], self.np_random) # update policy for previous state based on new Q values, in case of ties, pick randomly
 
+    def _update_with_traces(self, Q, old_state_key, new_state_key, latest_action, payoff):
+        ''' Watkins' Q(lambda) update: the TD error of the latest transition updates all (state, action) pairs
+        of the episode in proportion to their eligibility trace
+        '''
+        if payoff == None: # no reward received yet, considered as 0 and is thus omitted
+            td_error = self.gamma*max(Q[new_state_key].values()) - Q[old_state_key][latest_action]
+        else: # reached terminal state, maximization term for further actions is 0 and is thus omitted
+            td_error = payoff - Q[old_state_key][latest_action]
+        self.traces[(old_state_key, latest_action)] = 1.0 # replacing traces
+        for (state_key, action), trace in self.traces.items():
+            Q[state_key][action] = Q[state_key][action] + self.alpha * td_error * trace
+            self.model['policy'][state_key] = get_random_max_key(Q[state_key], self.np_random)
+
+        if payoff == None:
+            for key in self.traces:
+                self.traces[key] *= self.gamma * self.trace_lambda
+        else:
+            self.traces = {}
+            self.model['episode_num'] += 1
+            self._update_epsilon()
+            self._update_alpha()
+
     def _print_state(self, state, action_record):
         ''' Print out the state
 
@@ -108,4 +178,4 @@ class QLearningAgent:
         print('')
 
     def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
-        return 'AJKQT' # range cannot be inferred by agent's actions
\ No newline at end of file
+        return FULL_RANGE # range cannot be inferred by agent's actions
\ No newline at end of file
@@ -1,5 +1,6 @@
 from dealer import Dealer
 from utils import try_key_initialization
+from card_range import FULL_RANGE
 class RandomAgent:
     ''' A random agent for benchmarking purposes
     '''
@@ -28,6 +29,17 @@ class RandomAgent:
         action = self.np_random.randint(0, len(state['raw_legal_actions']))
         return state['raw_legal_actions'][action]
 
+    def action_probabilities(self, state):
+        ''' Probabilities of the actions chosen by step(), used by exact evaluation
+
+        Args:
+            state (dict): A dictionary that represents the current state
+
+        Returns:
+            (dict): Legal action to its probability (uniform)
+        '''
+        return {action: 1.0/len(state['raw_legal_actions']) for action in state['raw_legal_actions']}
+
     def eval_step(self, states, action_history, payoff = None):
         ''' Method only needed for online learning
         '''
@@ -54,7 +66,7 @@ class RandomAgent:
         print('')
     
     def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
-        return 'AJKQT' # range cannot be inferred by agent's actions
+        return FULL_RANGE # range cannot be inferred by agent's actions
 
 
     def calculate_state_space(self, win_probabilities, loss_probabilities, flop_probabilities, range_probabilities):
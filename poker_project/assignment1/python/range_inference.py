@@ -0,0 +1,47 @@
+from itertools import combinations_with_replacement
+from dealer import Dealer
+from round import Round
+from card_range import FULL_RANGE
+
+
+class RangeInferenceTable:
+    ''' infer_card_range_from_action() of an agent compiled into a lookup table
+
+    The inputs of range inference come from a small finite domain (action, game round, current range, other chips,
+    public cards, position), so the function is evaluated once for every combination, with every range mask
+    (see card_range) as current range. The table is a dictionary keyed by the tuple of inputs, a single hash lookup
+    being the cheapest lookup in Python (cheaper than mapping every input to an integer index); inputs outside the
+    domain fall back to the function itself. The table holds the results of the function when it was built.
+    '''
+
+    ACTIONS = Round.FULL_ACTIONS
+    OTHER_CHIPS = [-1, 0, 1]
+    PUBLIC_CARDS = [''.join(sorted(ranks)) for ranks in combinations_with_replacement(Dealer.RANK_LIST, 2)] # round 2 only, 'none' in round 1
+    POSITIONS = ['first', 'second']
+
+    def __init__(self, function):
+        ''' Evaluate function over the whole domain
+
+        Args:
+            function (function): Pure function with the signature of infer_card_range_from_action(), defined over the
+                whole domain (an error it raises is a bug, and is not hidden)
+        '''
+        self.function = function
+        self.table = {}
+        for current_range in range(FULL_RANGE + 1):
+            self._evaluate_range(current_range)
+
+    def _evaluate_range(self, current_range):
+        ''' Add the results for current_range to the table
+        '''
+        for action in self.ACTIONS:
+            for other_chips in self.OTHER_CHIPS:
+                for position in self.POSITIONS:
+                    for game_round, public_cards in [(1, 'none')] + [(2, public_cards) for public_cards in self.PUBLIC_CARDS]:
+                        self.table[(action, game_round, current_range, other_chips, public_cards, position)] = self.function(action, game_round, current_range, other_chips, public_cards, position)
+
+    def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
+        ''' Same result as the compiled function, by table lookup
+        '''
+        new_range = self.table.get((action, game_round, current_range, other_chips, public_cards, position))
+        return new_range if new_range is not None else self.function(action, game_round, current_range, other_chips, public_cards, position)
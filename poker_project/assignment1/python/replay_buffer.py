@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class ReplayBuffer:
+    ''' Preallocated ring buffer of transitions (state id, action, reward, next state id, done)
+
+    Once full, the oldest transitions are overwritten.
+    '''
+
+    def __init__(self, capacity, np_random):
+        ''' Initialize the buffer
+
+        Args:
+            capacity (int): Maximum number of stored transitions
+            np_random (RandomState): Used for sampling
+        '''
+        self.capacity = capacity
+        self.np_random = np_random
+        self.state_ids = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity)
+        self.next_state_ids = np.zeros(capacity, dtype=np.int32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.position = 0
+
+    def add(self, state_id, action, reward, next_state_id, done):
+        ''' Store one transition
+
+        Args:
+            state_id (int): State id before the action
+            action (int): Index of the action (see ArrayQModel.ACTIONS)
+            reward (float): Reward of the transition (payoff for terminal transitions)
+            next_state_id (int): State id after the action, 0 for terminal transitions
+            done (boolean): True if the transition ends the episode
+        '''
+        self.state_ids[self.position] = state_id
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.next_state_ids[self.position] = next_state_id
+        self.dones[self.position] = done
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        ''' Sample a minibatch of stored transitions uniformly, with replacement
+
+        Returns:
+            (tuple): Arrays of state ids, actions, rewards, next state ids and dones
+        '''
+        indices = self.np_random.randint(0, self.size, size=batch_size)
+        return self.state_ids[indices], self.actions[indices], self.rewards[indices], self.next_state_ids[indices], self.dones[indices]
+
+    def __len__(self):
+        return self.size
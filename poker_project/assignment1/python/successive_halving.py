@@ -0,0 +1,161 @@
+import math
+import numpy as np
+from env import Env
+from q_learning_agent import QLearningAgent
+from vectorized_q_learning_trainer import VectorizedQLearningTrainer
+from sweep import Sweep, OPPONENT_FACTORIES, run_with_shared_state_space, get_shared_state_space
+import seeding
+
+
+class SuccessiveHalving:
+    ''' Successive halving budget allocation for QLearningAgent hyperparameter search
+
+    All configs are trained for a small number of hands and their greedy policies are evaluated.
+    Only the best 1/eta of them survive to the next rung, where their training continues from the saved
+    Q values (and episode number, so that the alpha/epsilon schedules continue as well) up to eta times
+    the previous budget. Training and evaluation of each rung run on a process pool.
+    '''
+
+    def __init__(self, configs, min_hands = 10**5, eta = 3, num_rungs = None, num_eval_hands = 10**5, opponent = 'random', state_space_file = 'random_agent_state_space.json', num_envs = 64, num_processes = None, seed = 0):
+        ''' Initialize the search
+
+        Args:
+            configs (list): List of QLearningAgent configs (see Sweep)
+            min_hands (int): Training budget (total hands) of the first rung
+            eta (int): Budget multiplier per rung, 1/eta of the configs survive each rung
+            num_rungs (int): Number of rungs, by default as many as needed to end up with one config
+            num_eval_hands (int): Number of hands used to evaluate each greedy policy
+            opponent (str): Key of OPPONENT_FACTORIES
+            state_space_file (str): State space used to initialize the Q tables
+            num_envs (int): Number of environments played in lockstep by VectorizedQLearningTrainer
+            num_processes (int): Size of the process pool, defaults to the number of CPUs
+            seed (int): Base seed of training and evaluation
+        '''
+        self.configs = Sweep(configs, [seed]).configs # validated and named configs
+        self.min_hands = min_hands
+        self.eta = eta
+        self.num_rungs = num_rungs if num_rungs is not None else max(1, math.ceil(math.log(len(self.configs), eta)) + 1)
+        self.num_eval_hands = num_eval_hands
+        self.opponent = opponent
+        self.state_space_file = state_space_file
+        self.num_envs = num_envs
+        self.num_processes = num_processes
+        self.seed = seed
+
+    def run(self):
+        ''' Run all rungs
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (list): One dictionary per (rung, config) with the config, its total training hands and
+                    its evaluation mean/std, in order of rungs
+                (dict): The best config of the final rung, with its trained model under key 'model'
+        '''
+        models = [None] * len(self.configs)
+        trained_hands = [0] * len(self.configs)
+        survivors = list(range(len(self.configs)))
+        history = []
+        total_hands = 0
+
+        for rung in range(self.num_rungs):
+            budget = self.min_hands * self.eta**rung
+            tasks = [(config_index, models[config_index], budget - trained_hands[config_index], rung) for config_index in survivors]
+            results = run_with_shared_state_space(self._train_and_evaluate, tasks, self.state_space_file, self.num_processes)
+
+            scores = {}
+            for config_index, model, eval_mean, eval_std in results:
+                total_hands += budget - trained_hands[config_index] + self.num_eval_hands
+                models[config_index] = model
+                trained_hands[config_index] = budget
+                scores[config_index] = eval_mean
+                row = dict(self.configs[config_index])
+                row.update({ 'rung': rung, 'train_hands': budget, 'eval_mean': eval_mean, 'eval_std': eval_std, 'total_hands': total_hands })
+                history.append(row)
+
+            survivors = sorted(survivors, key = lambda config_index: scores[config_index], reverse = True)
+            if rung < self.num_rungs - 1:
+                survivors = survivors[:max(1, len(survivors) // self.eta)]
+            for config_index in range(len(models)): # free models of discarded configs
+                if config_index not in survivors:
+                    models[config_index] = None
+
+        best = dict(self.configs[survivors[0]])
+        best['model'] = models[survivors[0]]
+        return history, best
+
+    def _train_and_evaluate(self, config_index, model, num_hands, rung):
+        ''' Continue training of one config from its saved model and evaluate its greedy policy
+
+        Returns:
+            (tuple): config_index, trained model, mean and standard deviation of the evaluation payoffs
+        '''
+        config = self.configs[config_index]
+        hyperparameters = {key: config[key] for key in Sweep.HYPERPARAMETERS if key in config}
+        task_seed = self.seed + 1000 * rung + config_index
+        np_random, _ = seeding.np_random(task_seed)
+        if model is None:
+            q_learning_agent = QLearningAgent(np_random, False, is_learning = True, state_space = get_shared_state_space(), **hyperparameters)
+        else:
+            q_learning_agent = QLearningAgent(np_random, False, pretrained_model = model, is_learning = True, **hyperparameters)
+        opponent_factory = OPPONENT_FACTORIES[self.opponent]
+
+        if num_hands > 0:
+            trainer = VectorizedQLearningTrainer(q_learning_agent, opponent_factory, num_envs = self.num_envs, seed = task_seed * self.num_envs)
+            trainer.train(num_hands)
+
+        # same evaluation seed for all configs of a rung, so that they are compared on the same deals
+        q_learning_agent.is_learning = False
+        env = Env({ 'allow_step_back': False, 'seed': self.seed + rung })
+        env.set_agents([q_learning_agent, opponent_factory(env.np_random)])
+        eval_payoffs = np.array([env.run()[1][0] for _ in range(self.num_eval_hands)])
+
+        return config_index, q_learning_agent.model, eval_payoffs.mean(), eval_payoffs.std()
+
+
+class Hyperband:
+    ''' Hyperband: several successive halving brackets that trade the number of sampled configs
+    against the minimum budget per config
+    '''
+
+    def __init__(self, sample_configs, max_hands = 3*10**6, min_hands = 10**5, eta = 3, **successive_halving_kwargs):
+        ''' Initialize the search
+
+        Args:
+            sample_configs (function): Called with (number of configs, np_random), returns a list of QLearningAgent configs
+            max_hands (int): Maximum training budget of a single config
+            min_hands (int): Minimum training budget of a single config
+            eta (int): Budget multiplier per rung
+            successive_halving_kwargs: Other arguments of SuccessiveHalving
+        '''
+        self.sample_configs = sample_configs
+        self.max_hands = max_hands
+        self.min_hands = min_hands
+        self.eta = eta
+        self.successive_halving_kwargs = successive_halving_kwargs
+
+    def run(self):
+        ''' Run all brackets
+
+        Returns:
+            (tuple): Tuple containing:
+
+                (list): History of all brackets (see SuccessiveHalving.run()), with a 'bracket' entry per row
+                (dict): The best config of all brackets, based on the evaluation of its final rung
+        '''
+        np_random, _ = seeding.np_random(self.successive_halving_kwargs.get('seed', 0))
+        s_max = int(math.floor(math.log(self.max_hands / self.min_hands, self.eta) + 1e-9))
+        history = []
+        best, best_score = None, -np.inf
+        for bracket in range(s_max, -1, -1):
+            num_configs = int(math.ceil((s_max + 1) / (bracket + 1) * self.eta**bracket))
+            min_hands = max(1, self.max_hands // self.eta**bracket)
+            search = SuccessiveHalving(self.sample_configs(num_configs, np_random), min_hands = min_hands, eta = self.eta, num_rungs = bracket + 1, **self.successive_halving_kwargs)
+            bracket_history, bracket_best = search.run()
+            for row in bracket_history:
+                row['bracket'] = bracket
+            history.extend(bracket_history)
+            score = max(row['eval_mean'] for row in bracket_history if row['rung'] == bracket)
+            if score > best_score:
+                best, best_score = bracket_best, score
+        return history, best
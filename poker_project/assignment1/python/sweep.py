@@ -0,0 +1,227 @@
+import gc
+import itertools
+import json
+import math
+import multiprocessing
+import numpy as np
+from env import Env
+from q_learning_agent import QLearningAgent
+from random_agent import RandomAgent
+from threshold_agent import ThresholdAgent
+from vectorized_q_learning_trainer import VectorizedQLearningTrainer
+import seeding
+
+
+def random_opponent(np_random):
+    return RandomAgent(np_random, False)
+
+def threshold_opponent(np_random):
+    return ThresholdAgent(False, agent_model_is_known = False)
+
+OPPONENT_FACTORIES = {
+    'random': random_opponent,
+    'threshold': threshold_opponent,
+}
+
+# State space shared by all workers. It is loaded once by the parent process before the pool is
+# started, so that forked workers read the parent's copy instead of receiving a pickled one per task.
+_shared_state_space = None
+
+
+class Sweep:
+    ''' Hyperparameter sweep for QLearningAgent
+
+    Every config is trained and then tested once per seed; the (config, seed) runs are spread over a
+    process pool and the results are gathered into one table with a row per config.
+    '''
+
+    HYPERPARAMETERS = ['initial_alpha', 'initial_epsilon', 'alpha_decay', 'epsilon_decay']
+
+    def __init__(self, configs, seeds, opponent = 'random', num_train_hands = 3*10**6, num_test_hands = 10**6, state_space_file = 'random_agent_state_space.json', num_envs = 64, num_processes = None, confidence = 0.95):
+        ''' Initialize the sweep
+
+        Args:
+            configs (list): List of dictionaries with (some of) the keyword arguments of QLearningAgent
+                in Sweep.HYPERPARAMETERS, and optionally a 'name' (see Sweep.grid())
+            seeds (list): Seeds of the repetitions of each config
+            opponent (str): Key of OPPONENT_FACTORIES
+            num_train_hands (int): Number of training hands per repetition
+            num_test_hands (int): Number of test hands per repetition (greedy policy, no learning)
+            state_space_file (str): State space used to initialize the Q tables
+            num_envs (int): Number of environments played in lockstep by VectorizedQLearningTrainer
+            num_processes (int): Size of the process pool, defaults to the number of CPUs
+            confidence (float): Confidence level of the reported intervals
+        '''
+        self.configs = [dict(config) for config in configs]
+        for index, config in enumerate(self.configs):
+            unknown = set(config) - set(Sweep.HYPERPARAMETERS) - {'name'}
+            if unknown:
+                raise ValueError('Unknown hyperparameters {} in config {}'.format(sorted(unknown), index))
+            config.setdefault('name', 'config' + str(index))
+        self.seeds = list(seeds)
+        self.opponent = opponent
+        self.num_train_hands = num_train_hands
+        self.num_test_hands = num_test_hands
+        self.state_space_file = state_space_file
+        self.num_envs = num_envs
+        self.num_processes = num_processes
+        self.confidence = confidence
+
+    @staticmethod
+    def grid(**values):
+        ''' Build the list of configs for all combinations of the given hyperparameter values
+
+        e.g. Sweep.grid(initial_alpha = [0.1, 1.0], alpha_decay = [-1/4, -1/8]) returns 4 configs
+        '''
+        names = list(values)
+        return [dict(zip(names, combination)) for combination in itertools.product(*[values[name] for name in names])]
+
+    def run(self):
+        ''' Run all (config, seed) pairs and gather the results
+
+        Returns:
+            (list): One dictionary per config with the config's hyperparameters and, for the train and test
+                payoffs, the mean over its seeds and the standard deviation and confidence interval (Student's t)
+                of the per-seed mean payoffs. The seeds are the independent repetitions: the hands of one seed
+                are correlated through its learner, so they do not count as separate samples
+        '''
+        tasks = [(config_index, seed) for config_index in range(len(self.configs)) for seed in self.seeds]
+        results = run_with_shared_state_space(self._run_task, tasks, self.state_space_file, self.num_processes)
+
+        return self._gather(results)
+
+    def _run_task(self, config_index, seed):
+        ''' Train and test a fresh QLearningAgent for one (config, seed) pair
+
+        Returns:
+            (tuple): config_index, and the mean train and test payoffs of the seed
+        '''
+        config = self.configs[config_index]
+        np_random, _ = seeding.np_random(seed)
+        hyperparameters = {key: config[key] for key in Sweep.HYPERPARAMETERS if key in config}
+        q_learning_agent = QLearningAgent(np_random, False, is_learning = True, state_space = get_shared_state_space(), **hyperparameters)
+        opponent_factory = OPPONENT_FACTORIES[self.opponent]
+
+        trainer = VectorizedQLearningTrainer(q_learning_agent, opponent_factory, num_envs = self.num_envs, seed = seed * self.num_envs)
+        train_payoffs = trainer.train(self.num_train_hands)
+
+        q_learning_agent.is_learning = False
+        env = Env({ 'allow_step_back': False, 'seed': seed })
+        env.set_agents([q_learning_agent, opponent_factory(env.np_random)])
+        test_payoffs = np.array([env.run()[1][0] for _ in range(self.num_test_hands)])
+
+        return config_index, float(np.mean(train_payoffs)), float(test_payoffs.mean())
+
+    def _gather(self, results):
+        seed_means = {config_index: {'train': [], 'test': []} for config_index in range(len(self.configs))}
+        for config_index, train_mean, test_mean in results:
+            seed_means[config_index]['train'].append(train_mean)
+            seed_means[config_index]['test'].append(test_mean)
+
+        table = []
+        for config_index, config in enumerate(self.configs):
+            row = dict(config)
+            row['seeds'] = len(self.seeds)
+            for phase in ['train', 'test']:
+                means = np.array(seed_means[config_index][phase])
+                mean = means.mean() if len(means) > 0 else float('nan')
+                if len(means) > 1:
+                    std = means.std(ddof=1)
+                    half_width = student_t_quantile(0.5 + self.confidence / 2, len(means) - 1) * std / np.sqrt(len(means))
+                else: # a single seed says nothing about the variation between seeds
+                    std = half_width = float('nan')
+                row[phase + '_mean'] = mean
+                row[phase + '_std'] = std
+                row[phase + '_ci'] = (mean - half_width, mean + half_width)
+            table.append(row)
+        return table
+
+    @staticmethod
+    def format_table(table):
+        ''' Format the results of Sweep.run() as a text table
+        '''
+        header = ['name'] + Sweep.HYPERPARAMETERS + ['train_mean', 'train_std', 'test_mean', 'test_std', 'test_ci']
+        lines = [' | '.join(header)]
+        for row in table:
+            values = [row['name']] + [('%g' % row[key]) if key in row else '-' for key in Sweep.HYPERPARAMETERS]
+            values += ['%.4f' % row['train_mean'], '%.4f' % row['train_std'], '%.4f' % row['test_mean'], '%.4f' % row['test_std']]
+            values.append('[%.4f, %.4f]' % row['test_ci'])
+            lines.append(' | '.join(values))
+        return '\n'.join(lines)
+
+
+def run_with_shared_state_space(function, tasks, state_space_file, num_processes = None):
+    ''' Run function(*task) for all tasks on a process pool, with the state space of state_space_file
+    available to the workers as _shared_state_space
+
+    Returns:
+        (list): The results of the tasks, in order
+    '''
+    global _shared_state_space
+    with open(state_space_file) as json_file:
+        _shared_state_space = json.load(json_file)
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        gc.freeze() # keep the shared state space out of the garbage collector so that forked pages stay shared
+        context = multiprocessing.get_context('fork')
+        initializer, initargs = None, ()
+    else: # no fork, each worker has to load its own copy
+        context = multiprocessing.get_context()
+        initializer, initargs = _load_state_space, (state_space_file,)
+    try:
+        with context.Pool(num_processes, initializer, initargs) as pool:
+            return pool.starmap(function, tasks)
+    finally:
+        gc.unfreeze()
+        _shared_state_space = None
+
+def get_shared_state_space():
+    ''' State space loaded by run_with_shared_state_space(), to be used inside the tasks
+    '''
+    return _shared_state_space
+
+def _load_state_space(state_space_file):
+    global _shared_state_space
+    with open(state_space_file) as json_file:
+        _shared_state_space = json.load(json_file)
+
+def student_t_quantile(probability, degrees_of_freedom):
+    ''' Quantile of Student's t distribution, by bisection on its cdf (probability in (0.5, 1))
+    '''
+    low, high = 0.0, 1.0
+    while _student_t_cdf(high, degrees_of_freedom) < probability:
+        low, high = high, 2 * high
+    for _ in range(60):
+        middle = (low + high) / 2
+        if _student_t_cdf(middle, degrees_of_freedom) < probability:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+def _student_t_cdf(t, degrees_of_freedom):
+    ''' Cdf of Student's t distribution for t >= 0, through the regularized incomplete beta function
+    '''
+    return 1 - 0.5 * _incomplete_beta(degrees_of_freedom / (degrees_of_freedom + t * t), degrees_of_freedom / 2, 0.5)
+
+def _incomplete_beta(x, a, b):
+    ''' Regularized incomplete beta function I_x(a, b) (continued fraction, Numerical Recipes betai/betacf)
+    '''
+    if x <= 0.0 or x >= 1.0:
+        return max(0.0, min(1.0, x))
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x > (a + 1) / (a + b + 2): # the continued fraction converges fast only below this point
+        return 1 - _incomplete_beta(1 - x, b, a)
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > 1e-300 else 1e-300)
+    fraction = d
+    for m in range(1, 300):
+        for numerator in [m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)), -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))]:
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > 1e-300 else 1e-300)
+            c = 1 + numerator / c
+            c = c if abs(c) > 1e-300 else 1e-300
+            fraction *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return front * fraction / a
@@ -0,0 +1,102 @@
+''' Round trip of checkpoints: arrays, full checkpoints and the delta log written by CheckpointWriter
+'''
+
+import os
+import time
+import numpy as np
+from array_q_model import ArrayQModel
+from checkpoint import write_arrays, read_arrays, save_checkpoint, load_checkpoint, CheckpointWriter
+
+
+def _model(num_states = 50, seed = 0):
+    ''' ArrayQModel with random Q values and a random illegal action per state
+    '''
+    np_random = np.random.RandomState(seed)
+    state_keys = ['state' + str(state_id) for state_id in range(num_states)]
+    Q = np_random.normal(size=(num_states, len(ArrayQModel.ACTIONS)))
+    Q[np.arange(num_states), np_random.randint(len(ArrayQModel.ACTIONS), size=num_states)] = -np.inf
+    return ArrayQModel(state_keys, Q, Q.argmax(axis=1).astype(np.int8), 7)
+
+def _train(model, np_random, num_updates = 5):
+    ''' Change a few legal Q values and the policy, as a training step would
+    '''
+    for _ in range(num_updates):
+        state_id = np_random.randint(len(model.state_keys))
+        action_id = np_random.choice(np.flatnonzero(model.legal[state_id]))
+        model.Q[state_id, action_id] += np_random.normal()
+        model.policy[state_id] = model.Q[state_id].argmax()
+    model.episode_num += 1
+
+def _checkpoint(writer, num_written):
+    ''' Checkpoint and wait until the writer thread has written it (a pending snapshot would be replaced)
+    '''
+    writer.checkpoint()
+    deadline = time.time() + 10
+    while writer.num_written < num_written and writer.error is None:
+        assert time.time() < deadline
+        time.sleep(0.001)
+    assert writer.error is None
+
+def _assert_equal(model, loaded):
+    assert loaded.state_keys == model.state_keys
+    assert np.array_equal(loaded.Q, model.Q)
+    assert np.array_equal(loaded.policy, model.policy)
+    assert loaded.episode_num == model.episode_num
+
+def test_arrays(tmp_path):
+    path = str(tmp_path / 'arrays.bin')
+    arrays = { 'a': np.arange(10, dtype=np.int8), 'b': np.linspace(0, 1, 12).reshape(3, 4), 'c': np.zeros(0) }
+    write_arrays(path, arrays, ['x', 'y'], { 'name': 'test' })
+    read, state_keys, metadata = read_arrays(path)
+    assert sorted(read) == sorted(arrays)
+    for name, array in arrays.items():
+        assert read[name].dtype == array.dtype and np.array_equal(read[name], array)
+        assert read[name].ctypes.data % 64 == 0 or array.size == 0
+    assert state_keys == ['x', 'y']
+    assert metadata == { 'name': 'test' }
+    assert read_arrays(path, read_keys = False)[1] is None
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / 'model.ckpt')
+    model = _model()
+    save_checkpoint(path, model)
+    loaded = load_checkpoint(path)
+    _assert_equal(model, loaded)
+    assert not loaded.Q.flags.writeable # mapped without deltas
+    assert load_checkpoint(path, mmap_mode = False).Q.flags.writeable
+
+def test_delta_log(tmp_path):
+    path = str(tmp_path / 'model.ckpt')
+    model = _model()
+    np_random = np.random.RandomState(1)
+    writer = CheckpointWriter(model, path, full_every = 4)
+    for num_checkpoints in range(1, 11):
+        _train(model, np_random)
+        _checkpoint(writer, num_checkpoints)
+        _assert_equal(model, load_checkpoint(path)) # the full checkpoint plus the deltas since
+    writer.close()
+    assert os.path.getsize(path + '.delta') > 16 # the last checkpoint was a delta
+
+def test_interrupted_and_stale_delta_log(tmp_path):
+    path = str(tmp_path / 'model.ckpt')
+    model = _model()
+    np_random = np.random.RandomState(2)
+    writer = CheckpointWriter(model, path, full_every = 100)
+    _checkpoint(writer, 1)
+    _train(model, np_random)
+    _checkpoint(writer, 2)
+    writer.close()
+    _assert_equal(model, load_checkpoint(path))
+
+    with open(path + '.delta', 'ab') as f: # incomplete record of an interrupted write
+        f.write(b'\1' * 20)
+    _assert_equal(model, load_checkpoint(path))
+
+    with open(path + '.delta', 'rb') as f:
+        delta_log = f.read()
+    save_checkpoint(path, _model(seed = 3)) # a new snapshot with the delta log of the old one
+    with open(path + '.delta', 'wb') as f:
+        f.write(delta_log)
+    _assert_equal(_model(seed = 3), load_checkpoint(path))
+    os.remove(path + '.delta')
+    _assert_equal(_model(seed = 3), load_checkpoint(path))
@@ -0,0 +1,55 @@
+''' Round trip of hand histories: played hands -> records -> file -> columns, decoded and replayed hands
+'''
+
+import numpy as np
+from env import Env
+from random_agent import RandomAgent
+from threshold_agent import ThresholdAgent
+from hand_history import ACTIONS, HandHistoryWriter, read_hand_history, decode_columns, decode_hand, replay_hand
+
+
+def _play(writer, num_hands, seed):
+    ''' Play num_hands recorded by writer
+
+    Returns:
+        (list): (actions, payoff of player 0) of each hand
+    '''
+    env = Env({ 'allow_step_back': False, 'seed': seed })
+    env.set_agents([ThresholdAgent(False), RandomAgent(env.np_random, False)])
+    env.set_hand_history(writer)
+    hands = []
+    for _ in range(num_hands):
+        _, payoffs = env.run()
+        hands.append(([action for _, action in env.action_recorder], payoffs[0]))
+    return hands
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'hands.bin')
+    writer = HandHistoryWriter(path, buffer_size = 64)
+    hands = _play(writer, 500, 5)
+    writer.close()
+
+    writer = HandHistoryWriter(path, buffer_size = 64) # reopening appends
+    hands += _play(writer, 300, 6)
+    writer.close()
+
+    records = read_hand_history(path)
+    assert len(records) == len(hands)
+    columns = decode_columns(records)
+    assert np.array_equal(columns['payoff'], [payoff for _, payoff in hands])
+    assert np.array_equal(columns['num_actions'], [len(actions) for actions, _ in hands])
+
+    env = Env({ 'allow_step_back': False, 'seed': 1 })
+    for index, (actions, payoff) in enumerate(hands):
+        assert [ACTIONS[action_id] for action_id in columns['actions'][index] if action_id >= 0] == actions
+        hand = decode_hand(records[index])
+        assert hand['actions'] == actions
+        assert hand['payoffs'] == [payoff, -payoff]
+        assert hand['small_blind'] == columns['small_blind'][index]
+        replay_hand(records[index], env)
+        assert env.get_payoffs()[0] == payoff
+
+def test_empty_file(tmp_path):
+    path = str(tmp_path / 'hands.bin')
+    HandHistoryWriter(path).close()
+    assert len(read_hand_history(path)) == 0
@@ -1,6 +1,8 @@
 from dealer import Dealer
 from game import Game
 from utils import try_key_initialization
+from range_inference import RangeInferenceTable
+from card_range import RANK_BITS, FULL_RANGE, EMPTY_RANGE, RANGE_MASKS, get_range_string, get_probabilities_by_mask
 
 
 class ThresholdAgent:
@@ -17,6 +19,8 @@ class ThresholdAgent:
         self.use_raw = True
         self.print_enabled = print_enabled
         self.agent_model_is_known = agent_model_is_known
+        # range inference is answered by a lookup table compiled from _infer_card_range() (also used as fallback)
+        self.range_table = RangeInferenceTable(self._infer_card_range)
 
     def step(self, state):
         ''' Threshold ("static") agent, with actions being decided based on hand
@@ -111,35 +115,42 @@ class ThresholdAgent:
         return action
     
     def infer_card_range_from_action(self, action, game_round, current_range, other_chips, public_cards, position):
-        if self.agent_model_is_known:
-            if game_round == 1:
-                if action == 'raise' or (other_chips == 0 and action == 'bet') or current_range == 'AK':
-                    new_current_range = 'AK'
-                elif action == 'bet':
-                    new_current_range = 'JQ'
-                elif action == 'fold':
-                    new_current_range = 'T'
-                else:
-                    new_current_range = 'JQT'
+        ''' New range (mask, see card_range) of this agent's hand as inferred by its opponent from its action,
+        looked up in the table compiled from _infer_card_range() when the agent was constructed
+        '''
+        if not self.agent_model_is_known:
+            return FULL_RANGE # range cannot be inferred by agent's actions
+        return self.range_table.infer_card_range_from_action(action, game_round, current_range, other_chips, public_cards, position)
+
+    def _infer_card_range(self, action, game_round, current_range, other_chips, public_cards, position):
+        ''' Range inference of infer_card_range_from_action() when the agent's model is known
+        '''
+        if game_round == 1:
+            if action == 'raise' or (other_chips == 0 and action == 'bet') or current_range == RANGE_MASKS['AK']:
+                new_current_range = RANGE_MASKS['AK']
+            elif action == 'bet':
+                new_current_range = RANGE_MASKS['JQ']
+            elif action == 'fold':
+                new_current_range = RANGE_MASKS['T']
             else:
-                if action == 'raise' or (other_chips == 0 and action == 'bet'):
-                    new_current_range = (public_cards[0] if public_cards[0] in current_range else '') + (public_cards[1] if public_cards[0] != public_cards[1] and public_cards[1] in current_range else '')
-                elif action == 'check' or action == 'fold':
-                    new_current_range = current_range.replace(public_cards[0],'').replace(public_cards[1],'')
-                    if action == 'fold':
-                        new_current_range = new_current_range.replace('A','').replace('K','').replace('Q','')
-                else: # other_chips == 1 and action == 'bet':
-                    if (position == 'second'):
-                        new_current_range = current_range.replace('J','').replace('T','')
-                        new_current_range = new_current_range.replace(public_cards[0],'').replace(public_cards[1],'')
-                    elif (public_cards[0] not in current_range and public_cards[1] not in current_range):
-                        new_current_range = current_range.replace('J','').replace('T','')
-                    else: # first position already bet
-                        new_current_range = current_range[:]
-
-            return new_current_range if new_current_range != '' else 'none'
+                new_current_range = RANGE_MASKS['JQT']
         else:
-            return 'AJKQT' # range cannot be inferred by agent's actions
+            public_range = RANK_BITS[public_cards[0]] | RANK_BITS[public_cards[1]]
+            if action == 'raise' or (other_chips == 0 and action == 'bet'):
+                new_current_range = current_range & public_range
+            elif action == 'check' or action == 'fold':
+                new_current_range = current_range & ~public_range
+                if action == 'fold':
+                    new_current_range &= RANGE_MASKS['JT']
+            else: # other_chips == 1 and action == 'bet':
+                if (position == 'second'):
+                    new_current_range = current_range & ~RANGE_MASKS['JT'] & ~public_range
+                elif current_range & public_range == EMPTY_RANGE:
+                    new_current_range = current_range & ~RANGE_MASKS['JT']
+                else: # first position already bet
+                    new_current_range = current_range
+
+        return new_current_range # EMPTY_RANGE if no rank is left
 
     def calculate_state_space(self, win_probabilities, loss_probabilities, flop_probabilities, range_probabilities):
         ''' Calculation of all possible states and their transitions (probability, reward, next state, is terminal state)
@@ -149,6 +160,8 @@ class ThresholdAgent:
         '''
 
         state_space = {}
+        # opponent ranges are masks below, turned into strings only in state keys
+        win_probabilities, loss_probabilities, flop_probabilities, range_probabilities = get_probabilities_by_mask(win_probabilities, loss_probabilities, flop_probabilities, range_probabilities)
 
         ################# Possible States ##################
 
@@ -177,10 +190,10 @@ class ThresholdAgent:
                     my_starting_chips = [0.5]
                 if other_chips == 0:
                     my_legal_actions = ['bet', 'check'] if position == 'first' else ['raise', 'check']
-                    opponent_range = 'AJKQT' if position == 'first' else 'JQT' # because first opponent has checked
+                    opponent_range = FULL_RANGE if position == 'first' else RANGE_MASKS['JQT'] # because first opponent has checked
                 else: # other_chips = 1
                     my_legal_actions = ['fold', 'bet'] if position == 'first' else ['raise', 'bet', 'fold']
-                    opponent_range = 'AK' # because opponent has bet/raised first
+                    opponent_range = RANGE_MASKS['AK'] # because opponent has bet/raised first
                 for my_chips in my_starting_chips:
                     for my_action in my_legal_actions:
                         self._calculate_round1_states(state_space, position, my_chips, other_chips, my_action, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, range_probabilities)
@@ -188,7 +201,7 @@ class ThresholdAgent:
         for position in ['first', 'second']:
             game_round = 2
             for other_chips in [0, 1]:
-                for public_cards in flop_probabilities['A']['A']: # for all possible public cards
+                for public_cards in flop_probabilities['A'][RANGE_MASKS['A']]: # for all possible public cards
                     if position == 'first' and other_chips == 1: 
                         my_starting_chips = [0.5, 1.5, 2.5, 3.5]
                     else:
@@ -196,15 +209,15 @@ class ThresholdAgent:
                     if other_chips == 0:
                         my_legal_actions = ['bet', 'check'] if position == 'first' else ['raise', 'check']
                         # start with knowledge from round 1 if playing first, update knowledge with first action of round 2 if playing second
-                        opponent_ranges = [ 'AK', 'JQT', 'JQ' ] if position == 'first' else [ self.infer_card_range_from_action('check', game_round, preflop_opponent_range, other_chips, public_cards, 'first') for preflop_opponent_range in [ 'AK', 'JQT', 'JQ' ] ]
+                        opponent_ranges = [ RANGE_MASKS['AK'], RANGE_MASKS['JQT'], RANGE_MASKS['JQ'] ] if position == 'first' else [ self.infer_card_range_from_action('check', game_round, preflop_opponent_range, other_chips, public_cards, 'first') for preflop_opponent_range in [ RANGE_MASKS['AK'], RANGE_MASKS['JQT'], RANGE_MASKS['JQ'] ] ]
                     else: # other_chips = 1
                         my_legal_actions = ['fold', 'bet'] if position == 'first' else ['raise', 'bet', 'fold']
                         # position doesn't matter for 'raise', in both cases we may have new information
-                        opponent_ranges = [ self.infer_card_range_from_action('raise', game_round, preflop_opponent_range, other_chips, public_cards, position) for preflop_opponent_range in [ 'AK', 'JQT', 'JQ' ] ]
+                        opponent_ranges = [ self.infer_card_range_from_action('raise', game_round, preflop_opponent_range, other_chips, public_cards, position) for preflop_opponent_range in [ RANGE_MASKS['AK'], RANGE_MASKS['JQT'], RANGE_MASKS['JQ'] ] ]
                     for my_chips in my_starting_chips:
                         for my_action in my_legal_actions:
                             for opponent_range in opponent_ranges:
-                                if opponent_range != 'none': # range 'none' is not possible for ThresholdAgent, skip such states
+                                if opponent_range != EMPTY_RANGE: # range 'none' is not possible for ThresholdAgent, skip such states
                                     self._calculate_round2_states(state_space, position, my_chips, other_chips, my_action, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, range_probabilities, public_cards)
 
         return state_space
@@ -224,21 +237,21 @@ class ThresholdAgent:
                 is_terminal = True
                 new_other_chips = -1
                 reward = my_chips + other_chips
-                new_opponent_range = 'T' # only way for ThresholdAgent to fold in round 1
+                new_opponent_range = RANGE_MASKS['T'] # only way for ThresholdAgent to fold in round 1
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
                 #### other_action == 'bet' ####
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = 'JQ' # only way for ThresholdAgent to simply call in round 1
+                new_opponent_range = RANGE_MASKS['JQ'] # only way for ThresholdAgent to simply call in round 1
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
                 #### other_action == 'raise' ####
                 is_terminal = False
                 new_other_chips = 1
                 reward = 0
-                new_opponent_range = 'AK' # clear range for raising
+                new_opponent_range = RANGE_MASKS['AK'] # clear range for raising
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
             elif (position == 'second' and my_action == 'raise' and other_chips == 0):
@@ -247,14 +260,14 @@ class ThresholdAgent:
                 is_terminal = True
                 new_other_chips = -1
                 reward = my_chips + other_chips
-                new_opponent_range = 'T'
+                new_opponent_range = RANGE_MASKS['T']
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
                 #### other_action == 'bet' ####
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = 'JQ'
+                new_opponent_range = RANGE_MASKS['JQ']
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
             elif (position == 'second' and my_action == 'raise' and other_chips == 1):
@@ -263,7 +276,7 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = opponent_range[:] # remains 'AK'
+                new_opponent_range = opponent_range # remains 'AK'
                 action_prob = 1 # already knows the action based on 'AK' range
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
             elif (other_chips == 1 and my_action == 'bet'):
@@ -272,7 +285,7 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = opponent_range[:] # remains 'AK'
+                new_opponent_range = opponent_range # remains 'AK'
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
             elif (my_action == 'fold'):
                 new_my_chips = my_chips
@@ -280,7 +293,7 @@ class ThresholdAgent:
                 is_terminal = True
                 new_other_chips = 1
                 reward = -my_chips
-                new_opponent_range = opponent_range[:] # remains 'AK'
+                new_opponent_range = opponent_range # remains 'AK'
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
             elif (my_action == 'check' and position == 'second'):
                 new_my_chips = my_chips
@@ -288,7 +301,7 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = opponent_range[:] # remains 'JQT'
+                new_opponent_range = opponent_range # remains 'JQT'
                 action_prob = 1 # threshold agent has finished his move by checking
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
             elif (my_action == 'check' and position == 'first'):
@@ -297,14 +310,14 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = 'JQT'
+                new_opponent_range = RANGE_MASKS['JQT']
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
                 #### other_action == 'raise' ####
                 is_terminal = False
                 new_other_chips = 1
                 reward = 0
-                new_opponent_range = 'AK'
+                new_opponent_range = RANGE_MASKS['AK']
                 action_prob = range_probabilities[hand]['none'][opponent_range][new_opponent_range]
                 self._calculate_cards_states_for_round1(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities)
 
@@ -322,21 +335,21 @@ class ThresholdAgent:
                 new_other_chips = -1
                 reward = my_chips + other_chips
                 new_opponent_range = self.infer_card_range_from_action('fold', game_round, opponent_range, 1, public_cards, 'second')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0 # range 'none' is impossible for ThresholdAgent, skip this state
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0 # range 'none' is impossible for ThresholdAgent, skip this state
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
                 #### other_action == 'bet' ####
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
                 new_opponent_range = self.infer_card_range_from_action('bet', game_round, opponent_range, 1, public_cards, 'second')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
                 #### other_action == 'raise' ####
                 is_terminal = False
                 new_other_chips = 1
                 reward = 0
                 new_opponent_range = self.infer_card_range_from_action('raise', game_round, opponent_range, 1, public_cards, 'second')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
             elif (position == 'second' and my_action == 'raise' and other_chips == 0):
                 new_my_chips = my_chips + 1 + other_chips
@@ -345,14 +358,14 @@ class ThresholdAgent:
                 new_other_chips = -1
                 reward = my_chips + other_chips
                 new_opponent_range = self.infer_card_range_from_action('fold', game_round, opponent_range, 1, public_cards, 'first')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
                 #### other_action == 'bet' ####
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
                 new_opponent_range = self.infer_card_range_from_action('bet', game_round, opponent_range, 1, public_cards, 'first')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
             elif (position == 'second' and my_action == 'raise' and other_chips == 1):
                 new_my_chips = my_chips + 1 + other_chips
@@ -360,7 +373,7 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = opponent_range[:] # remains public_cards
+                new_opponent_range = opponent_range # remains public_cards
                 action_prob = 1 # already knows the action based on public_cards range
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
             elif (other_chips == 1 and my_action == 'bet'):
@@ -369,7 +382,7 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = opponent_range[:] # remains public_cards
+                new_opponent_range = opponent_range # remains public_cards
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
             elif (my_action == 'fold'):
                 new_my_chips = my_chips
@@ -377,7 +390,7 @@ class ThresholdAgent:
                 is_terminal = True
                 new_other_chips = 1
                 reward = -my_chips
-                new_opponent_range = opponent_range[:] # remains public_cards
+                new_opponent_range = opponent_range # remains public_cards
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
             elif (my_action == 'check' and position == 'second'):
                 new_my_chips = my_chips
@@ -385,7 +398,7 @@ class ThresholdAgent:
                 is_terminal = False
                 new_other_chips = 0
                 reward = 0
-                new_opponent_range = opponent_range[:] # remains non public_cards
+                new_opponent_range = opponent_range # remains non public_cards
                 action_prob = 1 # threshold agent has finished his move by checking
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
             elif (my_action == 'check' and position == 'first'):
@@ -395,14 +408,14 @@ class ThresholdAgent:
                 new_other_chips = 0
                 reward = 0
                 new_opponent_range = self.infer_card_range_from_action('check', game_round, opponent_range, 0, public_cards, 'second')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
                 #### other_action == 'raise' ####
                 is_terminal = False
                 new_other_chips = 1
                 reward = 0
                 new_opponent_range = self.infer_card_range_from_action('raise', game_round, opponent_range, 0, public_cards, 'second')
-                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != 'none' else 0
+                action_prob = range_probabilities[hand][public_cards][opponent_range][new_opponent_range] if new_opponent_range != EMPTY_RANGE else 0
                 self._calculate_cards_states_for_round2(state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, public_cards)
 
     def _calculate_cards_states_for_round1(self, state_space, key, my_action, action_prob, position, new_my_chips, new_other_chips, is_terminal, reward, hand, win_probabilities, loss_probabilities, flop_probabilities, game_round, opponent_range, new_opponent_range, range_probabilities):
@@ -410,7 +423,7 @@ class ThresholdAgent:
         
         '''
         if game_round == 1: # end of round 1
-            full_key = key + 'none' + '_' + opponent_range
+            full_key = key + 'none' + '_' + get_range_string(opponent_range)
             if new_other_chips != 0:
                 public_cards = 'none' # game ended with a fold before opening public cards
                 self._add_or_update_key(state_space, full_key, action_prob, my_action, position, new_my_chips, new_other_chips, is_terminal, reward, hand, public_cards, new_opponent_range)
@@ -418,11 +431,11 @@ class ThresholdAgent:
                 for public_cards in flop_probabilities[hand][new_opponent_range]:
                     ### update new_opponent_range after 'check' ####
                     new_flop_opponent_range = self.infer_card_range_from_action('check', 2, new_opponent_range, 0, public_cards, 'first')
-                    flop_action_prob = range_probabilities[hand][public_cards][new_opponent_range][new_flop_opponent_range] if new_flop_opponent_range != 'none' else 0
+                    flop_action_prob = range_probabilities[hand][public_cards][new_opponent_range][new_flop_opponent_range] if new_flop_opponent_range != EMPTY_RANGE else 0
                     self._add_or_update_key(state_space, full_key, flop_probabilities[hand][new_opponent_range][public_cards]*action_prob*flop_action_prob, my_action, position, new_my_chips, new_other_chips, is_terminal, reward, hand, public_cards, new_flop_opponent_range)
                     ### update new_opponent_range after 'bet' ####
                     new_flop_opponent_range = self.infer_card_range_from_action('bet', 2, new_opponent_range, 0, public_cards, 'first')
-                    flop_action_prob = range_probabilities[hand][public_cards][new_opponent_range][new_flop_opponent_range] if new_flop_opponent_range != 'none' else 0
+                    flop_action_prob = range_probabilities[hand][public_cards][new_opponent_range][new_flop_opponent_range] if new_flop_opponent_range != EMPTY_RANGE else 0
                     self._add_or_update_key(state_space, full_key, flop_probabilities[hand][new_opponent_range][public_cards]*action_prob*flop_action_prob, my_action, position, new_my_chips, 1, is_terminal, reward, hand, public_cards, new_flop_opponent_range)
             else:
                 for public_cards in flop_probabilities[hand][new_opponent_range]: # store state transition for each possible public card combination (only rank matters)
@@ -433,7 +446,7 @@ class ThresholdAgent:
         
         '''
         if game_round == 2: # end of round 2
-            full_key = key + public_cards + '_' + opponent_range
+            full_key = key + public_cards + '_' + get_range_string(opponent_range)
             if new_other_chips == 0: # game finished, result by judging both players' hands
                 is_terminal = True
                 win_prob = win_probabilities[hand][public_cards][new_opponent_range] if action_prob > 0 else 0.0
@@ -449,5 +462,5 @@ class ThresholdAgent:
         if prob > 0: # no need to store impossible transitions
             try_key_initialization(state_space, key, {})
             try_key_initialization(state_space[key], my_action, [])
-            new_key = position + '_' + str(new_my_chips) + '_' + str(new_other_chips) + '_' + hand + '_' + public_cards + '_' + new_opponent_range
+            new_key = position + '_' + str(new_my_chips) + '_' + str(new_other_chips) + '_' + hand + '_' + public_cards + '_' + get_range_string(new_opponent_range)
             state_space[key][my_action].append( (prob, new_key, reward, is_terminal)  )
@@ -31,4 +31,18 @@ def get_random_max_key(dictionary, np_random):
     '''
     max_value = max(dictionary.values())
     max_keys = [key for key, value in dictionary.items() if value == max_value]
-    return np_random.choice(max_keys)
\ No newline at end of file
+    return np_random.choice(max_keys)
+
+def get_state_key(obs):
+    ''' Build the state key used by the state spaces and the learning agents from an extracted observation
+    '''
+    return obs['position'] + '_' + str(obs['my_chips']) + '_' + str(obs['other_chips']) + '_' + obs['hand'] + '_' + obs['public_cards'] + '_' + obs['opponent_range']
+
+def get_policy_agreement(policy, optimal_policy):
+    ''' Percentage of the states of optimal_policy where policy chooses the same action
+    '''
+    counter = 0
+    for state_key in optimal_policy:
+        if state_key in policy and policy[state_key] == optimal_policy[state_key]:
+            counter += 1
+    return 100*counter/len(optimal_policy)
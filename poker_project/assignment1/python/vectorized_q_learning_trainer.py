@@ -0,0 +1,169 @@
+import numpy as np
+from env import Env
+from array_q_model import ArrayQModel
+from checkpoint import CheckpointWriter
+
+
+class VectorizedQLearningTrainer:
+    ''' Trains a QLearningAgent over several independent environments played in lockstep
+
+    On every tick, epsilon-greedy actions are chosen for the decisions pending in all environments with
+    a single array operation, every environment is advanced (opponent included) up to the next decision
+    of the learner or the end of the hand, and the resulting TD updates are applied to an array copy of
+    the Q table as one batch. Alpha and epsilon follow QLearningAgent's own schedule, where episode_num
+    counts completed hands over all environments.
+
+    Note: updates of the same (state, action) pair within one tick are summed from the same old Q value,
+    instead of being applied one after the other as in Env.run().
+    '''
+
+    def __init__(self, q_learning_agent, opponent_factory, num_envs = 64, seed = None, checkpoint_path = None, checkpoint_every = 10**5):
+        ''' Initialize the trainer
+
+        Args:
+            q_learning_agent (QLearningAgent): The agent to be trained, initialized with a state space or a pretrained model
+            opponent_factory (function): Called with the np_random of each environment, returns a (non-learning) opponent agent
+                e.g. lambda np_random: RandomAgent(np_random, False)
+            num_envs (int): Number of environments played in lockstep
+            seed (int): Seed of the first environment, the rest use the following integers (None for random seeds)
+            checkpoint_path (str): If given, checkpoints are written there by a background CheckpointWriter
+            checkpoint_every (int): Number of completed hands between checkpoints
+        '''
+        if q_learning_agent.explore_state_space:
+            raise ValueError('VectorizedQLearningTrainer needs a QLearningAgent initialized with a state space or a pretrained model')
+        self.agent = q_learning_agent
+        self.model = ArrayQModel.from_model(q_learning_agent.model)
+        self.num_envs = num_envs
+        self.learner_id = 0 # same seating as the notebook, positions are still randomized by the blinds
+        self.envs = []
+        for i in range(num_envs):
+            env = Env({ 'allow_step_back': False, 'seed': None if seed is None else seed + i })
+            env.set_agents([q_learning_agent, opponent_factory(env.np_random)])
+            self.envs.append(env)
+        self.checkpoint_writer = CheckpointWriter(self.model, checkpoint_path) if checkpoint_path is not None else None
+        self.checkpoint_every = checkpoint_every
+        self.num_hands = 0
+        self.states = [None] * num_envs
+        self.state_ids = np.zeros(num_envs, dtype=np.int64)
+
+    def train(self, num_hands):
+        ''' Play num_hands hands over all environments and learn from them
+
+        Args:
+            num_hands (int): Number of hands to be completed
+
+        Returns:
+            (np.ndarray): Payoff of the learner for each completed hand, in order of completion
+        '''
+        np_random = self.agent.np_random
+        self.num_hands = num_hands
+        payoffs = np.empty(num_hands)
+        completed = 0
+        started = 0
+        active = np.zeros(self.num_envs, dtype=bool)
+        for i in range(self.num_envs):
+            if started < num_hands:
+                started, completed = self._start_hand(i, started, completed, payoffs)
+                active[i] = self.states[i] is not None
+
+        while active.any():
+            env_ids = np.flatnonzero(active)
+            state_ids = self.state_ids[env_ids]
+
+            # Choose epsilon-greedy actions for all pending decisions at once
+            explore = np_random.random_sample(len(env_ids)) < self.agent.epsilon
+            actions = np.where(explore, self.model.random_actions(state_ids, np_random), self.model.policy[state_ids])
+
+            next_state_ids = np.zeros(len(env_ids), dtype=np.int64)
+            rewards = np.zeros(len(env_ids))
+            done = np.zeros(len(env_ids), dtype=bool)
+            for j, i in enumerate(env_ids):
+                env = self.envs[i]
+                state, player_id = env.step_agent(self.learner_id, self.states[i], ArrayQModel.ACTIONS[actions[j]])
+                state = self._advance(env, state, player_id)
+                if state is None:
+                    done[j] = True
+                    rewards[j] = env.get_payoffs()[self.learner_id]
+                else:
+                    self.states[i] = state
+                    next_state_ids[j] = self.model.get_state_id(state)
+            self.state_ids[env_ids] = next_state_ids
+
+            self._update(state_ids, actions, rewards, next_state_ids, done)
+
+            for j in np.flatnonzero(done):
+                payoffs[completed] = rewards[j]
+                completed += 1
+                i = env_ids[j]
+                self.states[i] = None
+                if started < num_hands:
+                    started, completed = self._start_hand(i, started, completed, payoffs)
+                active[i] = self.states[i] is not None
+
+        self.sync()
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.checkpoint()
+        return payoffs
+
+    def close(self):
+        ''' Wait for pending checkpoints to be written
+        '''
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.close()
+            self.checkpoint_writer = None
+
+    def sync(self):
+        ''' Write the learned Q values and policy back to the agent's dictionary model
+        '''
+        self.model.episode_num = self.agent.model['episode_num']
+        self.model.write_to_model(self.agent.model)
+
+    def _update(self, state_ids, actions, rewards, next_state_ids, done):
+        ''' Batched TD update of Q, followed by a policy update of the affected states
+        '''
+        self.model.td_update(state_ids, actions, rewards, next_state_ids, done, self.agent.alpha, self.agent.gamma, self.agent.np_random)
+
+        num_done = int(done.sum())
+        if num_done > 0:
+            self.agent.model['episode_num'] += num_done
+            self.model.episode_num = self.agent.model['episode_num']
+            self.agent._update_epsilon()
+            self.agent._update_alpha()
+            if self.checkpoint_writer is not None and self.model.episode_num // self.checkpoint_every != (self.model.episode_num - num_done) // self.checkpoint_every:
+                self.checkpoint_writer.checkpoint()
+
+    def _start_hand(self, i, started, completed, payoffs):
+        ''' Start new hands in environment i until one reaches a decision of the learner
+        '''
+        env = self.envs[i]
+        while started < self.num_hands:
+            state, player_id = env.reset()
+            started += 1
+            state = self._advance(env, state, player_id)
+            if state is not None:
+                self.states[i] = state
+                self.state_ids[i] = self.model.get_state_id(state)
+                break
+            # hand finished before the learner had to act, nothing to learn (same as Env.run())
+            payoffs[completed] = env.get_payoffs()[self.learner_id]
+            completed += 1
+        return started, completed
+
+    def _advance(self, env, state, player_id):
+        ''' Let the opponent play until the learner has to act
+
+        Args:
+            env (Env): The environment
+            state (dict): The state of the player to act
+            player_id (int): The ID of the player to act
+
+        Returns:
+            (dict): The learner's state, or None if the hand is over
+        '''
+        while not env.is_over():
+            if player_id == self.learner_id:
+                return state
+            action = env.agents[player_id].step(state)
+            state, player_id = env.step_agent(player_id, state, action)
+        return None
+